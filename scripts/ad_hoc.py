@@ -1,42 +1,7 @@
 from pathlib import Path
 import pandas as pd
-import re, csv, re
-
-def find_repo_root(start_path=None):
-    """
-    Walk upward until a .git directory is found.
-    Returns the repo root as a Path.
-    """
-    current = Path(start_path or __file__).resolve()
-    for parent in [current] + list(current.parents):
-        if (parent / ".git").exists():
-            return parent
-    raise RuntimeError("Not inside a Git repository")
-
-def get_file_encoding_type(file_path):
-    """
-    Tries common text encodings and returns the first one that successfully
-    reads the CSV header.
-    """
-    file_path = Path(file_path).resolve()
-    encodings = ["utf-8", "cp1252", "latin-1"]
-
-    for enc in encodings:
-        try:
-            with open(file_path, newline="", encoding=enc) as f:
-                reader = csv.reader(f)
-                next(reader)  # Try reading header
-            return enc
-        except UnicodeDecodeError:
-            continue
-
-    raise UnicodeDecodeError(
-        "utf-8",
-        b"",
-        0,
-        1,
-        f"Could not determine encoding for file: {file_path}"
-    )
+import re
+from tennis_research import find_repo_root, get_file_encoding_type
 
 def is_partial_name(name):
     name = name.strip()
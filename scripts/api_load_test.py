@@ -0,0 +1,169 @@
+import argparse
+import asyncio
+import json
+import random
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+from canonical_api import HOST, PORT
+from tennis_research import find_repo_root
+
+# ---------------------------
+# CLIENT
+# ---------------------------
+class Connection:
+    """
+    One keep-alive HTTP/1.1 connection; handles Content-Length and chunked
+    bodies, which is all the API sends.
+    """
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.reader = None
+        self.writer = None
+
+    async def get(self, path):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        self.writer.write(f"GET {path} HTTP/1.1\r\nHost: {self.host}\r\n\r\n".encode())
+        await self.writer.drain()
+        head = (await self.reader.readuntil(b"\r\n\r\n")).decode("latin-1").split("\r\n")
+        status = int(head[0].split(" ")[1])
+        headers = {k.strip().lower(): v.strip() for k, _, v in (l.partition(":") for l in head[1:] if l)}
+        if headers.get("transfer-encoding") == "chunked":
+            body = []
+            while True:
+                size = int((await self.reader.readuntil(b"\r\n")).strip(), 16)
+                chunk = await self.reader.readexactly(size + 2)
+                if size == 0:
+                    break
+                body.append(chunk[:-2])
+            body = b"".join(body)
+        else:
+            body = await self.reader.readexactly(int(headers.get("content-length", 0)))
+        return status, body
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+async def sample_paths(host, port, n_ids=200):
+    """
+    A realistic request mix: point lookups for real ids, filtered lists,
+    stats slices and aggregates.
+    """
+    conn = Connection(host, port)
+    _, body = await conn.get(f"/players?limit={n_ids}")
+    players = [p["player_id"] for p in json.loads(body)]
+    _, body = await conn.get(f"/matches?limit={n_ids * 5}")
+    matches = [m["match_id"] for m in json.loads(body)][:: 5]
+    _, body = await conn.get("/health")
+    health = json.loads(body)
+    point_matches = []
+    if health["point_matches"]:
+        _, body = await conn.get(f"/points?limit={n_ids * 5}")
+        point_matches = [m["match_id"] for m in json.loads(body)][:: 5]
+    conn.close()
+
+    paths = []
+    paths += [f"/players/{p}" for p in players]
+    paths += [f"/players/{p}/matches" for p in players]
+    paths += [f"/matches/{m}" for m in matches]
+    paths += [f"/stats/{family}?match_id={m}" for m in matches[:50] for family in health["stats_families"][:4]]
+    paths += [f"/matches?year={y}&limit=50" for y in range(2000, 2026)]
+    paths += ["/aggregates/matches?by=year,surface", "/aggregates/matches?by=gender,surface"]
+    paths += [f"/aggregates/stats/{family}?limit=100" for family in health["stats_families"]]
+    paths += [f"/matches/{m}/points" for m in point_matches]
+    return paths
+
+# ---------------------------
+# LOAD
+# ---------------------------
+async def worker(host, port, paths, deadline, latencies, statuses, rng):
+    conn = Connection(host, port)
+    try:
+        while time.perf_counter() < deadline:
+            path = paths[rng.randrange(len(paths))]
+            start = time.perf_counter()
+            try:
+                status, _ = await conn.get(path)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                conn.close()
+                conn = Connection(host, port)
+                status = 0
+            latencies.append(time.perf_counter() - start)
+            statuses[status] = statuses.get(status, 0) + 1
+    finally:
+        conn.close()
+
+async def run_load(host, port, concurrency, duration, seed):
+    paths = await sample_paths(host, port)
+    latencies, statuses = [], {}
+    deadline = time.perf_counter() + duration
+    start = time.perf_counter()
+    await asyncio.gather(*[
+        worker(host, port, paths, deadline, latencies, statuses, random.Random(seed + i)) for i in range(concurrency)
+    ])
+    elapsed = time.perf_counter() - start
+    latencies = np.array(latencies) * 1000
+    return {
+        "requests": len(latencies),
+        "seconds": round(elapsed, 2),
+        "requests_per_s": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(float(np.percentile(latencies, 50)), 2),
+        "p95_ms": round(float(np.percentile(latencies, 95)), 2),
+        "p99_ms": round(float(np.percentile(latencies, 99)), 2),
+        "statuses": {str(k): v for k, v in sorted(statuses.items())},
+        "distinct_paths": len(paths),
+    }
+
+async def wait_for_server(host, port, timeout):
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        try:
+            conn = Connection(host, port)
+            status, _ = await conn.get("/health")
+            conn.close()
+            if status == 200:
+                return True
+        except OSError:
+            await asyncio.sleep(0.5)
+    return False
+
+
+if __name__ == "__main__":
+    root = find_repo_root()
+
+    parser = argparse.ArgumentParser(description="Load-test the canonical data API with a mixed request workload.")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--concurrency", type=int, default=32, help="Concurrent keep-alive connections")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds to run")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--start-server", action="store_true", help="Launch canonical_api.py for the run")
+    args = parser.parse_args()
+
+    server = None
+    if args.start_server:
+        server = subprocess.Popen([sys.executable, str(Path(__file__).with_name("canonical_api.py")), "--port", str(args.port), "--host", args.host],
+                                  stdout=subprocess.DEVNULL)
+    try:
+        if not asyncio.run(wait_for_server(args.host, args.port, 300 if server else 5)):
+            print(f"[FATAL] - No API answering on http://{args.host}:{args.port}")
+            quit()
+        result = asyncio.run(run_load(args.host, args.port, args.concurrency, args.duration, args.seed))
+    finally:
+        if server:
+            server.terminate()
+            server.wait()
+
+    print("\n----------- LOAD TEST -------------")
+    print(f"Requests: {result['requests']:,} in {result['seconds']}s over {args.concurrency} connections ({result['distinct_paths']} distinct paths)")
+    print(f"Throughput: {result['requests_per_s']:,} req/s")
+    print(f"Latency: p50 {result['p50_ms']} ms  p95 {result['p95_ms']} ms  p99 {result['p99_ms']} ms")
+    print(f"Statuses: {result['statuses']}")
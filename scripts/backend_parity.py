@@ -0,0 +1,142 @@
+import argparse
+import json
+import platform
+import sys
+import time
+from datetime import datetime
+from functools import lru_cache
+
+import pandas as pd
+
+from build_canonical_dataset import build_player_table, clean_column_name, filter_match_rows
+from dataframe_backends import BACKENDS, available_backends, get_backend, sniff_separator
+from tennis_research import find_repo_root, get_file_encoding_type
+
+# ---------------------------
+# STAGES
+# ---------------------------
+# Each stage takes a backend and returns the frames it produced, read with
+# the same arguments the pipeline uses. A backend passes a stage when every
+# frame equals the pandas backend's (values and dtypes).
+def matches_load(backend, data_directory):
+    path = data_directory / "raw" / "matches" / "matches.csv"
+    encoding = get_file_encoding_type(path)
+    return [backend.read_csv(path, encoding=encoding, on_bad_lines="error", sep=sniff_separator(path, encoding))]
+
+@lru_cache(maxsize=1)
+def filtered_matches(data_directory):
+    """
+    The player_build input, prepared once so only the build is timed.
+    """
+    path = data_directory / "raw" / "matches" / "matches.csv"
+    df = pd.read_csv(path, sep=sniff_separator(path, get_file_encoding_type(path)))
+    df.columns = [clean_column_name(c) for c in df.columns]
+    return filter_match_rows(df)[0]
+
+def player_build(backend, data_directory):
+    return [build_player_table(filtered_matches(data_directory), backend)]
+
+def points_load(backend, data_directory):
+    files = sorted((data_directory / "raw" / "points").glob("*.csv")) + sorted((data_directory / "old_data" / "points").glob("*.csv"))
+    return [backend.read_csv(p, encoding=get_file_encoding_type(p), on_bad_lines="error", dtype={"TbSet": "boolean"}) for p in files]
+
+def stats_load(backend, data_directory):
+    return [backend.read_csv(p) for p in sorted((data_directory / "raw" / "stats").glob("*.csv"))]
+
+def summary_load(backend, data_directory):
+    """
+    data_summary.py's read of every raw CSV/TSV, separator sniffed first.
+    """
+    files = sorted(f for f in (data_directory / "raw").rglob("*") if f.suffix.lower() == ".csv")
+    frames = []
+    for p in files:
+        encoding = get_file_encoding_type(p)
+        frames.append(backend.read_csv(p, sep=sniff_separator(p, encoding), on_bad_lines="error", encoding=encoding))
+    return frames
+
+STAGES = {"matches_load": matches_load, "player_build": player_build, "points_load": points_load, "stats_load": stats_load, "summary_load": summary_load}
+
+def frames_equal(expected, actual):
+    """
+    None when the frame lists are identical, else the first difference.
+    """
+    if len(expected) != len(actual):
+        return f"{len(actual)} frames, expected {len(expected)}"
+    for i, (a, b) in enumerate(zip(expected, actual)):
+        try:
+            pd.testing.assert_frame_equal(a, b)
+        except AssertionError as e:
+            return f"frame {i}: {str(e).strip().splitlines()[0]}"
+    return None
+
+def run_stage(stage, backend_name, data_directory, repeats):
+    """
+    Best-of-`repeats` time and the frames of the last run.
+    """
+    best = float("inf")
+    for _ in range(repeats):
+        backend = get_backend(backend_name)
+        start = time.perf_counter()
+        frames = STAGES[stage](backend, data_directory)
+        best = min(best, time.perf_counter() - start)
+    return best, frames, backend.fallbacks
+
+
+if __name__ == "__main__":
+    root = find_repo_root()
+    data_directory = root / "data"
+    benchmark_directory = root / "data" / "processed" / "benchmarks"
+
+    parser = argparse.ArgumentParser(description="Check that every dataframe backend matches pandas stage by stage, and time them.")
+    parser.add_argument("--backends", nargs="+", choices=list(BACKENDS), default=list(BACKENDS),
+                        help="Backends that aren't installed are reported as skipped")
+    parser.add_argument("--stages", nargs="+", choices=list(STAGES), default=list(STAGES))
+    parser.add_argument("--repeats", type=int, default=3, help="Runs per stage and backend; the fastest is kept")
+    args = parser.parse_args()
+
+    print(f"[INFO] - Repository Root: {root}")
+    print(f"[INFO] - Backends: {', '.join(args.backends)} (installed: {', '.join(available_backends())})")
+    installed = available_backends()
+    results, failures = [], 0
+    for stage in args.stages:
+        reference_s, reference, _ = run_stage(stage, "pandas", data_directory, args.repeats)
+        for backend_name in args.backends:
+            if backend_name not in installed:
+                results.append({
+                    "stage": stage, "backend": backend_name, "seconds": None, "speedup": None, "fallbacks": None,
+                    "parity": None, "status": f"skipped ({BACKENDS[backend_name].requires} not installed)", "difference": None,
+                })
+                continue
+            if backend_name == "pandas":
+                seconds, difference, fallbacks = reference_s, None, 0
+            else:
+                seconds, frames, fallbacks = run_stage(stage, backend_name, data_directory, args.repeats)
+                difference = frames_equal(reference, frames)
+            failures += difference is not None
+            results.append({
+                "stage": stage, "backend": backend_name, "seconds": round(seconds, 4),
+                "speedup": round(reference_s / seconds, 2) if seconds else None,
+                "fallbacks": fallbacks, "parity": difference is None,
+                "status": "ok" if difference is None else "differs", "difference": difference,
+            })
+
+    table = pd.DataFrame(results)
+    print("\n----------- BACKEND PARITY -------------")
+    print(table.drop(columns=["difference"]).to_string(index=False))
+    for r in results:
+        if r["status"] == "differs":
+            print(f"[ERROR] - {r['backend']} differs from pandas in {r['stage']}: {r['difference']}")
+
+    benchmark_directory.mkdir(parents=True, exist_ok=True)
+    results_path = benchmark_directory / f"backends-{datetime.now():%Y%m%d-%H%M%S}.json"
+    results_path.write_text(json.dumps({
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "machine": platform.machine(),
+        "results": results,
+    }, indent=2))
+    print(f"[INFO] - Results written to: {results_path}")
+    if failures:
+        print(f"[FATAL] - {failures} stage/backend combinations differ from pandas")
+        sys.exit(1)
@@ -0,0 +1,237 @@
+import argparse
+import contextlib
+import io
+import json
+import platform
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from build_canonical_dataset import (
+    clean_column_name, clean_tennis_points, filter_match_rows, build_player_table, get_file_encoding_type,
+)
+from dataframe_backends import sniff_separator
+from match_simulator import load_player_point_probabilities
+from stage_profiler import reset_peak_rss, peak_rss_mb
+from tennis_research import find_repo_root
+
+# 1x is roughly one busy month of charting; 100x is past the real MCP size
+BASE_MATCHES = 200
+POINTS_PER_MATCH = 120
+JUNK_ROW_RATE = 0.02
+SCALES = {"1x": 1, "10x": 10, "100x": 100}
+
+FIRST_NAMES = ["Alex", "Maria", "Jan", "Sofia", "Luca", "Emma", "Tomas", "Nina", "Karen", "Hugo", "Ana", "Felix"]
+LAST_NAMES = ["Novak", "Silva", "Berg", "Rossi", "Kim", "Dubois", "Costa", "Meyer", "Ivanova", "Lopez", "Sato", "Walsh"]
+SERVE_CODES = ["4f2b3*", "6*", "5b27f1b2n#", "4#", "6f39b1@", "5f3s2v1*", "6n", "4f1f3f2b1w@"]
+
+# ---------------------------
+# SYNTHETIC DATA
+# ---------------------------
+def synthetic_name(i):
+    """
+    Distinct 'First Last' style names; letters only so normalize_name keeps
+    them distinct.
+    """
+    first = FIRST_NAMES[i % len(FIRST_NAMES)]
+    last = LAST_NAMES[(i // len(FIRST_NAMES)) % len(LAST_NAMES)]
+    i //= len(FIRST_NAMES) * len(LAST_NAMES)
+    suffix = ""
+    while i:
+        suffix += chr(ord("a") + i % 26)
+        i //= 26
+    return f"{first} {last}{suffix}"
+
+def generate_synthetic_data(output_directory, scale, seed=0):
+    """
+    Writes MCP-shaped matches, points and Overview stats files for
+    BASE_MATCHES * scale matches under output_directory (matches/, points/,
+    stats/). A small share of match rows are junk so the filter has work.
+    """
+    rng = np.random.default_rng(seed)
+    output_directory = Path(output_directory)
+    for sub in ["matches", "points", "stats"]:
+        (output_directory / sub).mkdir(parents=True, exist_ok=True)
+
+    n_matches = BASE_MATCHES * scale
+    n_players = max(50, n_matches // 4)
+    names = np.array([synthetic_name(i) for i in range(n_players)])
+    p1 = rng.integers(0, n_players, n_matches)
+    p2 = (p1 + rng.integers(1, n_players, n_matches)) % n_players
+    gender = rng.choice(["M", "W"], n_matches)
+    dates = pd.Timestamp("2015-01-01") + pd.to_timedelta(rng.integers(0, 3650, n_matches), unit="D")
+    date_str = dates.strftime("%Y%m%d").to_numpy()
+    match_ids = np.array([f"{d}-{g}-Synthetic_Open_{i}-R32-{a.replace(' ', '_')}-{b.replace(' ', '_')}"
+                          for i, (d, g, a, b) in enumerate(zip(date_str, gender, names[p1], names[p2]))])
+
+    matches = pd.DataFrame({
+        "match_id": match_ids, "Player 1": names[p1], "Player 2": names[p2],
+        "Pl 1 hand": rng.choice(["R", "L"], n_matches, p=[0.85, 0.15]), "Pl 2 hand": rng.choice(["R", "L"], n_matches, p=[0.85, 0.15]),
+        "Date": date_str, "Tournament": "Synthetic Open", "Round": "R32", "Time": "", "Court": "",
+        "Surface": rng.choice(["Hard", "Clay", "Grass"], n_matches, p=[0.55, 0.3, 0.15]),
+        "Umpire": "", "Best of": 3, "Final TB?": "Y", "Charted by": "bench",
+    })
+    junk = rng.random(n_matches) < JUNK_ROW_RATE
+    matches.loc[junk, "Surface"] = "Surface"
+    matches.to_csv(output_directory / "matches" / "matches.csv", index=False)
+
+    n_points = n_matches * POINTS_PER_MATCH
+    pt = np.tile(np.arange(1, POINTS_PER_MATCH + 1), n_matches)
+    game = (pt - 1) // 6
+    codes = rng.choice(SERVE_CODES, n_points)
+    fault = rng.random(n_points) < 0.35
+    points = pd.DataFrame({
+        "match_id": np.repeat(match_ids, POINTS_PER_MATCH), "Pt": pt,
+        "Set1": game // 12, "Set2": game // 13, "Gm1": game % 6, "Gm2": (game + 1) % 6, "Pts": "15-0",
+        "Gm#": game % 12 + 1, "TbSet": True, "Svr": game % 2 + 1,
+        "1st": np.where(fault, "4n", codes), "2nd": np.where(fault, codes, ""), "Notes": "",
+        "PtWinner": rng.integers(1, 3, n_points),
+    })
+    for g in ["m", "w"]:
+        mask = np.repeat(gender == g.upper(), POINTS_PER_MATCH)
+        points[mask].to_csv(output_directory / "points" / f"charting-{g}-points-synthetic.csv", index=False)
+
+    for g in ["m", "w"]:
+        rows = np.flatnonzero(gender == g.upper())
+        players = np.concatenate([names[p1[rows]], names[p2[rows]]])
+        serve_pts = rng.integers(40, 120, players.size)
+        first_in = (serve_pts * 0.62).astype(int)
+        stats = pd.DataFrame({
+            "match_id": np.concatenate([match_ids[rows]] * 2), "player": players, "set": "Total",
+            "serve_pts": serve_pts, "aces": rng.integers(0, 15, players.size), "dfs": rng.integers(0, 6, players.size),
+            "first_in": first_in, "first_won": (first_in * 0.72).astype(int),
+            "second_in": serve_pts - first_in, "second_won": ((serve_pts - first_in) * 0.5).astype(int),
+            "bk_pts": rng.integers(0, 10, players.size), "bp_saved": rng.integers(0, 5, players.size),
+            "return_pts": serve_pts[::-1], "return_pts_won": (serve_pts[::-1] * 0.38).astype(int),
+            "winners": 0, "winners_fh": 0, "winners_bh": 0, "unforced": 0, "unforced_fh": 0, "unforced_bh": 0,
+        })
+        stats.to_csv(output_directory / "stats" / f"{g}-stats-Overview.csv", index=False)
+
+    return {"matches": n_matches, "points": n_points}
+
+# ---------------------------
+# MEASUREMENT
+# ---------------------------
+def run_stage(name, func, *args, repeats=1):
+    """
+    Runs func (stdout silenced) `repeats` times and keeps the fastest wall
+    time. Returns (result, measurement dict).
+    """
+    best = None
+    result = None
+    for _ in range(repeats):
+        reset_peak_rss()
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = func(*args)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return result, {"stage": name, "wall_s": round(best, 4), "peak_rss_mb": round(peak_rss_mb(), 1)}
+
+def load_matches(matches_path):
+    encoding = get_file_encoding_type(matches_path)
+    df = pd.read_csv(matches_path, encoding=encoding, on_bad_lines="error", sep=sniff_separator(matches_path, encoding))
+    df.columns = [clean_column_name(c) for c in df.columns]
+    return df
+
+def ingest_points(points_directory, output_directory):
+    (Path(output_directory) / "points").mkdir(parents=True, exist_ok=True)
+    clean_tennis_points(points_directory, Path(output_directory))
+
+def benchmark_scale(scale_name, work_directory, repeats=1):
+    """
+    Generates one synthetic dataset and times every pipeline stage on it.
+    """
+    data_directory = Path(work_directory) / scale_name / "raw"
+    output_directory = Path(work_directory) / scale_name / "canonical"
+    sizes = generate_synthetic_data(data_directory, SCALES[scale_name])
+    print(f"[INFO] - {scale_name}: {sizes['matches']:,} matches, {sizes['points']:,} points")
+
+    results = []
+    df, m = run_stage("load", load_matches, data_directory / "matches" / "matches.csv", repeats=repeats)
+    results.append(m)
+    (df, _), m = run_stage("filter", filter_match_rows, df, repeats=repeats)
+    results.append(m)
+    _, m = run_stage("player_build", build_player_table, df, repeats=repeats)
+    results.append(m)
+    _, m = run_stage("point_ingest", ingest_points, data_directory / "points", output_directory, repeats=repeats)
+    results.append(m)
+    _, m = run_stage("stats_parse", load_player_point_probabilities, data_directory / "stats", repeats=repeats)
+    results.append(m)
+
+    for m in results:
+        m["scale"] = scale_name
+        m.update(sizes)
+        print(f"  {m['stage']:<14} {m['wall_s']:>9.3f}s  {m['peak_rss_mb']:>8.1f} MB")
+    return results
+
+def compare_to_baseline(results, baseline, threshold):
+    """
+    Returns the list of (scale, stage, baseline_s, current_s) where the
+    current wall time exceeds baseline * (1 + threshold).
+    """
+    base = {(b["scale"], b["stage"]): b for b in baseline["results"]}
+    regressions = []
+    for r in results:
+        b = base.get((r["scale"], r["stage"]))
+        if b and r["wall_s"] > b["wall_s"] * (1 + threshold):
+            regressions.append((r["scale"], r["stage"], b["wall_s"], r["wall_s"]))
+    return regressions
+
+
+if __name__ == "__main__":
+    root = find_repo_root()
+    benchmark_directory = root / "data" / "processed" / "benchmarks"
+    baseline_path = benchmark_directory / "baseline.json"
+
+    parser = argparse.ArgumentParser(description="Benchmark the canonical data pipeline on synthetic MCP-shaped data.")
+    parser.add_argument("--scales", nargs="+", choices=list(SCALES), default=["1x", "10x"])
+    parser.add_argument("--repeats", type=int, default=1, help="Runs per stage; the fastest is kept")
+    parser.add_argument("--threshold", type=float, default=0.25, help="Allowed slowdown vs baseline (0.25 = 25%%)")
+    parser.add_argument("--save-baseline", action="store_true", help="Store this run as the new baseline")
+    parser.add_argument("--keep-data", action="store_true", help="Keep the generated synthetic data")
+    args = parser.parse_args()
+
+    print(f"[INFO] - Repository Root: {root}")
+    work_directory = Path(tempfile.mkdtemp(prefix="pipeline-bench-"))
+    try:
+        results = []
+        for scale_name in args.scales:
+            results.extend(benchmark_scale(scale_name, work_directory, args.repeats))
+    finally:
+        if args.keep_data:
+            print(f"[INFO] - Synthetic data kept in: {work_directory}")
+        else:
+            shutil.rmtree(work_directory, ignore_errors=True)
+
+    run = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "machine": platform.machine(),
+        "results": results,
+    }
+    benchmark_directory.mkdir(parents=True, exist_ok=True)
+    results_path = benchmark_directory / f"results-{datetime.now():%Y%m%d-%H%M%S}.json"
+    results_path.write_text(json.dumps(run, indent=2))
+    print(f"[INFO] - Results written to: {results_path}")
+
+    if args.save_baseline:
+        baseline_path.write_text(json.dumps(run, indent=2))
+        print(f"[INFO] - Baseline written to: {baseline_path}")
+    elif baseline_path.exists():
+        regressions = compare_to_baseline(results, json.loads(baseline_path.read_text()), args.threshold)
+        if regressions:
+            print(f"[ERROR] - {len(regressions)} stage(s) regressed more than {args.threshold:.0%}:")
+            for scale_name, stage, before, after in regressions:
+                print(f"  {scale_name} {stage}: {before:.3f}s -> {after:.3f}s")
+            sys.exit(1)
+        print(f"[INFO] - No stage regressed more than {args.threshold:.0%} against the baseline")
+    else:
+        print("[WARN] - No baseline found; run with --save-baseline to create one")
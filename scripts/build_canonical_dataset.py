@@ -1,63 +1,19 @@
+import argparse
+import numpy as np
 import pandas as pd
+from datetime import datetime
 from pathlib import Path
-import csv
-import hashlib
-import unicodedata
+import os
 import re
 
-def find_repo_root(start_path=None):
-    """
-    Walk upward until a .git directory is found.
-    Returns the repo root as a Path.
-    """
-    current = Path(start_path or __file__).resolve()
-    for parent in [current] + list(current.parents):
-        if (parent / ".git").exists():
-            return parent
-    raise RuntimeError("Not inside a Git repository")
+from canonical_snapshots import SnapshotStore
+from dataframe_backends import available_backends, get_backend, sniff_separator
+from stage_profiler import StageProfiler
+# normalize_name and generate_player_id moved to tennis_research; they are
+# still importable from here
+from tennis_research import find_repo_root, get_file_encoding_type, normalize_name, generate_player_id
 
-def get_file_encoding_type(file_path):
-    """
-    Tries common text encodings and returns the first one that successfully
-    reads the CSV header.
-    """
-    file_path = Path(file_path).resolve()
-    encodings = ["utf-8", "cp1252", "latin-1"]
-
-    for enc in encodings:
-        try:
-            with open(file_path, newline="", encoding=enc) as f:
-                reader = csv.reader(f)
-                next(reader)  # Try reading header
-            return enc
-        except UnicodeDecodeError:
-            continue
-
-    raise UnicodeDecodeError(
-        "utf-8",
-        b"",
-        0,
-        1,
-        f"Could not determine encoding for file: {file_path}"
-    )
-
-def normalize_name(name: str) -> str:
-    if pd.isna(name):
-        return None
-    name = str(name).strip()
-    # Remove accents
-    name = unicodedata.normalize("NFKD", name)
-    name = "".join(c for c in name if not unicodedata.combining(c))
-    name = name.lower()
-    # Remove punctuation except spaces
-    name = re.sub(r"[^a-z\s]", " ", name)
-    # Collapse whitespace
-    name = re.sub(r"\s+", " ", name).strip()
-    return name
-
-def generate_player_id(canonical_name: str) -> str:
-    h = hashlib.sha1(canonical_name.encode("utf-8")).hexdigest()
-    return f"p_{h[:8]}"
+POINTS_RENAME_MAP = {"gm#": "game_num", "1st": "first_srv", "2nd": "second_srv", "svr": "server", "tbset": "tb_set"}
 
 # Add a helper to get gender from match_id
 def get_gender_from_match_id(match_id: str) -> str:
@@ -112,8 +68,84 @@ def is_real_match_row(row):
 
     return True
 
+def filter_match_rows(df):
+    """
+    Keeps only real match rows (see is_real_match_row).
+    Returns (kept rows, removed rows).
+    """
+    keep = df.apply(is_real_match_row, axis=1)
+    return df[keep].copy(), df[~keep]
+
+def build_player_table(df, backend=None):
+    """
+    One row per canonical player name across both sides of every match,
+    with first/last seen dates and a stable player_id. The grouping runs on
+    `backend` (a dataframe_backends backend, pandas by default).
+    """
+    backend = backend or get_backend()
+    # Rows in match order, side 1 before side 2, so 'first' picks the same
+    # display name / handedness a row-by-row walk would
+    gender = df["match_id"].map(get_gender_from_match_id).to_numpy()
+    sides = []
+    for side in [1, 2]:
+        display_name = df[f"player_{side}"].map(lambda v: str(v).strip())
+        sides.append(pd.DataFrame({
+            "display_name": display_name.to_numpy(dtype=object),
+            "canonical_name": display_name.map(normalize_name).to_numpy(dtype=object),
+            "handedness": df[f"pl_{side}_hand"].to_numpy() if f"pl_{side}_hand" in df else None,
+            "date": df["date"].to_numpy() if "date" in df else None,
+            "gender": gender,
+            "order": np.arange(len(df)) * 2 + side - 1,
+        }))
+    players_df = pd.concat(sides, ignore_index=True).sort_values("order", kind="stable").drop(columns="order").reset_index(drop=True)
+    failed = players_df["canonical_name"].map(lambda n: not n)
+    if failed.any():
+        print("[FATAL] - Failed to canonicalize name:", players_df.loc[failed.idxmax(), "display_name"])
+        quit()
+
+    players = backend.group_agg(players_df, "canonical_name", {"display_name": ("display_name", "first"), "handedness": ("handedness", "first"), "gender": ("gender", "first"), "first_seen": ("date", "min"), "last_seen": ("date", "max")})
+
+    players["player_id"] = players["canonical_name"].apply(generate_player_id)
+
+    players = players[
+        ["player_id", "canonical_name", "display_name",
+         "handedness", "gender", "first_seen", "last_seen"]
+    ]
+    return players
+
 
-def clean_tennis_matches(path, output_directory):
+def publish_atomic(frames):
+    """
+    Writes {path: DataFrame} (CSV, or Parquet by suffix) so readers never
+    see a half-written file: every frame goes to a temp file in its target
+    directory first, then all are renamed into place together.
+    """
+    staged = []
+    try:
+        for path, df in frames.items():
+            path = Path(path)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_name(f".{path.name}.tmp-{os.getpid()}")
+            staged.append((tmp_path, path))
+            if path.suffix == ".parquet":
+                df.to_parquet(tmp_path, index=False)
+            else:
+                df.to_csv(tmp_path, index=False)
+    except BaseException:
+        for tmp_path, _ in staged:
+            tmp_path.unlink(missing_ok=True)
+        raise
+    for tmp_path, path in staged:
+        os.replace(tmp_path, path)
+
+def clean_tennis_matches(path, output_directory, verbose=False, profiler=None, backend=None):
+    """
+    Builds the canonical players and matches tables from the MCP matches file.
+    Stage timings go to `profiler` (a StageProfiler); removed rows are only
+    dumped when verbose is set. Loading and grouping run on `backend`.
+    """
+    profiler = profiler or StageProfiler()
+    backend = backend or get_backend()
     file_path = Path(path)
     if not file_path.exists():
         print(f"[ERROR] - Directory does not exist: {file_path}")
@@ -123,11 +155,15 @@ def clean_tennis_matches(path, output_directory):
         print(f"[FATAL] - File path is not a file: {path}")
         quit()
 
-    try:
-        df = pd.read_csv(file_path, encoding=get_file_encoding_type(file_path), on_bad_lines="error", sep=None, engine="python")
-    except Exception as e:
-        print(f"[FATAL] - Failed to load {file_path.name}: {e}")
-        quit()
+    with profiler.stage("matches_load") as stage:
+        stage.add_file(file_path)
+        try:
+            encoding = get_file_encoding_type(file_path)
+            df = backend.read_csv(file_path, encoding=encoding, on_bad_lines="error", sep=sniff_separator(file_path, encoding))
+        except Exception as e:
+            print(f"[FATAL] - Failed to load {file_path.name}: {e}")
+            quit()
+        stage.add_rows(rows_out=len(df))
 
     print(f"Successfully loaded dataframe: {file_path.name} {df.shape}")
     df.columns = [clean_column_name(c) for c in df.columns]
@@ -135,42 +171,27 @@ def clean_tennis_matches(path, output_directory):
     # ---------------------------
     # FILTER BAD / HEADER ROWS
     # ---------------------------
-    before = df.copy()
-    df = df[df.apply(is_real_match_row, axis=1)].copy()  # keep only real match rows
-    after = df.copy()
-    removed_rows = before.loc[~before.index.isin(after.index)]
+    with profiler.stage("matches_filter") as stage:
+        stage.add_rows(rows_in=len(df))
+        df, removed_rows = filter_match_rows(df)
+        stage.add_rows(rows_out=len(df))
     print(f"[INFO] - Removed {len(removed_rows)} non-match rows")
-    print("[INFO] - Removed rows:")
-    print(removed_rows)
-    print(f"[INFO] - Remaining match rows: {len(after)}")
-    for _, r in removed_rows.iterrows():
-        print(r)
+    if verbose:
+        print("[INFO] - Removed rows:")
+        print(removed_rows)
+    print(f"[INFO] - Remaining match rows: {len(df)}")
+    if verbose:
+        for _, r in removed_rows.iterrows():
+            print(r)
 
 
     # ---------------------------
     # BUILD PLAYER TABLE
     # ---------------------------
-    player_rows = []
-    for _, row in df.iterrows():
-        gender = get_gender_from_match_id(row["match_id"])
-        for side in [1, 2]:
-            display_name = str(row[f"player_{side}"]).strip()
-            canonical_name = normalize_name(display_name)
-            if not canonical_name:
-                print("[FATAL] - Failed to canonicalize name:", display_name)
-                quit()
-            player_rows.append({"display_name": display_name, "canonical_name": canonical_name, "handedness": row.get(f"pl_{side}_hand"), "date": row.get("date"), "gender": gender})
-
-    players_df = pd.DataFrame(player_rows)
-
-    players = (players_df.groupby("canonical_name", as_index=False).agg(display_name=("display_name", "first"), handedness=("handedness", "first"), gender=("gender", "first"), first_seen=("date", "min"), last_seen=("date", "max")))
-
-    players["player_id"] = players["canonical_name"].apply(generate_player_id)
-
-    players = players[
-        ["player_id", "canonical_name", "display_name",
-         "handedness", "gender", "first_seen", "last_seen"]
-    ]
+    with profiler.stage("player_build") as stage:
+        stage.add_rows(rows_in=len(df))
+        players = build_player_table(df, backend)
+        stage.add_rows(rows_out=len(players))
 
     # ---------------------------
     # BUILD ID LOOKUP
@@ -183,18 +204,21 @@ def clean_tennis_matches(path, output_directory):
     # ---------------------------
     # REWRITE MATCHES
     # ---------------------------
-    df["player1_id"] = df["player_1"].apply(map_player)
-    df["player2_id"] = df["player_2"].apply(map_player)
-
-    df_clean = df.drop(
-        columns=["player_1", "player_2", "pl_1_hand", "pl_2_hand"],
-        errors="ignore"
-    )
-
-    # Reorder columns
-    front_cols = ["match_id", "player1_id", "player2_id"]
-    remaining = [c for c in df_clean.columns if c not in front_cols]
-    df_clean = df_clean[front_cols + remaining]
+    with profiler.stage("matches_rewrite") as stage:
+        stage.add_rows(rows_in=len(df))
+        df["player1_id"] = df["player_1"].apply(map_player)
+        df["player2_id"] = df["player_2"].apply(map_player)
+
+        df_clean = df.drop(
+            columns=["player_1", "player_2", "pl_1_hand", "pl_2_hand"],
+            errors="ignore"
+        )
+
+        # Reorder columns
+        front_cols = ["match_id", "player1_id", "player2_id"]
+        remaining = [c for c in df_clean.columns if c not in front_cols]
+        df_clean = df_clean[front_cols + remaining]
+        stage.add_rows(rows_out=len(df_clean))
 
     # ---------------------------
     # SAVE OUTPUTS
@@ -206,8 +230,9 @@ def clean_tennis_matches(path, output_directory):
     players_output_path = output_directory / "players" / "players.csv"
     matches_output_path = output_directory / "matches" / "matches.csv"
 
-    players.to_csv(players_output_path, index=False)
-    df_clean.to_csv(matches_output_path, index=False)
+    with profiler.stage("matches_write") as stage:
+        publish_atomic({players_output_path: players, matches_output_path: df_clean})
+        stage.add_rows(rows_out=len(players) + len(df_clean))
 
     # ---------------------------
     # SUMMARY
@@ -220,48 +245,102 @@ def clean_tennis_matches(path, output_directory):
     print("Matches written to:", matches_output_path)
 
 
-def clean_tennis_points(data_directory, output_directory):
+def clean_points_file(file_path, output_directory, verbose=False, profiler=None, backend=None):
+    """
+    Normalizes the column names of one points CSV and publishes it to
+    output_directory/points. Returns the number of points written.
+    """
+    profiler = profiler or StageProfiler()
+    backend = backend or get_backend()
+    file_path = Path(file_path)
+    enforced_data_type = {"TbSet": "boolean"}
+    with profiler.stage("points_load") as stage:
+        stage.add_file(file_path)
+        try:
+            df = backend.read_csv(file_path, encoding=get_file_encoding_type(file_path), on_bad_lines="error", dtype=enforced_data_type)
+        except Exception as e:
+            print(f"[FATAL] - Failed to load {file_path.name}: {e}")
+            quit()
+        df.columns = [c.strip().lower().replace(" ", "_") for c in df.columns]
+        df.rename(columns=POINTS_RENAME_MAP, inplace=True)
+        stage.add_rows(rows_out=len(df))
+    shape = df.shape
+    print(f"Successfully loaded dataframe: {file_path.name} ({shape[0]}x{shape[1]})")
+    if verbose:
+        print(df.head())
+        print(f"Column Names: {df.columns.to_list()}")
+
+    print(f"\n\n----------- SAVING -------------")
+    output_path = Path(output_directory) / "points" / file_path.name
+    with profiler.stage("points_write") as stage:
+        publish_atomic({output_path: df})
+        stage.add_rows(rows_out=len(df))
+    print(f"Points ({file_path.name}) written to: {output_path}")
+    return shape[0]
+
+def clean_tennis_points(data_directory, output_directory, verbose=False, profiler=None, backend=None):
+    """
+    Normalizes column names of every points CSV under data_directory and
+    writes them to output_directory/points. df.head() previews are only
+    printed when verbose is set.
+    """
+    profiler = profiler or StageProfiler()
     data_directory = Path(data_directory)
     if not data_directory.exists():
         print(f"[ERROR] - Directory does not exist: {data_directory}")
         return
 
-    rename_map = {"gm#": "game_num", "1st": "first_srv", "2nd": "second_srv", "svr": "server", "tbset": "tb_set"}
-    enforced_data_type = {"TbSet": "boolean"}
     total_points = 0
     for file_path in data_directory.rglob("*.csv"):
         if not file_path.is_file():
             print(f"[FATAL] - File path is not a file: {data_directory}")
             quit()
-        try:
-            df = pd.read_csv(file_path, encoding=get_file_encoding_type(file_path), on_bad_lines="error", dtype=enforced_data_type)
-        except Exception as e:
-            print(f"[FATAL] - Failed to load {file_path.name}: {e}")
-            quit()
-        shape = df.shape
-        print(f"Successfully loaded dataframe: {file_path.name} ({shape[0]}x{shape[1]})")
-        df.columns = [c.strip().lower().replace(" ", "_") for c in df.columns]
-        df.rename(columns=rename_map, inplace=True)
-        print(df.head())
-        print(f"Column Names: {df.columns.to_list()}")
-        total_points += shape[0]
-
-        print(f"\n\n----------- SAVING -------------")
-        output_path = output_directory / "points" / file_path.name
-        df.to_csv(output_path, index=False)
-        print(f"Points ({file_path.name}) written to: {output_path}")
+        total_points += clean_points_file(file_path, output_directory, verbose, profiler, backend)
 
     print(f"Total Number of Points: {total_points}") # 1,755,187 Point Records 01/29/2026
 
 
-if __name__ == "__main__":
+def main(argv=None, matches=True):
     root = find_repo_root()
     data_directory = root / "data" / "raw"
     output_data_directory = root / "data" / "canonical"
     matches_file = data_directory / "matches" / "matches.csv"
     points_directory = data_directory / "points"
+    report_directory = root / "data" / "processed" / "reports"
+
+    parser = argparse.ArgumentParser(description="Build the canonical players/matches (and optionally points) tables.")
+    if matches:
+        parser.add_argument("--points", action="store_true", help="Also rebuild the canonical points files")
+    parser.add_argument("--verbose", action="store_true", help="Dump removed rows and per-file previews")
+    parser.add_argument("--profile", action="store_true", help="Dump a cProfile file per stage next to the run report")
+    parser.add_argument("--report", default=None, help="Run report path (default data/processed/reports/canonical-build-<time>.json)")
+    parser.add_argument("--backend", choices=available_backends(), default="pandas", help="Dataframe engine for loading and grouping (output is identical)")
+    parser.add_argument("--snapshot", action="store_true", help="Record the built tables as a versioned snapshot (see canonical_snapshots.py)")
+    args = parser.parse_args(argv)
+    backend = get_backend(args.backend)
+
+    run_name = f"canonical-build-{datetime.now():%Y%m%d-%H%M%S}"
+    report_path = Path(args.report) if args.report else report_directory / f"{run_name}.json"
+    profiler = StageProfiler(report_directory / run_name if args.profile else None)
 
     print(f"[INFO] - Repository Root: {root}")
     print(f"[INFO] - Data Directory: {data_directory}")
-    clean_tennis_matches(matches_file, output_data_directory)
-    # clean_tennis_points(points_directory, output_data_directory)
\ No newline at end of file
+    print(f"[INFO] - Backend: {backend.name}")
+    if matches:
+        clean_tennis_matches(matches_file, output_data_directory, args.verbose, profiler, backend)
+    if not matches or args.points:
+        clean_tennis_points(points_directory, output_data_directory, args.verbose, profiler, backend)
+
+    profiler.print_summary()
+    profiler.write_report(report_path)
+    print(f"[INFO] - Run report written to: {report_path}")
+    if args.snapshot:
+        build_id = SnapshotStore(root / "data" / "processed" / "snapshots").snapshot(output_data_directory, label=run_name)
+        print(f"[INFO] - Snapshot: {build_id}")
+
+def points_main(argv=None):
+    main(argv, matches=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,535 @@
+import argparse
+import asyncio
+import json
+import time
+import urllib.parse
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.ipc as ipc
+
+from point_store import PointStore, load_canonical_points, write_point_store
+from tennis_research import find_repo_root, get_file_encoding_type
+
+HOST = "127.0.0.1"
+PORT = 8765
+CACHE_ENTRIES = 512
+# Results with more rows than this are streamed in batches instead of being
+# serialized (and cached) in one piece
+STREAM_ROWS = 5_000
+STREAM_BATCH = 2_000
+RELOAD_POLL_S = 5.0
+
+ARROW_STREAM_TYPE = "application/vnd.apache.arrow.stream"
+# End-of-stream marker of the Arrow IPC stream format
+ARROW_EOS = b"\xff\xff\xff\xff\x00\x00\x00\x00"
+
+# ---------------------------
+# COLUMNAR CACHE
+# ---------------------------
+# Every source CSV is converted once to an Arrow IPC file and memory-mapped
+# from then on, so a (re)load costs a page-in rather than a CSV parse. The
+# conversion reruns whenever the CSV is newer than its Arrow file.
+def arrow_cache_path(csv_path, cache_directory):
+    return Path(cache_directory) / f"{Path(csv_path).parent.name}-{Path(csv_path).stem}.arrow"
+
+def read_csv_table(csv_path):
+    df = pd.read_csv(csv_path, encoding=get_file_encoding_type(csv_path), dtype_backend="pyarrow")
+    return pa.Table.from_pandas(df, preserve_index=False)
+
+def load_columnar(csv_path, cache_directory):
+    """
+    Memory-mapped Arrow table for a CSV, converting it first if needed.
+    """
+    arrow_path = arrow_cache_path(csv_path, cache_directory)
+    if not arrow_path.exists() or arrow_path.stat().st_mtime < Path(csv_path).stat().st_mtime:
+        arrow_path.parent.mkdir(parents=True, exist_ok=True)
+        table = read_csv_table(csv_path)
+        tmp_path = arrow_path.with_suffix(".tmp")
+        with pa.OSFile(str(tmp_path), "wb") as sink, ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+        tmp_path.replace(arrow_path)
+    return ipc.open_file(pa.memory_map(str(arrow_path), "r")).read_all()
+
+def row_index(column):
+    """
+    value -> array of row positions for one Arrow column, built with a
+    single factorize + argsort rather than a Python loop over rows.
+    """
+    codes, uniques = pd.factorize(column.to_numpy(zero_copy_only=False))
+    order = np.argsort(codes, kind="stable")
+    bounds = np.searchsorted(codes[order], np.arange(len(uniques) + 1))
+    return {u: order[bounds[k]:bounds[k + 1]] for k, u in enumerate(uniques)}
+
+def concat_indexes(*indexes):
+    merged = {}
+    for index in indexes:
+        for key, rows in index.items():
+            merged[key] = np.concatenate([merged[key], rows]) if key in merged else rows
+    return {key: np.unique(rows) for key, rows in merged.items()}
+
+# ---------------------------
+# DATA
+# ---------------------------
+class CanonicalData:
+    """
+    One immutable, loaded generation of the canonical data: players and
+    matches tables, stats families (m and w files concatenated with a
+    gender column) and the point store, plus lookup indexes. Reloading
+    builds a new instance and swaps it in.
+    """
+
+    def __init__(self, sources, cache_directory):
+        self.sources = sources
+        self.fingerprint = source_fingerprint(sources)
+        self.generation = int(time.time() * 1000)
+
+        self.players = load_columnar(sources["players"], cache_directory)
+        self.matches = load_columnar(sources["matches"], cache_directory)
+        self.player_rows = {k: int(v[0]) for k, v in row_index(self.players["player_id"]).items()}
+        self.match_rows = {k: int(v[0]) for k, v in row_index(self.matches["match_id"]).items()}
+        self.matches_by_player = concat_indexes(row_index(self.matches["player1_id"]), row_index(self.matches["player2_id"]))
+
+        self.stats = {}
+        self.stats_by_match = {}
+        families = {}
+        for file_path in sources["stats"]:
+            gender, family = file_path.stem.split("-stats-")
+            families.setdefault(family, []).append((gender.upper(), file_path))
+        for family, files in sorted(families.items()):
+            tables = []
+            for gender, file_path in files:
+                table = load_columnar(file_path, cache_directory)
+                tables.append(table.append_column("gender", pa.array([gender] * len(table), pa.string())))
+            self.stats[family] = pa.concat_tables(tables, promote_options="permissive")
+            self.stats_by_match[family] = row_index(self.stats[family]["match_id"])
+
+        self.points = PointStore(sources["point_store"]) if sources.get("point_store") else None
+
+    def summary(self):
+        return {
+            "generation": self.generation,
+            "players": self.players.num_rows,
+            "matches": self.matches.num_rows,
+            "point_matches": len(self.points) if self.points is not None else 0,
+            "stats_families": sorted(self.stats),
+        }
+
+def source_fingerprint(sources):
+    """
+    (path, mtime, size) of every source; a change means a rebuild happened.
+    """
+    paths = [sources["players"], sources["matches"]] + list(sources["stats"])
+    if sources.get("point_store"):
+        paths.append(Path(sources["point_store"]) / "store.json")
+    return tuple((str(p), p.stat().st_mtime_ns, p.stat().st_size) for p in map(Path, paths) if p.exists())
+
+def discover_sources(root, point_store_directory=None):
+    return {
+        "players": root / "data" / "canonical" / "players" / "players.csv",
+        "matches": root / "data" / "canonical" / "matches" / "matches.csv",
+        "stats": sorted((root / "data" / "raw" / "stats").glob("*-stats-*.csv")),
+        "point_store": point_store_directory,
+    }
+
+# ---------------------------
+# RESPONSE CACHE
+# ---------------------------
+class ResponseCache:
+    """
+    LRU cache of serialized responses. Keys include the data generation, so
+    a reload can never serve a stale body; clear() also frees the memory.
+    """
+
+    def __init__(self, max_entries=CACHE_ENTRIES):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def put(self, key, entry):
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def clear(self):
+        self.entries.clear()
+
+# ---------------------------
+# QUERIES
+# ---------------------------
+class NotFound(Exception):
+    pass
+
+class BadRequest(Exception):
+    pass
+
+def page(table, query):
+    try:
+        offset = int(query.get("offset", 0))
+        limit = int(query["limit"]) if "limit" in query else None
+    except ValueError:
+        raise BadRequest("limit and offset must be integers")
+    return table.slice(offset, limit)
+
+def equals_filter(table, query, columns):
+    mask = None
+    for column in columns:
+        if column in query and column in table.column_names:
+            value = query[column]
+            target = table[column]
+            if pa.types.is_integer(target.type):
+                if not value.lstrip("-").isdigit():
+                    raise BadRequest(f"{column} must be an integer")
+                value = int(value)
+            condition = pc.equal(target, value)
+            mask = condition if mask is None else pc.and_(mask, condition)
+    return table if mask is None else table.filter(mask)
+
+def query_players(data, query):
+    table = equals_filter(data.players, query, ["gender", "handedness"])
+    if "name" in query:
+        table = table.filter(pc.match_substring(table["canonical_name"], query["name"].lower()))
+    return page(table, query)
+
+def query_player(data, player_id):
+    if player_id not in data.player_rows:
+        raise NotFound(f"Unknown player: {player_id}")
+    return data.players.slice(data.player_rows[player_id], 1).to_pylist()[0]
+
+def query_player_matches(data, player_id, query):
+    if player_id not in data.player_rows:
+        raise NotFound(f"Unknown player: {player_id}")
+    rows = data.matches_by_player.get(player_id, np.empty(0, dtype=np.int64))
+    return page(data.matches.take(rows), query)
+
+def query_matches(data, query):
+    table = data.matches
+    if "player" in query:
+        table = table.take(data.matches_by_player.get(query["player"], np.empty(0, dtype=np.int64)))
+    table = equals_filter(table, query, ["tournament", "surface", "round", "charted_by", "date"])
+    if "year" in query:
+        if not query["year"].isdigit():
+            raise BadRequest("year must be an integer")
+        year = int(query["year"])
+        table = table.filter(pc.equal(pc.divide(table["date"], 10_000), year))
+    return page(table, query)
+
+def query_match(data, match_id):
+    if match_id not in data.match_rows:
+        raise NotFound(f"Unknown match: {match_id}")
+    return data.matches.slice(data.match_rows[match_id], 1).to_pylist()[0]
+
+def query_points(data, match_id, query):
+    if data.points is None or match_id not in data.points:
+        raise NotFound(f"No points for match: {match_id}")
+    return page(pa.Table.from_pandas(data.points.match_frame(match_id), preserve_index=False), query)
+
+def query_stats(data, family, query):
+    if family not in data.stats:
+        raise NotFound(f"Unknown stats family: {family}")
+    table = data.stats[family]
+    if "match_id" in query:
+        table = table.take(data.stats_by_match[family].get(query["match_id"], np.empty(0, dtype=np.int64)))
+    table = equals_filter(table, query, ["player", "row", "gender"])
+    return page(table, query)
+
+def aggregate_matches(data, query):
+    """
+    Match counts grouped by any of date-derived year, gender (from the
+    match id), tournament, surface, round and charted_by.
+    """
+    by = [c for c in query.get("by", "year").split(",") if c]
+    table = data.matches
+    extra = {"year": lambda t: pc.divide(t["date"], 10_000),
+             "gender": lambda t: pc.utf8_slice_codeunits(t["match_id"], 9, 10)}
+    for column in by:
+        if column in extra:
+            table = table.append_column(column, extra[column](table))
+        elif column not in table.column_names:
+            raise BadRequest(f"Cannot group matches by: {column}")
+    result = table.group_by(by).aggregate([("match_id", "count")]).rename_columns(by + ["matches"])
+    return result.sort_by([(c, "ascending") for c in by])
+
+def aggregate_stats(data, family, query):
+    """
+    Sums of every numeric column of a stats family over its 'Total' rows,
+    grouped by player (default) or gender.
+    """
+    if family not in data.stats:
+        raise NotFound(f"Unknown stats family: {family}")
+    by = [c for c in query.get("by", "player").split(",") if c]
+    table = data.stats[family]
+    if any(c not in table.column_names for c in by):
+        raise BadRequest(f"Cannot group {family} by: {query.get('by')}")
+    if "row" in table.column_names:
+        table = table.filter(pc.equal(table["row"].cast(pa.string()), "Total"))
+    numeric = [f.name for f in table.schema if pa.types.is_integer(f.type) or pa.types.is_floating(f.type)]
+    aggregates = [("match_id", "count")] + [(c, "sum") for c in numeric if c not in by]
+    result = table.group_by(by).aggregate(aggregates)
+    result = result.rename_columns(by + ["matches"] + [c for c in numeric if c not in by])
+    return page(result.sort_by([(c, "ascending") for c in by]), query)
+
+def route(data, method, path, query):
+    """
+    Dispatches one request to its query. Returns a pa.Table (row results)
+    or a plain dict / list.
+    """
+    parts = [urllib.parse.unquote(p) for p in path.strip("/").split("/") if p]
+    if method != "GET":
+        raise BadRequest(f"Unsupported method: {method}")
+    match parts:
+        case [] | ["health"]:
+            return data.summary()
+        case ["players"]:
+            return query_players(data, query)
+        case ["players", player_id]:
+            return query_player(data, player_id)
+        case ["players", player_id, "matches"]:
+            return query_player_matches(data, player_id, query)
+        case ["matches"]:
+            return query_matches(data, query)
+        case ["matches", match_id]:
+            return query_match(data, match_id)
+        case ["points"]:
+            match_ids = data.points.match_ids if data.points is not None else np.empty(0, dtype=str)
+            return page(pa.table({"match_id": pa.array(match_ids, pa.string())}), query)
+        case ["matches", match_id, "points"]:
+            return query_points(data, match_id, query)
+        case ["stats"]:
+            return {family: table.num_rows for family, table in data.stats.items()}
+        case ["stats", family]:
+            return query_stats(data, family, query)
+        case ["aggregates", "matches"]:
+            return aggregate_matches(data, query)
+        case ["aggregates", "stats", family]:
+            return aggregate_stats(data, family, query)
+    raise NotFound(f"No route for: /{'/'.join(parts)}")
+
+# ---------------------------
+# SERIALIZATION
+# ---------------------------
+def json_bytes(value):
+    return json.dumps(value, default=str, separators=(",", ":")).encode()
+
+def iter_json_table(table):
+    yield b"["
+    first = True
+    for batch in table.to_batches(max_chunksize=STREAM_BATCH):
+        rows = batch.to_pylist()
+        if not rows:
+            continue
+        body = json_bytes(rows)[1:-1]
+        yield body if first else b"," + body
+        first = False
+    yield b"]"
+
+def iter_arrow_table(table):
+    """
+    Arrow IPC stream: the schema message, one message per record batch and
+    the end-of-stream marker, so the client can decode batch by batch.
+    """
+    yield table.schema.serialize().to_pybytes()
+    for batch in table.to_batches(max_chunksize=STREAM_BATCH):
+        yield batch.serialize().to_pybytes()
+    yield ARROW_EOS
+
+# ---------------------------
+# SERVER
+# ---------------------------
+STATUS_TEXT = {200: "OK", 400: "Bad Request", 404: "Not Found", 500: "Internal Server Error"}
+
+class CanonicalAPI:
+    """
+    Minimal asyncio HTTP/1.1 server (keep-alive, chunked streaming) over a
+    CanonicalData generation. Queries run on the event loop: they are index
+    lookups and Arrow kernels on memory-mapped columns, short enough that
+    handing them to threads would cost more than it saves.
+    """
+
+    def __init__(self, loader, cache_entries=CACHE_ENTRIES):
+        self.loader = loader
+        self.data = loader()
+        self.cache = ResponseCache(cache_entries)
+        self.requests = 0
+        self._reloading = asyncio.Lock()
+
+    async def reload(self, force=False):
+        """
+        Loads a new generation off the event loop and swaps it in when the
+        sources changed (or force is set). Returns True if swapped.
+        """
+        async with self._reloading:
+            if not force and source_fingerprint(self.data.sources) == self.data.fingerprint:
+                return False
+            data = await asyncio.to_thread(self.loader)
+            self.data = data
+            self.cache.clear()
+            print(f"[INFO] - Reloaded canonical data (generation {data.generation})")
+            return True
+
+    async def watch(self, interval):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.reload()
+            except Exception as e:
+                print(f"[WARN] - Reload failed, keeping the current generation: {e}")
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b"\r\n\r\n")
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                    break
+                lines = head.decode("latin-1").split("\r\n")
+                try:
+                    method, target, version = lines[0].split(" ", 2)
+                except ValueError:
+                    break
+                headers = {k.strip().lower(): v.strip() for k, _, v in (l.partition(":") for l in lines[1:] if l)}
+                if headers.get("content-length"):
+                    await reader.readexactly(int(headers["content-length"]))
+                keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                await self.respond(writer, method, target, headers, keep_alive)
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def respond(self, writer, method, target, headers, keep_alive):
+        self.requests += 1
+        url = urllib.parse.urlsplit(target)
+        query = dict(urllib.parse.parse_qsl(url.query))
+        arrow = query.pop("format", "") == "arrow" or ARROW_STREAM_TYPE in headers.get("accept", "")
+
+        if method == "POST" and url.path.rstrip("/") == "/reload":
+            swapped = await self.reload(force=True)
+            return await self.send(writer, 200, json_bytes({"reloaded": swapped, **self.data.summary()}), "application/json", keep_alive)
+        if url.path.rstrip("/") == "/cache":
+            stats = {"entries": len(self.cache.entries), "hits": self.cache.hits, "misses": self.cache.misses, "requests": self.requests}
+            return await self.send(writer, 200, json_bytes(stats), "application/json", keep_alive)
+
+        data = self.data
+        key = (data.generation, method, url.path, tuple(sorted(query.items())), arrow)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return await self.send(writer, 200, cached[1], cached[0], keep_alive)
+
+        try:
+            result = route(data, method, url.path, query)
+        except NotFound as e:
+            return await self.send(writer, 404, json_bytes({"error": str(e)}), "application/json", keep_alive)
+        except BadRequest as e:
+            return await self.send(writer, 400, json_bytes({"error": str(e)}), "application/json", keep_alive)
+        except Exception as e:
+            print(f"[ERROR] - {method} {target}: {e}")
+            return await self.send(writer, 500, json_bytes({"error": "internal error"}), "application/json", keep_alive)
+
+        if isinstance(result, pa.Table):
+            content_type = ARROW_STREAM_TYPE if arrow else "application/json"
+            chunks = iter_arrow_table(result) if arrow else iter_json_table(result)
+            if result.num_rows > STREAM_ROWS:
+                return await self.stream(writer, chunks, content_type, keep_alive)
+            body = b"".join(chunks)
+        else:
+            content_type, body = "application/json", json_bytes(result)
+        self.cache.put(key, (content_type, body))
+        await self.send(writer, 200, body, content_type, keep_alive)
+
+    async def send(self, writer, status, body, content_type, keep_alive):
+        head = (
+            f"HTTP/1.1 {status} {STATUS_TEXT[status]}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+        )
+        writer.write(head.encode() + body)
+        await writer.drain()
+
+    async def stream(self, writer, chunks, content_type, keep_alive):
+        head = (
+            f"HTTP/1.1 200 OK\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Transfer-Encoding: chunked\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+        )
+        writer.write(head.encode())
+        for chunk in chunks:
+            if chunk:
+                writer.write(f"{len(chunk):x}\r\n".encode() + chunk + b"\r\n")
+                await writer.drain()
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+def ensure_point_store(root, store_directory):
+    """
+    Builds the point store from the canonical / slam points when it is
+    missing. Returns the directory, or None without any points files.
+    """
+    if (store_directory / "store.json").exists():
+        return store_directory
+    points_files = sorted(f for d in ["old_data", "canonical"] for f in (root / "data" / d / "points").glob("*.csv"))
+    if not points_files:
+        return None
+    print(f"[INFO] - Building point store from {len(points_files)} points files")
+    write_point_store(load_canonical_points(points_files), store_directory)
+    return store_directory
+
+async def serve(api, host, port, poll_interval):
+    server = await asyncio.start_server(api.handle_connection, host, port, backlog=1024)
+    print(f"[INFO] - Serving canonical data on http://{host}:{port} ({api.data.summary()['matches']:,} matches)")
+    watcher = asyncio.create_task(api.watch(poll_interval)) if poll_interval > 0 else None
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        if watcher:
+            watcher.cancel()
+
+
+if __name__ == "__main__":
+    root = find_repo_root()
+
+    parser = argparse.ArgumentParser(description="Local async HTTP API over the canonical data.")
+    parser.add_argument("--host", default=HOST, help="Bind address (local-only by default)")
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--cache-entries", type=int, default=CACHE_ENTRIES)
+    parser.add_argument("--poll", type=float, default=RELOAD_POLL_S, help="Seconds between rebuild checks (0 disables)")
+    parser.add_argument("--point-store", default=str(root / "data" / "processed" / "point_store"))
+    parser.add_argument("--no-points", action="store_true", help="Serve without the points endpoint")
+    args = parser.parse_args()
+
+    print(f"[INFO] - Repository Root: {root}")
+    store_directory = None if args.no_points else ensure_point_store(root, Path(args.point_store))
+    cache_directory = root / "data" / "processed" / "api_cache"
+    sources = discover_sources(root, store_directory)
+    for name in ("players", "matches"):
+        if not sources[name].exists():
+            print(f"[FATAL] - Missing canonical {name}: {sources[name]} (run build_canonical_dataset.py first)")
+            quit()
+
+    start = time.perf_counter()
+    api = CanonicalAPI(lambda: CanonicalData(sources, cache_directory), args.cache_entries)
+    print(f"[INFO] - Loaded in {time.perf_counter() - start:.2f}s: {api.data.summary()}")
+    try:
+        asyncio.run(serve(api, args.host, args.port, args.poll))
+    except KeyboardInterrupt:
+        print("[INFO] - Stopped")
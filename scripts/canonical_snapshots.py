@@ -0,0 +1,278 @@
+import argparse
+import hashlib
+import io
+import json
+import os
+import shutil
+from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+
+from tennis_research import find_repo_root
+
+SNAPSHOT_VERSION = 1
+
+# ---------------------------
+# TABLES
+# ---------------------------
+# Canonical tables kept in snapshots. Each is split into partitions so a
+# build that only adds this month's matches shares every other partition
+# with the previous build: matches by year, players by the first hex digit
+# of player_id (16 buckets). Paths are relative to data/canonical.
+def by_year(column):
+    return lambda df: df[column].astype(str).str[:4]
+
+def by_id_bucket(column):
+    return lambda df: "b" + df[column].astype(str).str[2]
+
+def single(df):
+    return pd.Series("all", index=df.index)
+
+TABLES = {
+    "players": {"path": "players/players.csv", "key": ["player_id"], "partition": by_id_bucket("player_id")},
+    "matches": {"path": "matches/matches.csv", "key": ["match_id"], "partition": by_year("match_id")},
+    "match_crosswalk": {"path": "crosswalk/match_crosswalk.csv", "key": ["slam_match_id", "mcp_match_id"], "partition": by_year("year")},
+    "match_duplicates": {"path": "crosswalk/match_duplicates.csv", "key": ["source", "match_id"], "partition": single},
+    "countries": {"path": "countries/countries.csv", "key": ["country_code"], "partition": single},
+    "player_countries": {"path": "countries/player_countries.csv", "key": ["player_id"], "partition": by_id_bucket("player_id")},
+}
+
+# ---------------------------
+# STORE
+# ---------------------------
+class SnapshotStore:
+    """
+    Immutable, versioned copies of the canonical tables.
+
+      objects/ab/<sha256>.csv      partition contents, stored once (read-only)
+      builds/<build_id>/           one directory per build: manifest.json and
+                                   <table>/<partition>.csv hard links to the
+                                   objects (copies where linking isn't possible)
+
+    A build is published by writing its manifest last, so a half-written
+    build is never listed. Partitions are written with every value kept as
+    text, so reading one back parses exactly like the canonical file did.
+    """
+
+    def __init__(self, store_directory):
+        self.store_directory = Path(store_directory)
+        self.objects_directory = self.store_directory / "objects"
+        self.builds_directory = self.store_directory / "builds"
+
+    # ---------------------------
+    # WRITE
+    # ---------------------------
+    def _put_object(self, data):
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.objects_directory / digest[:2] / f"{digest}.csv"
+        if not path.exists():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_name(f".{path.name}.tmp-{os.getpid()}")
+            tmp_path.write_bytes(data)
+            os.chmod(tmp_path, 0o444)
+            os.replace(tmp_path, path)
+        return digest, path
+
+    def _link(self, object_path, target):
+        target.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            os.link(object_path, target)
+        except OSError:
+            shutil.copyfile(object_path, target)
+            os.chmod(target, 0o444)
+
+    def snapshot(self, canonical_directory, label=None, tables=None):
+        """
+        Snapshots the current canonical tables. Returns the new build id, or
+        the latest build's id when nothing changed since it.
+        """
+        canonical_directory = Path(canonical_directory)
+        contents = {}
+        for table in tables or TABLES:
+            spec = TABLES[table]
+            path = canonical_directory / spec["path"]
+            if not path.exists():
+                print(f"[WARN] - {spec['path']} not found, not in this snapshot")
+                continue
+            df = pd.read_csv(path, dtype=str, keep_default_na=False)
+            partitions = {}
+            for name, part in df.groupby(spec["partition"](df), sort=True):
+                buffer = io.StringIO()
+                part.to_csv(buffer, index=False)
+                data = buffer.getvalue().encode("utf-8")
+                digest, object_path = self._put_object(data)
+                partitions[name] = {"object": digest, "rows": len(part), "bytes": len(data), "_path": object_path}
+            contents[table] = {"path": spec["path"], "key": spec["key"], "rows": len(df), "columns": list(df.columns), "partitions": partitions}
+
+        content_hash = hashlib.sha256(json.dumps(
+            {t: [c["columns"], {n: p["object"] for n, p in c["partitions"].items()}] for t, c in contents.items()}, sort_keys=True,
+        ).encode("utf-8")).hexdigest()
+        latest = self.latest()
+        if latest and self.manifest(latest)["content_hash"] == content_hash:
+            print(f"[INFO] - Canonical tables unchanged since build {latest}")
+            return latest
+
+        created = datetime.now()
+        build_id = f"{created:%Y%m%d-%H%M%S}-{content_hash[:8]}"
+        build_directory = self.builds_directory / build_id
+        staging = self.builds_directory / f".{build_id}.tmp-{os.getpid()}"
+        for table, content in contents.items():
+            for name, part in content["partitions"].items():
+                self._link(part.pop("_path"), staging / table / f"{name}.csv")
+        manifest = {
+            "version": SNAPSHOT_VERSION,
+            "build_id": build_id,
+            "created": created.isoformat(timespec="seconds"),
+            "parent": latest,
+            "label": label,
+            "content_hash": content_hash,
+            "tables": contents,
+        }
+        (staging / "manifest.json").write_text(json.dumps(manifest, indent=1))
+        os.replace(staging, build_directory)
+        return build_id
+
+    # ---------------------------
+    # READ
+    # ---------------------------
+    def builds(self):
+        """
+        Published build ids, oldest first.
+        """
+        if not self.builds_directory.exists():
+            return []
+        return sorted(p.name for p in self.builds_directory.iterdir() if (p / "manifest.json").exists())
+
+    def latest(self):
+        builds = self.builds()
+        return builds[-1] if builds else None
+
+    def manifest(self, build_id):
+        return json.loads((self.builds_directory / build_id / "manifest.json").read_text())
+
+    def resolve(self, as_of=None):
+        """
+        Build id for `as_of`: a build id (or unique prefix), an ISO date/time
+        (latest build created at or before it), or None for the latest.
+        """
+        builds = self.builds()
+        if not builds:
+            raise FileNotFoundError(f"No snapshots in {self.store_directory}")
+        if as_of is None:
+            return builds[-1]
+        matches = [b for b in builds if b.startswith(as_of)]
+        if len(matches) == 1:
+            return matches[0]
+        if len(matches) > 1:
+            raise LookupError(f"'{as_of}' matches {len(matches)} builds, give more of the id")
+        cutoff = datetime.fromisoformat(as_of)
+        eligible = [b for b in builds if datetime.strptime(b[:15], "%Y%m%d-%H%M%S") <= cutoff]
+        if not eligible:
+            raise LookupError(f"No build at or before {as_of} (first is {builds[0]})")
+        return eligible[-1]
+
+    def object_path(self, digest):
+        return self.objects_directory / digest[:2] / f"{digest}.csv"
+
+    def read_table(self, table, as_of=None, partitions=None, **read_kwargs):
+        """
+        A canonical table as of a build, optionally only some partitions
+        (e.g. partitions=["2024"] for matches). Rows come partition by
+        partition, in their original order within each.
+        """
+        content = self.manifest(self.resolve(as_of))["tables"][table]
+        names = [n for n in content["partitions"] if partitions is None or n in partitions]
+        # The partitions are joined as text and parsed once: parsed one by one,
+        # a column empty in some partition would come back with another dtype
+        header = (",".join(content["columns"]) + "\n").encode("utf-8")
+        body = [self.object_path(content["partitions"][n]["object"]).read_bytes().split(b"\n", 1)[1] for n in names]
+        return pd.read_csv(io.BytesIO(header + b"".join(body)), **read_kwargs)
+
+    def diff(self, build_a, build_b, tables=None):
+        """
+        Row-level changes per table from build_a to build_b. Partitions with
+        the same object are skipped without being read. Returns {table:
+        {"added", "removed", "changed": DataFrames, "partitions_read": n}}.
+        """
+        manifest_a, manifest_b = self.manifest(self.resolve(build_a)), self.manifest(self.resolve(build_b))
+        result = {}
+        for table in tables or sorted(set(manifest_a["tables"]) | set(manifest_b["tables"])):
+            parts_a = manifest_a["tables"].get(table, {}).get("partitions", {})
+            parts_b = manifest_b["tables"].get(table, {}).get("partitions", {})
+            changed = sorted(n for n in set(parts_a) | set(parts_b) if parts_a.get(n, {}).get("object") != parts_b.get(n, {}).get("object"))
+            key = TABLES[table]["key"]
+            read = lambda parts: pd.concat(
+                [pd.read_csv(self.object_path(parts[n]["object"]), dtype=str, keep_default_na=False) for n in changed if n in parts] or [pd.DataFrame(columns=key)],
+                ignore_index=True,
+            )
+            old, new = read(parts_a), read(parts_b)
+            merged = old.merge(new, on=key, how="outer", suffixes=("_a", "_b"), indicator=True)
+            both = merged[merged["_merge"] == "both"]
+            shared = [c for c in old.columns if c in new.columns and c not in key]
+            differs = pd.Series(False, index=both.index)
+            for c in shared:
+                differs |= both[f"{c}_a"] != both[f"{c}_b"]
+            result[table] = {
+                "added": new[new.set_index(key).index.isin(merged.loc[merged["_merge"] == "right_only"].set_index(key).index)],
+                "removed": old[old.set_index(key).index.isin(merged.loc[merged["_merge"] == "left_only"].set_index(key).index)],
+                "changed": both[differs].drop(columns="_merge"),
+                "partitions_read": len(changed),
+            }
+        return result
+
+    def disk_usage(self):
+        """
+        (bytes actually stored, bytes the builds would take as full copies).
+        """
+        stored = sum(p.stat().st_size for p in self.objects_directory.rglob("*.csv")) if self.objects_directory.exists() else 0
+        logical = sum(
+            part["bytes"]
+            for b in self.builds() for content in self.manifest(b)["tables"].values() for part in content["partitions"].values()
+        )
+        return stored, logical
+
+def main(argv=None):
+    root = find_repo_root()
+    canonical_directory = root / "data" / "canonical"
+    store = SnapshotStore(root / "data" / "processed" / "snapshots")
+
+    parser = argparse.ArgumentParser(description="Versioned, immutable snapshots of the canonical tables.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    snap = sub.add_parser("snapshot", help="Snapshot the current canonical tables")
+    snap.add_argument("--label", default=None)
+    sub.add_parser("list", help="List builds")
+    read = sub.add_parser("read", help="Read a table as of a build or date")
+    read.add_argument("table", choices=list(TABLES))
+    read.add_argument("--as-of", default=None, help="Build id (prefix) or ISO date/time; default latest")
+    read.add_argument("--partition", nargs="*", default=None)
+    diff = sub.add_parser("diff", help="Row-level changes between two builds")
+    diff.add_argument("build_a")
+    diff.add_argument("build_b", nargs="?", default=None, help="Default: latest build")
+    diff.add_argument("--table", nargs="*", choices=list(TABLES), default=None)
+    args = parser.parse_args(argv)
+
+    print(f"[INFO] - Repository Root: {root}")
+    if args.command == "snapshot":
+        build_id = store.snapshot(canonical_directory, args.label)
+        stored, logical = store.disk_usage()
+        print(f"[INFO] - Build: {build_id}")
+        print(f"[INFO] - {len(store.builds())} builds: {stored / 1e6:.1f} MB stored for {logical / 1e6:.1f} MB of snapshots")
+    elif args.command == "list":
+        for build_id in store.builds():
+            manifest = store.manifest(build_id)
+            rows = ", ".join(f"{t} {c['rows']:,}" for t, c in manifest["tables"].items())
+            print(f"{build_id}  {manifest['label'] or '':<16} {rows}")
+    elif args.command == "read":
+        build_id = store.resolve(args.as_of)
+        df = store.read_table(args.table, build_id, args.partition)
+        print(f"[INFO] - {args.table} as of {build_id}: {len(df):,} rows")
+        print(df.head(20).to_string(index=False))
+    elif args.command == "diff":
+        build_b = args.build_b or store.latest()
+        for table, changes in store.diff(args.build_a, build_b, args.table).items():
+            print(f"{table}: +{len(changes['added']):,} -{len(changes['removed']):,} ~{len(changes['changed']):,} ({changes['partitions_read']} partitions read)")
+
+
+if __name__ == "__main__":
+    main()
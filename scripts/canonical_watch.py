@@ -0,0 +1,315 @@
+import argparse
+import contextlib
+import io
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from fnmatch import fnmatch
+from pathlib import Path
+
+import pandas as pd
+
+from build_canonical_dataset import clean_tennis_matches, clean_points_file, publish_atomic
+from country_dimension import build_countries
+from match_linkage import link_records, load_mcp_records, load_player_index, load_slam_records
+from tennis_research import find_repo_root
+from validate_data import malformed_rows, quarantine_rows, read_source_file, validate_table
+
+WATCHED_DIRECTORIES = ["raw/matches", "raw/points", "raw/stats"]
+POLL_S = 0.5
+# A change is only acted on once the watched tree has been quiet this long
+# (copying a data drop touches many files), but never later than MAX_WAIT_S
+# after the first change.
+DEBOUNCE_S = 2.0
+MAX_WAIT_S = 30.0
+WORKERS = 4
+
+# ---------------------------
+# BUILDERS
+# ---------------------------
+# Each builder rebuilds one target from the data directory (and, for
+# per-file targets, one input file name) and publishes its outputs with
+# publish_atomic, so a failed or interrupted build leaves the previous
+# outputs in place.
+def build_matches(data_directory, file_name=None):
+    clean_tennis_matches(data_directory / "raw" / "matches" / "matches.csv", data_directory / "canonical")
+
+def build_crosswalk(data_directory, file_name=None):
+    index = load_player_index(data_directory / "canonical" / "players" / "players.csv")
+    records = pd.concat([
+        load_mcp_records(data_directory / "raw" / "matches" / "matches.csv", index),
+        load_slam_records(data_directory / "old_data" / "matches", index),
+    ], ignore_index=True)
+    links, duplicates = link_records(records)
+    crosswalk_directory = data_directory / "canonical" / "crosswalk"
+    publish_atomic({crosswalk_directory / "match_crosswalk.csv": links, crosswalk_directory / "match_duplicates.csv": duplicates})
+
+def build_points(data_directory, file_name):
+    clean_points_file(data_directory / "raw" / "points" / file_name, data_directory / "canonical")
+
+def build_country_dimension(data_directory, file_name=None):
+    build_countries(data_directory)
+
+def validate_into_quarantine(table, file_path, output_path, context):
+    """
+    Quarantined rows of one file, malformed lines included, published even
+    when empty (header only) so an earlier quarantine for the file is
+    replaced.
+    """
+    df, bad_lines = read_source_file(file_path)
+    violations, names, counts = validate_table(df, table, context)
+    quarantined = pd.concat([quarantine_rows(df, violations, names), malformed_rows(df, bad_lines)], ignore_index=True)
+    publish_atomic({output_path: quarantined})
+    print(f"[INFO] - {table} {file_path.name}: {len(quarantined):,} of {len(df) + len(bad_lines):,} rows quarantined ({len(bad_lines):,} malformed lines)")
+
+def validate_players(data_directory, file_name=None):
+    validate_into_quarantine("players", data_directory / "canonical" / "players" / "players.csv",
+                             data_directory / "processed" / "validation" / "quarantine" / "players-players.csv", {})
+
+def validate_stats(data_directory, file_name):
+    matches_file = data_directory / "raw" / "matches" / "matches.csv"
+    context = {}
+    if matches_file.exists():
+        context["match_ids"] = pd.Index(pd.read_csv(matches_file, usecols=["match_id"], dtype=str)["match_id"].dropna().unique())
+    validate_into_quarantine("stats", data_directory / "raw" / "stats" / file_name,
+                             data_directory / "processed" / "validation" / "quarantine" / f"stats-{file_name}", context)
+
+# ---------------------------
+# TARGETS
+# ---------------------------
+# Paths are relative to data/ and may be globs. A per-file target gets one
+# job per matching input ({name} in its outputs is that file's name); its
+# shared inputs rebuild every file. A target whose inputs are another
+# target's outputs only runs once that target's pending jobs have published.
+TARGETS = [
+    {"name": "canonical_matches", "build": build_matches, "inputs": ["raw/matches/matches.csv"],
+     "outputs": ["canonical/players/players.csv", "canonical/matches/matches.csv"]},
+    {"name": "match_crosswalk", "build": build_crosswalk,
+     "inputs": ["raw/matches/matches.csv", "canonical/players/players.csv", "old_data/matches/*-matches.csv"],
+     "outputs": ["canonical/crosswalk/match_crosswalk.csv", "canonical/crosswalk/match_duplicates.csv"]},
+    {"name": "canonical_points", "build": build_points, "per_file": True, "inputs": ["raw/points/*.csv"],
+     "outputs": ["canonical/points/{name}"]},
+    {"name": "country_dimension", "build": build_country_dimension, "inputs": ["canonical/players/players.csv", "old_data/matches/*-matches*.csv"],
+     "outputs": ["canonical/countries/countries.csv", "canonical/countries/player_countries.csv"]},
+    {"name": "players_validation", "build": validate_players, "inputs": ["canonical/players/players.csv"],
+     "outputs": ["processed/validation/quarantine/players-players.csv"]},
+    {"name": "stats_validation", "build": validate_stats, "per_file": True, "inputs": ["raw/stats/*.csv"],
+     "shared_inputs": ["raw/matches/matches.csv"], "outputs": ["processed/validation/quarantine/stats-{name}"]},
+]
+TARGETS_BY_NAME = {t["name"]: t for t in TARGETS}
+
+def reads_outputs_of(target, upstream):
+    """
+    True when one of target's inputs is (or matches) one of upstream's
+    outputs.
+    """
+    outputs = [o.format(name="*") for o in upstream["outputs"]]
+    inputs = target["inputs"] + target.get("shared_inputs", [])
+    return any(fnmatch(o, i) or fnmatch(i, o) for o in outputs for i in inputs)
+
+def topological_order(targets):
+    """
+    Target names with every target after the targets whose outputs it
+    reads; raises ValueError on a dependency cycle.
+    """
+    upstream = {t["name"]: {u["name"] for u in targets if u is not t and reads_outputs_of(t, u)} for t in targets}
+    order = []
+    while len(order) < len(targets):
+        ready = [t["name"] for t in targets if t["name"] not in order and upstream[t["name"]] <= set(order)]
+        if not ready:
+            raise ValueError(f"Dependency cycle among targets: {sorted(set(upstream) - set(order))}")
+        order.extend(ready)
+    return order, upstream
+
+TARGET_ORDER, UPSTREAM = topological_order(TARGETS)
+# Every target a target transitively reads from
+ANCESTORS = {}
+for name in TARGET_ORDER:
+    ANCESTORS[name] = set(UPSTREAM[name]).union(*(ANCESTORS[u] for u in UPSTREAM[name]))
+
+def job_outputs(job):
+    name, file_name = job
+    return [o.format(name=file_name) for o in TARGETS_BY_NAME[name]["outputs"]]
+
+def job_label(job):
+    return job[0] if job[1] is None else f"{job[0]}:{job[1]}"
+
+def affected_jobs(changed, data_directory):
+    """
+    Jobs (target name, file name or None) that depend on any of the changed
+    data-relative paths.
+    """
+    jobs = set()
+    for target in TARGETS:
+        for path in changed:
+            if any(fnmatch(path, pattern) for pattern in target["inputs"]):
+                jobs.add((target["name"], Path(path).name if target.get("per_file") else None))
+            if any(fnmatch(path, pattern) for pattern in target.get("shared_inputs", [])):
+                for pattern in target["inputs"]:
+                    jobs.update((target["name"], f.name) for f in sorted(data_directory.glob(pattern)))
+    return jobs
+
+def plan_wave(pending):
+    """
+    Pending jobs with no upstream target still pending, in topological
+    order. The rest wait for a later wave, so a job never reads an output
+    that is being rebuilt alongside it.
+    """
+    waiting = {name for name, _ in pending}
+    wave = [job for job in pending if not ANCESTORS[job[0]] & waiting]
+    return sorted(wave, key=lambda j: (TARGET_ORDER.index(j[0]), j[1] or ""))
+
+def stale_paths(data_directory):
+    """
+    Inputs whose outputs are missing or older than them, make-style; used
+    to catch up on changes made while nothing was watching.
+    """
+    changed = set()
+    for target in TARGETS:
+        for pattern in target["inputs"]:
+            for input_path in data_directory.glob(pattern):
+                file_name = input_path.name if target.get("per_file") else None
+                outputs = [data_directory / o for o in job_outputs((target["name"], file_name))]
+                if any(not o.exists() or o.stat().st_mtime < input_path.stat().st_mtime for o in outputs):
+                    changed.add(input_path.relative_to(data_directory).as_posix())
+    return changed
+
+# ---------------------------
+# REBUILD
+# ---------------------------
+def run_job(name, file_name, data_directory):
+    """
+    Runs one job with its output captured (jobs run side by side and the
+    builders are chatty). Returns (ok, seconds, log).
+    """
+    target = TARGETS_BY_NAME[name]
+    data_directory = Path(data_directory)
+    log = io.StringIO()
+    start = time.perf_counter()
+    try:
+        with contextlib.redirect_stdout(log):
+            if target.get("per_file") and not (data_directory / target["inputs"][0]).parent.joinpath(file_name).exists():
+                # Input deleted: retract its outputs
+                for output in job_outputs((name, file_name)):
+                    (data_directory / output).unlink(missing_ok=True)
+            else:
+                target["build"](data_directory, file_name)
+        ok = True
+    except BaseException as e:  # builders quit() on fatal input errors
+        print(f"[ERROR] - {type(e).__name__}: {e}", file=log)
+        ok = False
+    return ok, time.perf_counter() - start, log.getvalue()
+
+def rebuild(changed, data_directory, executor, verbose=False):
+    """
+    Rebuilds everything downstream of the changed paths in dependency
+    waves; jobs within a wave run concurrently, and a job only runs once
+    every pending upstream job has published. A failed job's dependents
+    are skipped. Returns (rebuilt, failed) job counts.
+    """
+    seen, rebuilt, failed = set(), 0, 0
+    failed_targets = set()
+    pending = affected_jobs(changed, data_directory)
+    while pending:
+        wave = plan_wave(pending)
+        pending.difference_update(wave)
+        seen.update(wave)
+        futures = {executor.submit(run_job, name, file_name, str(data_directory)): (name, file_name) for name, file_name in wave}
+        published = set()
+        for future in as_completed(futures):
+            job = futures[future]
+            ok, seconds, log = future.result()
+            if ok:
+                rebuilt += 1
+                published.update(job_outputs(job))
+                print(f"[INFO] - Rebuilt {job_label(job)} in {seconds:.2f}s")
+            else:
+                failed += 1
+                failed_targets.add(job[0])
+                print(f"[ERROR] - {job_label(job)} failed after {seconds:.2f}s, keeping its previous outputs")
+            if verbose or not ok:
+                print(log.rstrip())
+        pending.update(affected_jobs(published, data_directory) - seen)
+        for job in sorted((j for j in pending if ANCESTORS[j[0]] & failed_targets), key=job_label):
+            print(f"[WARN] - Skipping {job_label(job)}: an upstream job failed")
+            pending.discard(job)
+    return rebuilt, failed
+
+# ---------------------------
+# WATCH
+# ---------------------------
+def snapshot(data_directory):
+    """
+    (mtime, size) of every watched file; dot-files are partial writes or
+    editor temp files and are ignored.
+    """
+    files = {}
+    for directory in WATCHED_DIRECTORIES:
+        for file_path in (data_directory / directory).rglob("*"):
+            if file_path.is_file() and not file_path.name.startswith("."):
+                st = file_path.stat()
+                files[file_path.relative_to(data_directory).as_posix()] = (st.st_mtime_ns, st.st_size)
+    return files
+
+def changed_paths(before, after):
+    return {p for p, state in after.items() if before.get(p) != state} | (before.keys() - after.keys())
+
+def wait_for_quiet(data_directory, state, changed, poll=POLL_S, debounce=DEBOUNCE_S, max_wait=MAX_WAIT_S):
+    """
+    Keeps collecting changes until nothing has changed for `debounce`
+    seconds (or max_wait has passed). Returns (state, changed).
+    """
+    first = last_change = time.monotonic()
+    while time.monotonic() - last_change < debounce and time.monotonic() - first < max_wait:
+        time.sleep(poll)
+        current = snapshot(data_directory)
+        more = changed_paths(state, current)
+        if more:
+            changed |= more
+            state = current
+            last_change = time.monotonic()
+    return state, changed
+
+def watch(data_directory, executor, poll=POLL_S, debounce=DEBOUNCE_S, verbose=False):
+    state = snapshot(data_directory)
+    print(f"[INFO] - Watching {', '.join(WATCHED_DIRECTORIES)} ({len(state)} files, poll {poll}s, debounce {debounce}s)")
+    while True:
+        time.sleep(poll)
+        current = snapshot(data_directory)
+        changed = changed_paths(state, current)
+        if not changed:
+            continue
+        state, changed = wait_for_quiet(data_directory, current, changed, poll, debounce)
+        print(f"[INFO] - {len(changed)} changed: {', '.join(sorted(changed)[:5])}{' ...' if len(changed) > 5 else ''}")
+        start = time.perf_counter()
+        rebuilt, failed = rebuild(changed, data_directory, executor, verbose)
+        print(f"[INFO] - {rebuilt} outputs rebuilt, {failed} failed in {time.perf_counter() - start:.1f}s")
+
+def main(argv=None):
+    root = find_repo_root()
+    data_directory = root / "data"
+
+    parser = argparse.ArgumentParser(description="Watch the raw data and rebuild only the canonical outputs that depend on what changed.")
+    parser.add_argument("--workers", type=int, default=WORKERS, help="Concurrent rebuild processes")
+    parser.add_argument("--poll", type=float, default=POLL_S, help="Seconds between scans of the raw directories")
+    parser.add_argument("--debounce", type=float, default=DEBOUNCE_S, help="Quiet seconds required before rebuilding")
+    parser.add_argument("--once", action="store_true", help="Rebuild stale outputs and exit instead of watching")
+    parser.add_argument("--verbose", action="store_true", help="Print each job's builder output")
+    args = parser.parse_args(argv)
+
+    print(f"[INFO] - Repository Root: {root}")
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        stale = stale_paths(data_directory)
+        if stale:
+            print(f"[INFO] - Catching up on {len(stale)} stale inputs")
+            rebuilt, failed = rebuild(stale, data_directory, executor, args.verbose)
+            print(f"[INFO] - {rebuilt} outputs rebuilt, {failed} failed")
+        if args.once:
+            return
+        try:
+            watch(data_directory, executor, args.poll, args.debounce, args.verbose)
+        except KeyboardInterrupt:
+            print("[INFO] - Stopped watching")
+
+
+if __name__ == "__main__":
+    main()
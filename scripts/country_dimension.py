@@ -0,0 +1,209 @@
+import argparse
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from build_canonical_dataset import publish_atomic
+from match_linkage import load_player_index, player_ids
+from tennis_research import find_repo_root, get_file_encoding_type, normalize_name, generate_player_id
+
+# Nation columns in the slam matches files and the name column each one
+# belongs to
+NATION_COLUMNS = {"nation1": "player1", "nation2": "player2", "nation_partner1": "partner1", "nation_partner2": "partner2"}
+# countries.json (or the countries.csv data_summary.py writes from it): the
+# first column found supplies codes / names
+CODE_COLUMNS = ["ioc", "cioc", "ioc_code", "alpha3", "alpha_3", "cca3", "iso3", "code"]
+NAME_COLUMNS = ["name", "country", "country_name", "name.common", "common_name"]
+UNKNOWN_KEY = -1
+
+# ---------------------------
+# OBSERVATIONS
+# ---------------------------
+def load_nation_observations(matches_directory, index=None):
+    """
+    One row per (player, nation code) seen in a slam matches file, with the
+    year. Codes that aren't three letters (blank, 'N/A', ...) are dropped.
+    Names resolve through `index` (load_player_index()), so the abbreviated
+    names of the 2018+ files reach their canonical player.
+    """
+    frames = []
+    for file_path in sorted(Path(matches_directory).glob("*-matches*.csv")):
+        df = pd.read_csv(file_path, encoding=get_file_encoding_type(file_path), dtype=str)
+        for nation_column, name_column in NATION_COLUMNS.items():
+            if nation_column not in df or name_column not in df:
+                continue
+            frames.append(pd.DataFrame({
+                "name": df[name_column],
+                "country_code": df[nation_column].str.strip().str.upper(),
+                "year": pd.to_numeric(df["year"], errors="coerce"),
+                "source": file_path.stem,
+            }))
+    if not frames:
+        return pd.DataFrame(columns=["player_id", "country_code", "year", "source"])
+    observations = pd.concat(frames, ignore_index=True)
+    observations = observations[observations["country_code"].fillna("").str.fullmatch(r"[A-Z]{3}")]
+    observations["player_id"] = player_ids(observations["name"], index)
+    return observations.dropna(subset=["player_id"])[["player_id", "country_code", "year", "source"]]
+
+def resolve_nationality(observations):
+    """
+    One nation per player. Conflict rules, in order:
+      1. the most recent year a player was seen wins (switches of
+         federation are real and the latest one is current)
+      2. within that year, the code seen most often
+      3. then alphabetical, so the result is deterministic
+    `conflict` marks players seen under more than one code.
+    """
+    counts = observations.groupby(["player_id", "country_code"]).agg(
+        last_year=("year", "max"), observations=("year", "size"),
+    ).reset_index()
+    ranked = counts.sort_values(["player_id", "last_year", "observations", "country_code"],
+                                ascending=[True, False, False, True], kind="stable")
+    resolved = ranked.drop_duplicates("player_id").set_index("player_id")
+    codes_seen = counts.groupby("player_id")["country_code"].agg(lambda c: "|".join(sorted(c)))
+    resolved["codes_seen"] = codes_seen
+    resolved["conflict"] = codes_seen.str.contains("|", regex=False)
+    return resolved[["country_code", "last_year", "observations", "codes_seen", "conflict"]]
+
+# ---------------------------
+# DIMENSION
+# ---------------------------
+def load_country_names(candidates):
+    """
+    code -> country name from the first readable countries file; empty
+    when none is present (the dimension then carries codes only).
+    """
+    for file_path in candidates:
+        file_path = Path(file_path)
+        if not file_path.exists():
+            continue
+        if file_path.suffix == ".json":
+            df = pd.json_normalize(pd.read_json(file_path).to_dict("records"))
+        else:
+            df = pd.read_csv(file_path, dtype=str)
+        df.columns = [c.strip().lower() for c in df.columns]
+        code = next((c for c in CODE_COLUMNS if c in df), None)
+        name = next((c for c in NAME_COLUMNS if c in df), None)
+        if code is None or name is None:
+            print(f"[WARN] - {file_path.name} has no recognised code/name columns, ignoring it")
+            continue
+        names = df[[code, name]].dropna()
+        return dict(zip(names[code].astype(str).str.upper(), names[name].astype(str)))
+    return {}
+
+def build_country_dimension(resolved, observations, country_names):
+    """
+    Typed dimension: dense int16 country_key per code (sorted, so keys are
+    stable for a given code set), name where known, and player counts.
+    """
+    codes = np.union1d(observations["country_code"].unique(), list(country_names))
+    countries = pd.DataFrame({"country_code": codes})
+    countries.insert(0, "country_key", np.arange(len(codes), dtype=np.int16))
+    countries["country_name"] = countries["country_code"].map(country_names)
+    countries["players"] = countries["country_code"].map(resolved["country_code"].value_counts()).fillna(0).astype(int)
+    return countries
+
+def build_player_countries(resolved, countries, players):
+    """
+    Canonical players with their resolved nation as country_key
+    (UNKNOWN_KEY when no source names one).
+    """
+    keys = dict(zip(countries["country_code"], countries["country_key"]))
+    table = players[["player_id"]].join(resolved, on="player_id")
+    table["country_key"] = table["country_code"].map(keys).fillna(UNKNOWN_KEY).astype(np.int16)
+    # The left join leaves players without observations as NaN; keep the
+    # counts integral and the flag boolean rather than float
+    table = table.astype({"last_year": "Int64", "observations": "Int64", "conflict": "boolean"})
+    return table[["player_id", "country_key", "country_code", "last_year", "observations", "codes_seen", "conflict"]]
+
+def build_countries(data_directory):
+    """
+    Builds and publishes countries.csv and player_countries.csv under
+    canonical/countries. Returns (countries, player_countries).
+    """
+    data_directory = Path(data_directory)
+    players_path = data_directory / "canonical" / "players" / "players.csv"
+    players = pd.read_csv(players_path, dtype=str)
+    observations = load_nation_observations(data_directory / "old_data" / "matches", load_player_index(players_path))
+    matched = observations["player_id"].isin(players["player_id"])
+    print(f"[INFO] - Nation observations matched to canonical players: {matched.sum():,} of {len(observations):,} "
+          f"({(~matched).sum():,} unmatched, {observations.loc[~matched, 'player_id'].nunique():,} players)")
+    resolved = resolve_nationality(observations)
+    country_names = load_country_names([data_directory / "processed" / "countries.csv", data_directory / "raw" / "countries.json"])
+    countries = build_country_dimension(resolved, observations, country_names)
+    player_countries = build_player_countries(resolved, countries, players)
+
+    output_directory = data_directory / "canonical" / "countries"
+    publish_atomic({output_directory / "countries.csv": countries, output_directory / "player_countries.csv": player_countries})
+    return countries, player_countries
+
+# ---------------------------
+# JOIN
+# ---------------------------
+def attach_countries(players, canonical_directory):
+    """
+    Adds country_key (int16) and country (categorical whose codes are the
+    country_key) to a frame with a player_id column.
+    """
+    countries_directory = Path(canonical_directory) / "countries"
+    countries = pd.read_csv(countries_directory / "countries.csv", dtype={"country_key": np.int16}, keep_default_na=False)
+    keys = pd.read_csv(countries_directory / "player_countries.csv", usecols=["player_id", "country_key"], dtype={"country_key": np.int16})
+    country_key = players["player_id"].map(keys.set_index("player_id")["country_key"]).fillna(UNKNOWN_KEY).astype(np.int16)
+    categories = pd.CategoricalDtype(countries.sort_values("country_key")["country_code"])
+    return players.assign(
+        country_key=country_key.to_numpy(),
+        country=pd.Categorical.from_codes(country_key.to_numpy(), dtype=categories),
+    )
+
+def points_won_by_nation(stats_directory, canonical_directory):
+    """
+    Points played and won per nation from the Overview 'Total' rows: the
+    stats are keyed to players once, then grouped on the integer key.
+    """
+    frames = [pd.read_csv(p) for p in sorted(Path(stats_directory).glob("*-stats-Overview.csv"))]
+    if not frames:
+        return pd.DataFrame()
+    stats = pd.concat(frames, ignore_index=True)
+    stats = stats[stats["set"].astype(str) == "Total"]
+    canonical = stats["player"].map(normalize_name)
+    stats = stats.assign(player_id=canonical.map(lambda n: generate_player_id(n) if isinstance(n, str) and n else None))
+    stats = attach_countries(stats, canonical_directory)
+    stats = stats.assign(
+        points=stats["serve_pts"] + stats["return_pts"],
+        points_won=stats["first_won"] + stats["second_won"] + stats["return_pts_won"],
+    )
+    totals = stats.groupby("country", observed=True)[["points", "points_won"]].sum()
+    totals["players"] = stats.groupby("country", observed=True)["player_id"].nunique()
+    totals["points_won_pct"] = (totals["points_won"] / totals["points"]).round(4)
+    return totals.sort_values("points", ascending=False)
+
+
+if __name__ == "__main__":
+    root = find_repo_root()
+    data_directory = root / "data"
+
+    parser = argparse.ArgumentParser(description="Build the country dimension and resolve canonical players' nationality.")
+    parser.add_argument("--top", type=int, default=15, help="Nations to show in the points-won summary")
+    args = parser.parse_args()
+
+    print(f"[INFO] - Repository Root: {root}")
+    start = time.perf_counter()
+    countries, player_countries = build_countries(data_directory)
+    build_s = time.perf_counter() - start
+
+    known = player_countries["country_key"] != UNKNOWN_KEY
+    print("\n----------- SUMMARY -------------")
+    print(f"Countries: {len(countries):,} ({countries['country_name'].notna().sum():,} named)")
+    print(f"Canonical players with a nation: {known.sum():,} of {len(player_countries):,} ({known.mean():.1%}, "
+          f"{player_countries['conflict'].fillna(False).astype(bool).sum():,} resolved conflicts)")
+    print(f"Built in {build_s:.2f}s")
+    print(f"Written to: {data_directory / 'canonical' / 'countries'}")
+
+    start = time.perf_counter()
+    by_nation = points_won_by_nation(data_directory / "raw" / "stats", data_directory / "canonical")
+    query_ms = (time.perf_counter() - start) * 1000
+    if not by_nation.empty:
+        print(f"\n----------- POINTS WON BY NATION ({query_ms:.0f} ms) -------------")
+        print(by_nation.head(args.top).to_string())
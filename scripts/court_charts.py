@@ -0,0 +1,276 @@
+import argparse
+import hashlib
+import importlib.util
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from feature_pipeline import RALLY_BUCKETS, load_player_names
+from tennis_research import find_repo_root, normalize_name
+
+# Bump when a template or the drawing code changes so every figure is redrawn
+RENDER_VERSION = 1
+WORKERS = 4
+MIN_POINTS = 50
+DPI = 100
+
+# ---------------------------
+# CHART KINDS
+# ---------------------------
+# Each kind is a fixed template: the grid (or bar) labels never change, so a
+# worker draws the figure once and only swaps the data, colour scale, text
+# and title for every player after that.
+SERVE_COLUMNS = ["deuce_wide", "deuce_middle", "deuce_t", "ad_t", "ad_middle", "ad_wide"]
+SHOT_COLUMNS = ["crosscourt", "down_middle", "down_the_line", "inside_out", "inside_in"]
+CHART_KINDS = {
+    "serve_direction": {
+        "type": "heatmap",
+        "rows": ["1st serve", "2nd serve"],
+        "columns": ["Deuce\nwide", "Deuce\nbody", "Deuce\nT", "Ad\nT", "Ad\nbody", "Ad\nwide"],
+        "size": (7.0, 3.2),
+    },
+    "shot_direction": {
+        "type": "heatmap",
+        "rows": ["Forehand", "Backhand", "Slice"],
+        "columns": ["Cross-\ncourt", "Down\nmiddle", "Down the\nline", "Inside\nout", "Inside\nin"],
+        "size": (6.5, 3.6),
+    },
+    "rally_length": {
+        "type": "bars",
+        "columns": [f"{low}-{high}" if high < 999 else f"{low}+" for low, high in RALLY_BUCKETS],
+        "size": (5.5, 3.6),
+    },
+}
+
+# ---------------------------
+# AGGREGATES
+# ---------------------------
+# Each aggregate returns {player name: 2-D float array} in its kind's
+# template shape; heatmaps hold shares of the player's shots per row.
+def row_shares(counts):
+    totals = counts.sum(axis=1, keepdims=True)
+    return np.divide(counts, totals, out=np.zeros_like(counts, dtype=float), where=totals > 0)
+
+def per_player_grid(df, rows, columns):
+    df = df[df["row"].astype(str).isin(rows)]
+    totals = df.groupby(["player", df["row"].astype(str)])[columns].sum()
+    grids = {}
+    for player, block in totals.groupby(level=0):
+        counts = block.droplevel(0).reindex(rows).fillna(0).to_numpy(dtype=float)
+        if counts.sum() >= MIN_POINTS:
+            grids[player] = row_shares(counts)
+    return grids
+
+def serve_direction_data(stats_directory):
+    frames = [pd.read_csv(p) for p in sorted(Path(stats_directory).glob("*-stats-ServeDirection.csv"))]
+    if not frames:
+        return {}
+    return per_player_grid(pd.concat(frames, ignore_index=True), ["1", "2"], SERVE_COLUMNS)
+
+def shot_direction_data(stats_directory):
+    frames = [pd.read_csv(p) for p in sorted(Path(stats_directory).glob("*-stats-ShotDirection.csv"))]
+    if not frames:
+        return {}
+    return per_player_grid(pd.concat(frames, ignore_index=True), ["F", "B", "S"], SHOT_COLUMNS)
+
+def rally_length_data(point_store_directory, matches_directory):
+    """
+    Share of points played (row 0) and won (row 1) per rally-length bucket,
+    from the singles points in the point store.
+    """
+    from point_store import PointStore
+
+    if not (Path(point_store_directory) / "store.json").exists():
+        print(f"[WARN] - No point store in {point_store_directory}, skipping rally-length charts")
+        return {}
+    store = PointStore(point_store_directory)
+    points = pd.DataFrame({
+        "match_id": np.repeat(store.match_ids.astype(object), np.diff(store.offsets)),
+        "rally_len": np.asarray(store.records["rally_len"]),
+        "winner": np.asarray(store.records["winner"]),
+    })
+    points = points[points["rally_len"] > 0]
+    bounds = [low for low, _ in RALLY_BUCKETS] + [RALLY_BUCKETS[-1][1] + 1]
+    points["bucket"] = np.searchsorted(bounds, points["rally_len"].to_numpy(), side="right") - 1
+
+    names = load_player_names(matches_directory)
+    names = names[~names["player"].str.contains(" / ", regex=False) & (names["player"] != "")]
+    sides = pd.concat([points.assign(side=1), points.assign(side=2)], ignore_index=True)
+    sides["won"] = sides["winner"] == sides["side"]
+    sides = sides.merge(names, on=["match_id", "side"])
+    totals = sides.groupby(["player", "bucket"])["won"].agg(["size", "sum"]).unstack(fill_value=0)
+    played = totals["size"].reindex(columns=range(len(RALLY_BUCKETS)), fill_value=0).to_numpy(dtype=float)
+    won = totals["sum"].reindex(columns=range(len(RALLY_BUCKETS)), fill_value=0).to_numpy(dtype=float)
+    grids = {}
+    for i, player in enumerate(totals.index):
+        if played[i].sum() >= MIN_POINTS:
+            grids[player] = np.vstack([played[i] / played[i].sum(), np.divide(won[i], played[i], out=np.zeros(len(won[i])), where=played[i] > 0)])
+    return grids
+
+# ---------------------------
+# FIGURE CACHE
+# ---------------------------
+def figure_key(kind, player, values):
+    """
+    Hash of everything a figure is drawn from: same key, same image.
+    """
+    h = hashlib.sha1(f"{RENDER_VERSION}|{kind}|{player}|{values.shape}".encode("utf-8"))
+    h.update(np.ascontiguousarray(values, dtype=np.float64).round(6).tobytes())
+    return h.hexdigest()[:16]
+
+def player_slug(player):
+    return (normalize_name(player) or "unknown").replace(" ", "_")
+
+def plan_figures(data, figure_directory, manifest, force=False):
+    """
+    Render jobs for figures whose data changed (or whose file is missing;
+    every figure in data when force is set), and the manifest entries of
+    the full set.
+    """
+    jobs, entries = [], {}
+    for kind, grids in data.items():
+        for player, values in grids.items():
+            name = f"{kind}/{player_slug(player)}"
+            file_name = f"{name}-{figure_key(kind, player, values)}.png"
+            entries[name] = file_name
+            if force or manifest.get(name) != file_name or not (figure_directory / file_name).exists():
+                jobs.append((kind, player, values, str(figure_directory / file_name)))
+    return jobs, entries
+
+def remove_stale(figure_directory, entries):
+    keep = set(entries.values())
+    removed = 0
+    for file_path in figure_directory.glob("*/*.png"):
+        if file_path.relative_to(figure_directory).as_posix() not in keep:
+            file_path.unlink()
+            removed += 1
+    return removed
+
+# ---------------------------
+# RENDERING (worker processes)
+# ---------------------------
+_TEMPLATES = {}
+
+def init_worker():
+    import matplotlib
+    matplotlib.use("Agg")
+
+def build_template(kind):
+    import matplotlib.pyplot as plt
+
+    spec = CHART_KINDS[kind]
+    fig, ax = plt.subplots(figsize=spec["size"], dpi=DPI)
+    if spec["type"] == "heatmap":
+        shape = (len(spec["rows"]), len(spec["columns"]))
+        image = ax.imshow(np.zeros(shape), cmap="Reds", vmin=0, vmax=1, aspect="auto")
+        ax.set_xticks(range(shape[1]), spec["columns"], fontsize=8)
+        ax.set_yticks(range(shape[0]), spec["rows"], fontsize=8)
+        texts = [[ax.text(j, i, "", ha="center", va="center", fontsize=8) for j in range(shape[1])] for i in range(shape[0])]
+        fig.colorbar(image, ax=ax, fraction=0.04, label="Share of row")
+        artists = {"image": image, "texts": texts}
+    else:
+        x = np.arange(len(spec["columns"]))
+        bars = ax.bar(x, np.zeros(len(x)), color="#9ecae1", label="Share of points")
+        line, = ax.plot(x, np.zeros(len(x)), marker="o", color="#d62728", label="Points won")
+        ax.set_xticks(x, spec["columns"])
+        ax.set_xlabel("Rally length (shots)")
+        ax.set_ylim(0, 1)
+        ax.legend(loc="upper right", fontsize=8)
+        artists = {"bars": bars, "line": line}
+    fig.tight_layout()
+    return fig, ax, artists
+
+def render_figure(job):
+    """
+    Draws one figure into its kind's template and writes it (temp file
+    first, so an interrupted run never leaves a half-written image).
+    """
+    kind, player, values, output_path = job
+    if kind not in _TEMPLATES:
+        _TEMPLATES[kind] = build_template(kind)
+    fig, ax, artists = _TEMPLATES[kind]
+
+    if CHART_KINDS[kind]["type"] == "heatmap":
+        artists["image"].set_data(values)
+        artists["image"].set_clim(0, max(values.max(), 1e-9))
+        for i, row in enumerate(artists["texts"]):
+            for j, text in enumerate(row):
+                text.set_text(f"{values[i, j]:.0%}")
+    else:
+        for bar, height in zip(artists["bars"], values[0]):
+            bar.set_height(height)
+        artists["line"].set_ydata(values[1])
+    ax.set_title(f"{player} - {kind.replace('_', ' ')}", fontsize=10)
+
+    output_path = Path(output_path)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    temp_path = output_path.with_name(f".{output_path.name}")
+    fig.savefig(temp_path, format="png")
+    temp_path.replace(output_path)
+    return output_path.name
+
+def render_all(jobs, workers):
+    if not jobs:
+        return 0
+    if workers <= 1:
+        init_worker()
+        return sum(1 for _ in map(render_figure, jobs))
+    # Workers keep their templates between jobs; chunks cut the pickling
+    # round trips
+    chunksize = max(1, len(jobs) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker) as executor:
+        return sum(1 for _ in executor.map(render_figure, jobs, chunksize=chunksize))
+
+
+if __name__ == "__main__":
+    root = find_repo_root()
+    stats_directory = root / "data" / "raw" / "stats"
+    figure_directory = root / "data" / "processed" / "figures"
+
+    parser = argparse.ArgumentParser(description="Render serve/shot-direction heatmaps and rally-length charts per player, redrawing only what changed.")
+    parser.add_argument("--kinds", nargs="+", choices=sorted(CHART_KINDS), default=sorted(CHART_KINDS))
+    parser.add_argument("--player", action="append", default=[], help="Only render these players (default: everyone with enough data)")
+    parser.add_argument("--workers", type=int, default=WORKERS)
+    parser.add_argument("--force", action="store_true", help="Redraw every selected figure, even unchanged ones")
+    args = parser.parse_args()
+
+    print(f"[INFO] - Repository Root: {root}")
+    start = time.perf_counter()
+    loaders = {
+        "serve_direction": lambda: serve_direction_data(stats_directory),
+        "shot_direction": lambda: shot_direction_data(stats_directory),
+        "rally_length": lambda: rally_length_data(root / "data" / "processed" / "point_store", root / "data" / "old_data" / "matches"),
+    }
+    data = {kind: loaders[kind]() for kind in args.kinds}
+    if args.player:
+        wanted = {normalize_name(p) for p in args.player}
+        data = {kind: {p: v for p, v in grids.items() if normalize_name(p) in wanted} for kind, grids in data.items()}
+    aggregate_s = time.perf_counter() - start
+
+    manifest_path = figure_directory / "manifest.json"
+    manifest = json.loads(manifest_path.read_text()) if manifest_path.exists() else {}
+    jobs, entries = plan_figures(data, figure_directory, manifest, args.force)
+
+    if jobs and importlib.util.find_spec("matplotlib") is None:
+        print(f"[FATAL] - {len(jobs):,} figures to draw but matplotlib is not installed (see env/check_env.py)")
+        quit()
+    start = time.perf_counter()
+    rendered = render_all(jobs, args.workers)
+    render_s = time.perf_counter() - start
+
+    # A partial (--player / --kinds) run keeps the other figures
+    if not args.player and set(args.kinds) == set(CHART_KINDS):
+        removed = remove_stale(figure_directory, entries)
+    else:
+        entries, removed = {**manifest, **entries}, 0
+    figure_directory.mkdir(parents=True, exist_ok=True)
+    manifest_path.write_text(json.dumps(entries, indent=1, sort_keys=True))
+
+    print("\n----------- SUMMARY -------------")
+    print(f"Figures: {len(entries):,} ({rendered:,} redrawn, {len(entries) - rendered:,} cached, {removed:,} stale removed)")
+    print(f"Aggregates in {aggregate_s:.2f}s, rendering in {render_s:.2f}s with {args.workers} workers")
+    print(f"Written to: {figure_directory}")
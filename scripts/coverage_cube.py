@@ -0,0 +1,253 @@
+import argparse
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from tennis_research import find_repo_root, get_file_encoding_type
+
+DIMENSIONS = ["charter", "tournament", "year", "gender", "surface"]
+# points only covers the matches_with_points matches; the rest have no
+# points file or stats row to count from and are unknown, not 0
+MEASURES = ["matches", "points", "matches_with_points"]
+UNKNOWN = "Unknown"
+
+# ---------------------------
+# INPUTS
+# ---------------------------
+def match_dimensions(matches):
+    """
+    Cube coordinates of each canonical match. The year and gender come from
+    the match id (some dates are missing); blank charters and surfaces are
+    'Unknown' so they still count.
+    """
+    text = lambda c: matches[c].astype("string").str.strip().replace("", pd.NA).fillna(UNKNOWN)
+    return pd.DataFrame({
+        "match_id": matches["match_id"],
+        "charter": text("charted_by"),
+        "tournament": text("tournament"),
+        "year": matches["match_id"].str[:4],
+        "gender": matches["match_id"].str.split("-").str[1].fillna(UNKNOWN),
+        "surface": text("surface"),
+    })
+
+def charted_point_counts(canonical_directory, stats_directory):
+    """
+    Charted points per match: counted from the canonical points files, or
+    for matches without them, both players' serve points in the Overview
+    'Total' rows, or failing that (the men's stats have no Overview) the
+    ServeInfluence first- and second-serve rows' `pts`. Those leave out
+    double faults, so they run about 5% low. Matches without any of these
+    are missing from the result.
+    """
+    counts = []
+    for file_path in sorted((Path(canonical_directory) / "points").glob("*.csv")):
+        ids = pd.read_csv(file_path, encoding=get_file_encoding_type(file_path), usecols=["match_id"], dtype=str)["match_id"]
+        counts.append(ids.value_counts())
+    for file_path in sorted(Path(stats_directory).glob("*-stats-Overview.csv")):
+        df = pd.read_csv(file_path, usecols=["match_id", "set", "serve_pts"])
+        df = df[df["set"].astype(str) == "Total"]
+        counts.append(df.groupby("match_id")["serve_pts"].sum())
+    for file_path in sorted(Path(stats_directory).glob("*-stats-ServeInfluence.csv")):
+        df = pd.read_csv(file_path, usecols=["match_id", "row", "pts"])
+        df = df[df["row"].astype(str).isin(["1", "2"])]
+        counts.append(pd.to_numeric(df["pts"], errors="coerce").groupby(df["match_id"]).sum())
+    if not counts:
+        return pd.Series(dtype="int64")
+    # Points files win over the Overview estimate, which wins over ServeInfluence
+    counts = pd.concat(counts)
+    return counts[~counts.index.duplicated(keep="first")].astype("int64")
+
+# ---------------------------
+# CUBE
+# ---------------------------
+class CoverageCube:
+    """
+    Sparse cube of match and charted-point counts over DIMENSIONS. Only
+    non-empty cells are stored: one int32 code per dimension (into that
+    dimension's sorted labels) and the MEASURES per cell.
+
+    Every ingested match keeps its cell and point count (-1 while unknown),
+    so re-counted points are applied as deltas and refresh() only touches
+    new matches.
+    """
+
+    def __init__(self, labels=None, cells=None, measures=None, match_ids=None, match_cell=None, match_points=None):
+        self.labels = labels or {d: np.array([], dtype=str) for d in DIMENSIONS}
+        self.cells = cells if cells is not None else np.zeros((0, len(DIMENSIONS)), dtype=np.int32)
+        self.measures = measures if measures is not None else np.zeros((0, len(MEASURES)), dtype=np.int64)
+        self.match_ids = match_ids if match_ids is not None else np.array([], dtype=str)
+        self.match_cell = match_cell if match_cell is not None else np.array([], dtype=np.int32)
+        self.match_points = match_points if match_points is not None else np.array([], dtype=np.int64)
+
+    def _encode(self, frame):
+        """
+        Dimension codes of each row, growing the label dictionaries (and
+        re-coding stored cells) when new labels appear.
+        """
+        codes = np.empty((len(frame), len(DIMENSIONS)), dtype=np.int32)
+        for j, dim in enumerate(DIMENSIONS):
+            values = frame[dim].to_numpy(dtype=str)
+            labels = np.union1d(self.labels[dim], values)
+            if len(labels) != len(self.labels[dim]):
+                self.cells[:, j] = np.searchsorted(labels, self.labels[dim])[self.cells[:, j]]
+                self.labels[dim] = labels
+            codes[:, j] = np.searchsorted(labels, values)
+        return codes
+
+    def _cell_rows(self, codes):
+        """
+        Cell row of each code tuple, appending cells that don't exist yet.
+        """
+        sizes = np.array([max(len(self.labels[d]), 1) for d in DIMENSIONS], dtype=np.int64)
+        key = lambda c: np.ravel_multi_index(c.T.astype(np.int64), sizes)
+        existing = key(self.cells)
+        wanted = key(codes)
+        new_keys, first = np.unique(wanted[~np.isin(wanted, existing)], return_index=True)
+        if len(new_keys):
+            fresh = codes[~np.isin(wanted, existing)][first]
+            self.cells = np.vstack([self.cells, fresh])
+            self.measures = np.vstack([self.measures, np.zeros((len(fresh), len(MEASURES)), dtype=np.int64)])
+            existing = np.concatenate([existing, new_keys])
+        order = np.argsort(existing)
+        return order[np.searchsorted(existing, wanted, sorter=order)].astype(np.int32)
+
+    def refresh(self, matches, point_counts):
+        """
+        Adds canonical matches not ingested yet and applies point-count
+        changes (points charted after their match arrived). Returns
+        (new matches, matches whose points changed).
+        """
+        frame = match_dimensions(matches)
+        ingested = len(self.match_ids)
+        new = frame[~frame["match_id"].isin(self.match_ids)].drop_duplicates("match_id")
+        if len(new):
+            rows = self._cell_rows(self._encode(new))
+            np.add.at(self.measures[:, 0], rows, 1)
+            self.match_ids = np.concatenate([self.match_ids, new["match_id"].to_numpy(dtype=str)])
+            self.match_cell = np.concatenate([self.match_cell, rows])
+            self.match_points = np.concatenate([self.match_points, np.full(len(new), -1, dtype=np.int64)])
+
+        counted = pd.Series(self.match_ids).map(point_counts).to_numpy(dtype=np.float64)
+        counted = np.where(np.isnan(counted), -1, counted).astype(np.int64)
+        changed = counted != self.match_points
+        points_delta = np.maximum(counted, 0) - np.maximum(self.match_points, 0)
+        known_delta = (counted >= 0).astype(np.int64) - (self.match_points >= 0)
+        np.add.at(self.measures[:, 1], self.match_cell[changed], points_delta[changed])
+        np.add.at(self.measures[:, 2], self.match_cell[changed], known_delta[changed])
+        self.match_points = counted
+        return len(new), int(changed[:ingested].sum())
+
+    # ---------------------------
+    # QUERIES
+    # ---------------------------
+    def _group_codes(self, cells, by):
+        """
+        Dense group number of each cell over the `by` dimensions, and the
+        code tuple of each group.
+        """
+        cols = [DIMENSIONS.index(d) for d in by]
+        sizes = [max(len(self.labels[d]), 1) for d in by]
+        keys = np.ravel_multi_index(cells[:, cols].T.astype(np.int64), sizes)
+        groups, inverse = np.unique(keys, return_inverse=True)
+        return inverse, np.column_stack(np.unravel_index(groups, sizes))
+
+    def _mask(self, where):
+        mask = np.ones(len(self.cells), dtype=bool)
+        for dim, value in (where or {}).items():
+            j = DIMENSIONS.index(dim)
+            values = [value] if isinstance(value, (str, int)) else list(value)
+            codes = np.flatnonzero(np.isin(self.labels[dim], [str(v) for v in values]))
+            mask &= np.isin(self.cells[:, j], codes)
+        return mask
+
+    def rollup(self, by=(), where=None):
+        """
+        Match and point totals grouped by the `by` dimensions (an empty `by`
+        is the grand total) over the cells matching `where`
+        ({dimension: value or list of values}). Drilling down is the same
+        call with more dimensions in `by` and the parent cell in `where`.
+        """
+        mask = self._mask(where)
+        cells, measures = self.cells[mask], self.measures[mask]
+        if not by:
+            return pd.DataFrame([measures.sum(axis=0)], columns=MEASURES)
+        inverse, groups = self._group_codes(cells, by)
+        totals = np.column_stack([np.bincount(inverse, weights=measures[:, k], minlength=len(groups)) for k in range(len(MEASURES))]).astype(np.int64)
+        result = pd.DataFrame({d: self.labels[d][groups[:, i]] for i, d in enumerate(by)})
+        result[MEASURES] = totals
+        result["points_per_match"] = (result["points"] / result["matches_with_points"].where(result["matches_with_points"] > 0)).round(1)
+        return result.sort_values("matches", ascending=False, kind="stable").reset_index(drop=True)
+
+    def sample_weights(self, by=("year", "gender", "surface")):
+        """
+        Per-match weight that evens out charting coverage across the `by`
+        cells: mean matches per cell / matches in the match's cell.
+        """
+        inverse, _ = self._group_codes(self.cells, by)
+        per_group = np.bincount(inverse, weights=self.measures[:, 0])
+        group_of_match = inverse[self.match_cell]
+        weights = per_group[per_group > 0].mean() / per_group[group_of_match]
+        return pd.Series(weights, index=self.match_ids, name="weight")
+
+    def save(self, path):
+        np.savez_compressed(path, cells=self.cells, measures=self.measures, match_ids=self.match_ids,
+                            match_cell=self.match_cell, match_points=self.match_points,
+                            **{f"labels_{d}": self.labels[d] for d in DIMENSIONS})
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as z:
+            if z["measures"].shape[1] != len(MEASURES):
+                raise ValueError(f"Coverage cube has {z['measures'].shape[1]} measures, expected {len(MEASURES)}, rebuilding it")
+            return cls({d: z[f"labels_{d}"] for d in DIMENSIONS}, z["cells"], z["measures"],
+                       z["match_ids"], z["match_cell"], z["match_points"])
+
+def parse_where(items):
+    where = {}
+    for item in items:
+        dim, _, value = item.partition("=")
+        if dim not in DIMENSIONS:
+            raise argparse.ArgumentTypeError(f"Unknown dimension '{dim}', expected one of {DIMENSIONS}")
+        where.setdefault(dim, []).append(value)
+    return where
+
+
+if __name__ == "__main__":
+    root = find_repo_root()
+    canonical_directory = root / "data" / "canonical"
+    stats_directory = root / "data" / "raw" / "stats"
+    cube_path = root / "data" / "processed" / "coverage" / "coverage_cube.npz"
+
+    parser = argparse.ArgumentParser(description="Charting coverage cube (charter x tournament x year x gender x surface) with roll-up/drill-down.")
+    parser.add_argument("--by", nargs="*", default=["charter"], choices=DIMENSIONS, help="Dimensions to group by (none = grand total)")
+    parser.add_argument("--where", nargs="*", default=[], help="Filters like year=2024 gender=W")
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--rebuild", action="store_true", help="Discard the stored cube and rebuild it")
+    args = parser.parse_args()
+
+    print(f"[INFO] - Repository Root: {root}")
+    cube = CoverageCube()
+    if not args.rebuild and cube_path.exists():
+        try:
+            cube = CoverageCube.load(cube_path)
+        except ValueError as e:
+            print(f"[WARN] - {e}")
+
+    start = time.perf_counter()
+    matches = pd.read_csv(canonical_directory / "matches" / "matches.csv", dtype=str)
+    added, recounted = cube.refresh(matches, charted_point_counts(canonical_directory, stats_directory))
+    refresh_s = time.perf_counter() - start
+    cube_path.parent.mkdir(parents=True, exist_ok=True)
+    cube.save(cube_path)
+
+    start = time.perf_counter()
+    result = cube.rollup(args.by, parse_where(args.where))
+    query_ms = (time.perf_counter() - start) * 1000
+
+    print("\n----------- SUMMARY -------------")
+    print(f"Cells: {len(cube.cells):,}  Matches: {len(cube.match_ids):,}  ({added:,} new, {recounted:,} re-counted in {refresh_s:.2f}s)")
+    print(f"Cube size: {cube_path.stat().st_size / 1e3:.1f} KB")
+    print(f"\n----------- ROLL-UP by {args.by or 'total'} ({query_ms:.2f} ms) -------------")
+    print(result.head(args.top).to_string(index=False))
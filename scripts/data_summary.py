@@ -1,18 +1,9 @@
+import argparse
 from pathlib import Path
 import pandas as pd
-from pandas import json_normalize
-import re, codecs, zipfile, csv
-
-def find_repo_root(start_path=None):
-    """
-    Walk upward until a .git directory is found.
-    Returns the repo root as a Path.
-    """
-    current = Path(start_path or __file__).resolve()
-    for parent in [current] + list(current.parents):
-        if (parent / ".git").exists():
-            return parent
-    raise RuntimeError("Not inside a Git repository")
+import re, codecs, zipfile
+from dataframe_backends import available_backends, get_backend, sniff_separator
+from tennis_research import find_repo_root, get_file_encoding_type
 
 def walk_all_files(path):
     """
@@ -36,37 +27,19 @@ def print_file_size(size_bytes):
         size_bytes /= 1024
     print(f"File Size: {size_bytes:.2f} {unit}")
 
-def get_file_encoding_type(file_path):
-    """
-    Tries common text encodings and returns the first one that successfully
-    reads the CSV header.
-    """
-    file_path = Path(file_path).resolve()
-    encodings = ["utf-8", "cp1252", "latin-1"]
-
-    for enc in encodings:
-        try:
-            with open(file_path, newline="", encoding=enc) as f:
-                reader = csv.reader(f)
-                next(reader)  # Try reading header
-            return enc
-        except UnicodeDecodeError:
-            continue
-
-    raise UnicodeDecodeError(
-        "utf-8",
-        b"",
-        0,
-        1,
-        f"Could not determine encoding for file: {file_path}"
-    )
 
-if __name__ == "__main__":
+def main(argv=None):
     root = find_repo_root()
-    data_directory = root / "data" / "raw"
+    parser = argparse.ArgumentParser(description="Load and summarize every data file under a directory.")
+    parser.add_argument("--data-dir", default=str(root / "data" / "raw"))
+    parser.add_argument("--backend", choices=available_backends(), default="pandas", help="Dataframe engine for reading CSV/TSV files")
+    args = parser.parse_args(argv)
+    backend = get_backend(args.backend)
+    data_directory = Path(args.data_dir)
     processed_data_directory = root / "data" / "processed"
     print(f"[INFO] - Repository Root: {root}")
     print(f"[INFO] - Data Directory: {data_directory}")
+    print(f"[INFO] - Backend: {backend.name}")
 
     pattern = re.compile(r'\.(xls|xlsx|csv|json)$', re.IGNORECASE)
     print(f"[INFO] - Walking Files filtering files with regex pattern: {pattern.pattern}")
@@ -138,7 +111,8 @@ if __name__ == "__main__":
                             print(f"[DEBUG] - Processing chunk {i} | Rows: {len(chunk):,}")
                         quit()
                     else:
-                        df = pd.read_csv(f, sep=None, engine="python", on_bad_lines="error", encoding=encoding_type)
+                        # Separator sniffed up front (as sep=None would) so every backend can read it
+                        df = backend.read_csv(p, sep=sniff_separator(p, encoding_type), on_bad_lines="error", encoding=encoding_type)
                     print(f"[INFO] - CSV/TSV File (Auto-delimeter detection)")
                 except Exception as e:
                   print(f"[DEBUG] - Failed to read file as csv/tsv: {e}")
@@ -161,12 +135,18 @@ if __name__ == "__main__":
               # print(f"Duplicate Rows: {num_duplicates}")
 
               if "countries.json" in str(p):
+                  # Name source for country_dimension.py
                   print(f"Save Countries DataFrame as CSV: {p}")
                   df.to_csv(f"{processed_data_directory}/countries.csv", index=False)
-                  quit()
           print("\n-----------------------------------------------------------")
 
     print(f"Done: {len(files)} files prepared")
+    if backend.fallbacks:
+        print(f"[INFO] - {backend.fallbacks} reads fell back to pandas")
+
+
+if __name__ == "__main__":
+    main()
 
 
 """
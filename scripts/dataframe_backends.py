@@ -0,0 +1,176 @@
+import csv
+import importlib.util
+
+import pandas as pd
+
+# ---------------------------
+# BACKENDS
+# ---------------------------
+# A backend reads CSVs into pandas frames and runs grouped aggregations.
+# Every backend must return exactly what the pandas backend returns (same
+# columns, dtypes and values; backend_parity.py checks this), so a stage can
+# switch engines without any change to the code that consumes its frames.
+# Writing stays on pandas everywhere so the published CSV bytes can't drift.
+AGGREGATIONS = ["first", "min", "max", "sum", "size"]
+
+class PandasBackend:
+    """
+    The reference: plain pandas, single-threaded.
+    """
+    name = "pandas"
+    requires = "pandas"
+
+    def __init__(self):
+        self.fallbacks = 0
+
+    def read_csv(self, path, **kwargs):
+        return pd.read_csv(path, **kwargs)
+
+    def group_agg(self, df, by, aggs):
+        """
+        `aggs` is {output column: (input column, aggregation)} with the
+        aggregation one of AGGREGATIONS. Same as
+        df.groupby(by, as_index=False).agg(**aggs): one row per key, sorted
+        by key, 'first' skipping missing values.
+        """
+        return df.groupby(by, as_index=False).agg(**aggs)
+
+class ArrowBackend(PandasBackend):
+    """
+    Arrow's multi-threaded CSV reader (pandas' pyarrow engine) and Arrow
+    compute hash aggregations. Reads the Arrow reader can't do identically
+    (sniffed separators, the python engine, ragged rows) fall back to pandas.
+    """
+    name = "arrow"
+    requires = "pyarrow"
+    UNSUPPORTED = {"sep": None, "engine": "python"}
+
+    def read_csv(self, path, **kwargs):
+        if any(k in kwargs and kwargs[k] == v for k, v in self.UNSUPPORTED.items()) or "low_memory" in kwargs:
+            return self._fallback(path, kwargs)
+        # A dtype for a column the file doesn't have breaks pandas' Arrow
+        # casting, so dtypes are applied after the read
+        dtype = kwargs.pop("dtype", None) or {}
+        try:
+            df = pd.read_csv(path, engine="pyarrow", **kwargs)
+        except (ValueError, pd.errors.ParserError):
+            return self._fallback(path, {**kwargs, "dtype": dtype or None})
+        return df.astype({c: t for c, t in dtype.items() if c in df})
+
+    def _fallback(self, path, kwargs):
+        self.fallbacks += 1
+        return super().read_csv(path, **kwargs)
+
+    def group_agg(self, df, by, aggs):
+        columns = [by] + sorted({col for col, how in aggs.values() if how != "size"})
+        specs, names = [], []
+        for col, how in aggs.values():
+            specs.append(([], "count_all") if how == "size" else (col, how))
+            names.append("count_all" if how == "size" else f"{col}_{how}")
+        # 'first' depends on row order, which Arrow only keeps single-threaded
+        ordered = any(how == "first" for _, how in aggs.values())
+        grouped = pa_table(df[columns]).group_by(by, use_threads=not ordered).aggregate(specs).sort_by(by)
+        result = arrow_to_pandas(grouped)[[by] + names].set_axis([by] + list(aggs), axis=1)
+        return match_dtypes(result, PandasBackend.group_agg(self, df.head(0), by, aggs))
+
+class PolarsBackend(ArrowBackend):
+    """
+    Polars' multi-threaded reader and lazy group_by, converted through Arrow
+    so the frames come out as pandas would have built them.
+    """
+    name = "polars"
+    requires = "polars"
+
+    def read_csv(self, path, **kwargs):
+        import polars as pl
+
+        encoding = str(kwargs.get("encoding") or "utf-8").lower().replace("_", "-")
+        if set(kwargs) - {"encoding", "dtype", "on_bad_lines"} or kwargs.get("on_bad_lines", "error") != "error" or encoding not in ("utf-8", "utf8", "ascii"):
+            return self._fallback(path, kwargs)
+        try:
+            frame = pl.read_csv(path, infer_schema_length=None, try_parse_dates=False)
+        except pl.exceptions.PolarsError:
+            return self._fallback(path, kwargs)
+        result = arrow_to_pandas(frame.to_arrow())
+        reference = pd.read_csv(path, nrows=0, **kwargs)
+        if list(result.columns) != list(reference.columns):
+            return self._fallback(path, kwargs)
+        return result.astype(kwargs["dtype"]) if kwargs.get("dtype") else result
+
+    def group_agg(self, df, by, aggs):
+        import polars as pl
+
+        exprs = []
+        for out, (col, how) in aggs.items():
+            if how == "size":
+                exprs.append(pl.len().alias(out))
+            elif how == "first":
+                exprs.append(pl.col(col).drop_nulls().first().alias(out))
+            else:
+                exprs.append(getattr(pl.col(col), how)().alias(out))
+        columns = [by] + sorted({col for col, how in aggs.values() if how != "size"})
+        lazy = pl.from_arrow(pa_table(df[columns])).lazy()
+        result = arrow_to_pandas(lazy.group_by(by).agg(exprs).sort(by).collect().to_arrow())
+        return match_dtypes(result, PandasBackend.group_agg(self, df.head(0), by, aggs))
+
+BACKENDS = {b.name: b for b in [PandasBackend, ArrowBackend, PolarsBackend]}
+
+# ---------------------------
+# ARROW <-> PANDAS
+# ---------------------------
+# pandas' own CSV parser types an all-empty column float64 and text as the
+# default str dtype; these helpers give Arrow-built frames the same types.
+# The default is the NaN-backed StringDtype from pandas 3 (or with
+# future.infer_string), object before it; StringDtype only takes na_value
+# from pandas 2.3, so the dtype is read off pandas rather than built.
+TEXT_DTYPE = pd.Series(["text"]).dtype
+
+def arrow_types_mapper(arrow_type):
+    import pyarrow as pa
+
+    if TEXT_DTYPE == object:
+        return None
+    if pa.types.is_string(arrow_type) or pa.types.is_large_string(arrow_type) or getattr(pa.types, "is_string_view", lambda t: False)(arrow_type):
+        return TEXT_DTYPE
+    return None
+
+def arrow_to_pandas(table):
+    import pyarrow as pa
+
+    schema = pa.schema([f.with_type(pa.float64()) if pa.types.is_null(f.type) else f for f in table.schema])
+    return table.cast(schema).to_pandas(types_mapper=arrow_types_mapper)
+
+def pa_table(df):
+    import pyarrow as pa
+
+    return pa.Table.from_pandas(df, preserve_index=False)
+
+def match_dtypes(result, reference):
+    """
+    Casts result columns to the reference frame's dtypes where they differ
+    only in representation (e.g. int64 counts vs uint32).
+    """
+    for col in reference.columns:
+        if col in result and result[col].dtype != reference[col].dtype:
+            result[col] = result[col].astype(reference[col].dtype)
+    return result
+
+def sniff_separator(path, encoding=None, sample_bytes=64 * 1024):
+    """
+    The separator pandas' python engine would sniff for sep=None (csv.Sniffer
+    over the first line), so the file can be read with an explicit sep by
+    any backend instead of falling back to the python engine.
+    """
+    with open(path, encoding=encoding, errors="replace", newline="") as f:
+        lines = f.read(sample_bytes).splitlines()
+    return csv.Sniffer().sniff(lines[0] if lines else "").delimiter
+
+def available_backends():
+    return [name for name, backend in BACKENDS.items() if importlib.util.find_spec(backend.requires) is not None]
+
+def get_backend(name="pandas"):
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown backend '{name}', expected one of {list(BACKENDS)}")
+    if name not in available_backends():
+        raise ValueError(f"Backend '{name}' needs {BACKENDS[name].requires}, which is not installed")
+    return BACKENDS[name]()
@@ -0,0 +1,299 @@
+import argparse
+import hashlib
+import re
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from tennis_research import find_repo_root, get_file_encoding_type, normalize_name
+
+try:
+    import pyarrow  # noqa: F401
+    TABLE_FORMAT = "parquet"
+except ImportError:
+    TABLE_FORMAT = "csv"
+
+# Raw doubles point columns the aggregates read
+POINT_COLUMNS = ["match_id", "PointNumber", "PointWinner", "PointServer", "P1Ace", "P2Ace",
+                 "P1DoubleFault", "P2DoubleFault", "P1BreakPoint", "P2BreakPoint"]
+# PointServer 1/3 are player1/partner1 (side 1), 2/4 player2/partner2 (side 2);
+# the AO and FO 2018-2021 files only record the side (1/2), so a server is
+# only known to be the player in matches that use 3/4 at all.
+SERVER_SIDE = {1: 1, 2: 2, 3: 1, 4: 2}
+SERVER_MEMBER = {1: "player", 2: "player", 3: "partner", 4: "partner"}
+
+TEAM_STAT_COLUMNS = [
+    "points_played", "points_won", "serve_pts", "serve_won", "return_pts", "return_won",
+    "aces", "double_faults", "bp_faced", "bp_saved",
+]
+
+# ---------------------------
+# IDS
+# ---------------------------
+# Doubles files spell the same player 'Nikola Mektic', 'N. Mektic' and
+# 'N  Mektic' depending on the slam and year, so players are keyed on first
+# initial + last name. Two players sharing both within doubles is rare
+# enough to accept.
+def doubles_player_key(name):
+    canonical = normalize_name(name) if isinstance(name, str) else None
+    if not canonical:
+        return None
+    tokens = canonical.split()
+    return tokens[0] if len(tokens) == 1 else f"{tokens[0][0]} {tokens[-1]}"
+
+def generate_team_id(key_a, key_b):
+    """
+    Stable id of an unordered pair: the same two players get the same id
+    whichever of them is listed first.
+    """
+    a, b = sorted([key_a, key_b])
+    h = hashlib.sha1(f"{a}|{b}".encode("utf-8")).hexdigest()
+    return f"t_{h[:8]}"
+
+# ---------------------------
+# TEAM MATCHES
+# ---------------------------
+def split_match_num(match_num):
+    """
+    ('MD', 1) for 'MD101', ('3', 1) for '3101': the draw code and the round
+    number (first digit after it).
+    """
+    m = re.fullmatch(r"([A-Za-z]+|\d)(\d)\d*", str(match_num))
+    return (m.group(1), int(m.group(2))) if m else (None, None)
+
+def load_team_matches(matches_directory):
+    """
+    One row per doubles/mixed match with both sides' team ids. Sides keep
+    the file's (player, partner) order; team ids don't depend on it.
+    """
+    frames = []
+    for file_path in sorted(Path(matches_directory).glob("*-matches-*.csv")):
+        event = "mixed" if "mixed" in file_path.stem else "doubles"
+        df = pd.read_csv(file_path, encoding=get_file_encoding_type(file_path), dtype=str)
+        draw_round = df["match_num"].map(split_match_num)
+        frame = pd.DataFrame({
+            "match_id": df["match_id"],
+            "year": df["year"].astype(int),
+            "slam": df["slam"],
+            "event": event,
+            "draw": draw_round.str[0],
+            "round_no": draw_round.str[1].astype("Int64"),
+        })
+        for side in (1, 2):
+            player, partner = df[f"player{side}"], df[f"partner{side}"]
+            player_key, partner_key = player.map(doubles_player_key), partner.map(doubles_player_key)
+            valid = player_key.notna() & partner_key.notna()
+            frame[f"team{side}_id"] = [generate_team_id(a, b) if ok else None for a, b, ok in zip(player_key, partner_key, valid)]
+            frame[f"team{side}_player"] = player_key
+            frame[f"team{side}_partner"] = partner_key
+            frame[f"team{side}_names"] = player.fillna("?").str.strip() + " / " + partner.fillna("?").str.strip()
+        frames.append(frame)
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+# ---------------------------
+# POINT AGGREGATES
+# ---------------------------
+def load_doubles_points(points_directory):
+    frames = []
+    for file_path in sorted(Path(points_directory).glob("*-points-*.csv")):
+        df = pd.read_csv(file_path, encoding=get_file_encoding_type(file_path), usecols=lambda c: c in POINT_COLUMNS, low_memory=False)
+        frames.append(df.reindex(columns=POINT_COLUMNS))
+    points = pd.concat(frames, ignore_index=True)
+    # PointServer 0 rows are scoreboard placeholders, not points
+    points["PointServer"] = pd.to_numeric(points["PointServer"], errors="coerce")
+    return points[points["PointServer"].isin(SERVER_SIDE)].reset_index(drop=True)
+
+def side_point_stats(points):
+    """
+    Per-(match_id, side) serve/return totals from one grouped pass per
+    side, plus the side that won the match (the winner of its last point)
+    and per-member serve totals for the matches that record which member
+    served.
+    """
+    server = points["PointServer"].map(SERVER_SIDE).to_numpy()
+    winner = pd.to_numeric(points["PointWinner"], errors="coerce").fillna(0).to_numpy().astype(np.int64)
+    flag = lambda c: pd.to_numeric(points[c], errors="coerce").fillna(0).to_numpy() > 0
+
+    frames = []
+    for side, other in ((1, 2), (2, 1)):
+        serving = server == side
+        won = winner == side
+        bp = serving & flag(f"P{other}BreakPoint")
+        frame = pd.DataFrame({
+            "match_id": points["match_id"].to_numpy(),
+            "points_played": 1,
+            "points_won": won,
+            "serve_pts": serving,
+            "serve_won": serving & won,
+            "return_pts": ~serving,
+            "return_won": ~serving & won,
+            "aces": serving & flag(f"P{side}Ace"),
+            "double_faults": serving & flag(f"P{side}DoubleFault"),
+            "bp_faced": bp,
+            "bp_saved": bp & won,
+        })
+        frame = frame.groupby("match_id", sort=False)[TEAM_STAT_COLUMNS].sum()
+        frame.insert(0, "side", side)
+        frames.append(frame.reset_index())
+    side_stats = pd.concat(frames, ignore_index=True)
+
+    order = pd.to_numeric(points["PointNumber"], errors="coerce").fillna(0)
+    last = points.assign(_order=order.to_numpy()).sort_values(["match_id", "_order"], kind="stable").groupby("match_id").tail(1)
+    match_winner = pd.Series(pd.to_numeric(last["PointWinner"], errors="coerce").to_numpy(), index=last["match_id"].to_numpy())
+
+    members = points.assign(
+        side=server, member=points["PointServer"].map(SERVER_MEMBER), serve_won=winner == server,
+    )
+    member_served = points.loc[points["PointServer"].isin([3, 4]), "match_id"].unique()
+    members = members[members["match_id"].isin(member_served)]
+    member_stats = members.groupby(["match_id", "side", "member"], as_index=False).agg(
+        serve_pts=("serve_won", "size"), serve_won=("serve_won", "sum"),
+    )
+    return side_stats, match_winner, member_stats
+
+# ---------------------------
+# TEAM INDEX
+# ---------------------------
+class TeamIndex:
+    """
+    Team-match table plus team-level aggregates, with a team -> matches
+    index stored as match rows sorted by team and an offset per team (every
+    match appears once per side).
+    """
+
+    def __init__(self, team_matches, team_stats, member_stats):
+        self.team_matches = team_matches.reset_index(drop=True)
+        self.team_stats = team_stats
+        self.member_stats = member_stats
+
+        teams = np.concatenate([self.team_matches["team1_id"].to_numpy(dtype=object), self.team_matches["team2_id"].to_numpy(dtype=object)])
+        rows = np.concatenate([np.arange(len(self.team_matches))] * 2)
+        valid = pd.notna(teams)
+        teams, rows = teams[valid].astype(str), rows[valid]
+        order = np.lexsort([rows, teams])
+        self.team_ids, starts = np.unique(teams[order], return_index=True)
+        self.match_rows = rows[order]
+        self.offsets = np.append(starts, len(order))
+        self._position = {t: i for i, t in enumerate(self.team_ids.tolist())}
+
+        keys = pd.concat([
+            self.team_matches[[f"team{s}_id", f"team{s}_{m}"]].set_axis(["team_id", "player_key"], axis=1)
+            for s in (1, 2) for m in ("player", "partner")
+        ]).dropna().drop_duplicates()
+        self.player_teams = keys.groupby("player_key")["team_id"].agg(lambda t: sorted(set(t))).to_dict()
+
+    def team_id(self, name_a, name_b):
+        return generate_team_id(doubles_player_key(name_a), doubles_player_key(name_b))
+
+    def matches(self, team_id):
+        """
+        Every match of a team, as a slice of the team-match table.
+        """
+        i = self._position.get(team_id)
+        if i is None:
+            return self.team_matches.iloc[:0]
+        return self.team_matches.iloc[self.match_rows[self.offsets[i]:self.offsets[i + 1]]]
+
+    def partnerships(self, name):
+        """
+        Every team a player has played in, with its aggregates, most matches
+        first.
+        """
+        teams = self.player_teams.get(doubles_player_key(name), [])
+        return self.team_stats.loc[self.team_stats.index.intersection(teams)].sort_values(["matches", "serve_won_pct"], ascending=False)
+
+    def head_to_head(self, team_a, team_b):
+        a, b = self.matches(team_a), self.matches(team_b)
+        return a[a["match_id"].isin(b["match_id"])]
+
+def build_team_index(matches_directory, points_directory):
+    """
+    Loads every doubles/mixed matches and points file and builds the
+    TeamIndex: team-match table (with the winner and points per side), team
+    serve/return aggregates and per-member serve totals.
+    """
+    team_matches = load_team_matches(matches_directory)
+    side_stats, match_winner, member_stats = side_point_stats(load_doubles_points(points_directory))
+    team_matches["winner_side"] = team_matches["match_id"].map(match_winner).astype("Int64")
+    for side in (1, 2):
+        won = side_stats[side_stats["side"] == side].set_index("match_id")["points_won"]
+        team_matches[f"team{side}_points_won"] = team_matches["match_id"].map(won).astype("Int64")
+
+    # Side rows -> team rows, then one grouped pass per team
+    sides = pd.concat([
+        team_matches[["match_id", f"team{s}_id"]].set_axis(["match_id", "team_id"], axis=1).assign(side=s, won=team_matches["winner_side"] == s)
+        for s in (1, 2)
+    ]).dropna(subset=["team_id"])
+    per_match = sides.merge(side_stats, on=["match_id", "side"], how="left")
+    team_stats = per_match.groupby("team_id").agg(
+        matches=("match_id", "size"), charted=("points_played", "count"), wins=("won", "sum"),
+        **{c: (c, "sum") for c in TEAM_STAT_COLUMNS},
+    )
+    team_stats[TEAM_STAT_COLUMNS] = team_stats[TEAM_STAT_COLUMNS].astype(int)
+    names = sides.merge(team_matches[["match_id", "team1_names", "team2_names"]], on="match_id")
+    names["names"] = np.where(names["side"] == 1, names["team1_names"], names["team2_names"])
+    team_stats.insert(0, "names", names.groupby("team_id")["names"].agg(lambda n: n.value_counts().index[0]))
+    team_stats["serve_won_pct"] = (team_stats["serve_won"] / team_stats["serve_pts"].where(team_stats["serve_pts"] > 0)).round(4)
+    team_stats["return_won_pct"] = (team_stats["return_won"] / team_stats["return_pts"].where(team_stats["return_pts"] > 0)).round(4)
+
+    member_keys = pd.concat([
+        team_matches[["match_id", f"team{s}_id", f"team{s}_{m}"]].set_axis(["match_id", "team_id", "player_key"], axis=1).assign(side=s, member=m)
+        for s in (1, 2) for m in ("player", "partner")
+    ]).dropna(subset=["team_id"])
+    member_stats = member_stats.merge(member_keys, on=["match_id", "side", "member"])
+    member_stats = member_stats.groupby(["team_id", "player_key"], as_index=False).agg(
+        matches=("match_id", "nunique"), serve_pts=("serve_pts", "sum"), serve_won=("serve_won", "sum"),
+    )
+    return TeamIndex(team_matches, team_stats.sort_index(), member_stats)
+
+def write_table(df, path):
+    path = path.with_suffix(f".{TABLE_FORMAT}")
+    if TABLE_FORMAT == "parquet":
+        df.to_parquet(path)
+    else:
+        df.to_csv(path)
+    return path
+
+
+if __name__ == "__main__":
+    root = find_repo_root()
+    old_data_directory = root / "data" / "old_data"
+    output_directory = root / "data" / "processed" / "teams"
+
+    parser = argparse.ArgumentParser(description="Doubles/mixed team ids, team-match table and team serve/return aggregates.")
+    parser.add_argument("--player", action="append", default=[], help="Show every partnership of a player")
+    parser.add_argument("--team", nargs=2, metavar=("PLAYER", "PARTNER"), help="Show a team's matches")
+    args = parser.parse_args()
+
+    print(f"[INFO] - Repository Root: {root}")
+    start = time.perf_counter()
+    index = build_team_index(old_data_directory / "matches", old_data_directory / "points")
+    build_s = time.perf_counter() - start
+
+    output_directory.mkdir(parents=True, exist_ok=True)
+    written = [
+        write_table(index.team_matches.set_index("match_id"), output_directory / "team_matches"),
+        write_table(index.team_stats, output_directory / "team_stats"),
+    ]
+    np.savez(output_directory / "team_match_index.npz", team_ids=index.team_ids, match_rows=index.match_rows, offsets=index.offsets)
+
+    print("\n----------- SUMMARY -------------")
+    print(f"Team matches: {len(index.team_matches):,} ({index.team_matches['winner_side'].notna().sum():,} with points)")
+    print(f"Teams: {len(index.team_ids):,}  Players: {len(index.player_teams):,}")
+    print(f"Built in {build_s:.2f}s")
+    for path in written:
+        print(f"Written: {path}")
+
+    for name in args.player:
+        start = time.perf_counter()
+        result = index.partnerships(name)
+        query_ms = (time.perf_counter() - start) * 1000
+        print(f"\n----------- PARTNERSHIPS: {name} ({query_ms:.2f} ms) -------------")
+        print(result[["names", "matches", "wins", "serve_won_pct", "return_won_pct", "aces", "double_faults"]].to_string())
+    if args.team:
+        team_id = index.team_id(*args.team)
+        print(f"\n----------- TEAM {team_id}: {' / '.join(args.team)} -------------")
+        print(index.matches(team_id)[["match_id", "event", "draw", "round_no", "team1_names", "team2_names", "winner_side"]].to_string(index=False))
+        print(index.member_stats[index.member_stats["team_id"] == team_id].to_string(index=False))
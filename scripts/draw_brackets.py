@@ -0,0 +1,356 @@
+import argparse
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from head_to_head import infer_match_winners, points_won_ratings
+from match_linkage import SLAM_ROUNDS, SLAM_TOURNAMENTS, load_player_index, parse_singles_match_num, player_ids
+from tennis_research import find_repo_root, get_file_encoding_type
+
+# Round order within an edition. Round robin sits between the last
+# knockout round of the group stage and the semifinals; BR is the bronze
+# match and is not linked forward.
+ROUND_ORDER = {
+    "Q1": 0, "Q2": 1, "Q3": 2, "PQ": 2, "R128": 3, "R64": 4, "R32": 5, "R16": 6,
+    "RR": 7, "PO": 7, "QF": 8, "SF": 9, "BR": 10, "F": 11,
+}
+# Slam match_num: event (1/2 or MS/WS), round digit (1 = R128 ... 7 = F), slot
+SLAM_ROUND_ORDER = {int(d): ROUND_ORDER[r] for d, r in SLAM_ROUNDS.items()}
+
+BRACKET_ARRAYS = ["edition_ptr", "round_order", "slot", "p1", "p2", "winner", "next"]
+
+# ---------------------------
+# RECORDS
+# ---------------------------
+# Both sources become one record table: edition key, round order, slot
+# (draw position within the round; -1 when the source has none), players
+# and, where known, the winning side.
+def load_mcp_draw_records(canonical_directory, stats_directory):
+    matches = pd.read_csv(Path(canonical_directory) / "matches" / "matches.csv")
+    round_code = matches["round"].astype(str).str.strip()
+    winners = infer_match_winners(matches, stats_directory)
+    records = pd.DataFrame({
+        "match_id": matches["match_id"],
+        "source": "mcp",
+        "tournament": matches["tournament"],
+        # Some dates are missing; match ids always start with the date
+        "year": matches["match_id"].str[:4].astype(int),
+        "gender": matches["match_id"].str.split("-").str[1],
+        "round": round_code,
+        "round_order": round_code.map(ROUND_ORDER),
+        "slot": -1,
+        "player1_id": matches["player1_id"],
+        "player2_id": matches["player2_id"],
+    })
+    won = records["match_id"].map(winners)
+    records["winner"] = np.select([won == records["player1_id"], won == records["player2_id"]], [1, 2], 0)
+    return records.dropna(subset=["round_order"])
+
+def slam_point_winners(points_directory):
+    """
+    match_id -> side (1/2) that won the last point, from the singles slam
+    points files.
+    """
+    frames = []
+    for file_path in sorted(Path(points_directory).glob("*-points.csv")):
+        frames.append(pd.read_csv(file_path, encoding=get_file_encoding_type(file_path), usecols=["match_id", "PointNumber", "PointWinner"], low_memory=False))
+    if not frames:
+        return pd.Series(dtype="int64")
+    points = pd.concat(frames, ignore_index=True)
+    points["PointWinner"] = pd.to_numeric(points["PointWinner"], errors="coerce")
+    points["order"] = pd.to_numeric(points["PointNumber"], errors="coerce")
+    points = points[points["PointWinner"].isin([1, 2])].sort_values(["match_id", "order"], kind="stable")
+    return points.groupby("match_id")["PointWinner"].last().astype(int)
+
+def load_slam_draw_records(matches_directory, points_directory, index=None):
+    """
+    Singles draws from the slam matches files, players resolved through
+    `index` (load_player_index()) so abbreviated names get their canonical
+    ids.
+    """
+    winners = slam_point_winners(points_directory)
+    frames = []
+    for file_path in sorted(Path(matches_directory).glob("*-matches.csv")):
+        df = pd.read_csv(file_path, encoding=get_file_encoding_type(file_path), dtype=str)
+        gender, round_digit = parse_singles_match_num(df["match_num"])
+        draw = (gender.notna() & round_digit.isin(list(SLAM_ROUNDS))).to_numpy()
+        df, gender, round_digit = df[draw], gender[draw], round_digit[draw]
+        if df.empty:
+            continue
+        frames.append(pd.DataFrame({
+            "match_id": df["match_id"],
+            "source": "slam",
+            "tournament": df["slam"].map(SLAM_TOURNAMENTS).fillna(df["slam"]),
+            "year": df["year"].astype(int),
+            "gender": gender,
+            "round": round_digit.map(SLAM_ROUNDS),
+            "round_order": round_digit.astype(int).map(SLAM_ROUND_ORDER),
+            "slot": df["match_num"].str[-2:].astype(int),
+            "player1_id": player_ids(df["player1"], index),
+            "player2_id": player_ids(df["player2"], index),
+            "winner": df["match_id"].map(winners).fillna(0).astype(int),
+        }))
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+# ---------------------------
+# BRACKETS
+# ---------------------------
+class Brackets:
+    """
+    Every tournament edition as an array-based tree. Matches are stored in
+    one sorted pass by (edition, round, slot), so an edition is the slice
+    edition_ptr[e]:edition_ptr[e + 1] and each match row has:
+
+    - round_order, slot (-1 if unknown)
+    - p1, p2: codes into player_ids (-1 if missing)
+    - winner: 1, 2, or 0 if unknown
+    - next: row of the match its winner plays next (-1 for the final or
+      when that match isn't in the data)
+
+    Slam editions are linked by draw position (slot s feeds slot
+    (s + 1) // 2 of the next round); charted editions, which only cover
+    some matches, by each player's next appearance in a later round.
+    """
+
+    def __init__(self, records):
+        records = records.assign(edition=records["source"] + ":" + records["year"].astype(str) + "-" + records["gender"] + "-" + records["tournament"])
+        records = records.sort_values(["edition", "round_order", "slot", "match_id"], kind="stable").reset_index(drop=True)
+        self.records = records
+        self.editions, starts = np.unique(records["edition"].to_numpy(dtype=str), return_index=True)
+        self.edition_ptr = np.append(starts, len(records)).astype(np.int64)
+        self._edition_pos = {e: i for i, e in enumerate(self.editions.tolist())}
+        edition_code = np.repeat(np.arange(len(self.editions)), np.diff(self.edition_ptr))
+
+        codes, self.player_ids = pd.factorize(pd.concat([records["player1_id"], records["player2_id"]]), use_na_sentinel=True)
+        self.player_ids = np.asarray(self.player_ids, dtype=str)
+        self._player_pos = {p: i for i, p in enumerate(self.player_ids.tolist())}
+        self.p1, self.p2 = codes[:len(records)].astype(np.int32), codes[len(records):].astype(np.int32)
+        self.round_order = records["round_order"].to_numpy(dtype=np.int8)
+        self.slot = records["slot"].to_numpy(dtype=np.int32)
+        self.winner = records["winner"].to_numpy(dtype=np.int8)
+
+        self.next = np.full(len(records), -1, dtype=np.int32)
+        self._link_slots(edition_code)
+        self._link_appearances(edition_code)
+        self._infer_winners()
+
+    def _link_slots(self, edition_code):
+        keyed = self.slot >= 0
+        key = (edition_code.astype(np.int64) << 20) | (self.round_order.astype(np.int64) << 12) | np.maximum(self.slot, 0)
+        order = np.argsort(key[keyed], kind="stable")
+        sorted_keys, sorted_rows = key[keyed][order], np.flatnonzero(keyed)[order]
+        next_round = np.array([min((v for v in SLAM_ROUND_ORDER.values() if v > r), default=-1) for r in range(max(ROUND_ORDER.values()) + 1)])
+        target_round = next_round[self.round_order]
+        target = (edition_code.astype(np.int64) << 20) | (target_round.astype(np.int64) << 12) | ((self.slot + 1) // 2)
+        pos = np.searchsorted(sorted_keys, target)
+        found = keyed & (target_round >= 0) & (pos < len(sorted_keys))
+        found[found] &= sorted_keys[pos[found]] == target[found]
+        self.next[found] = sorted_rows[pos[found]]
+
+    def _link_appearances(self, edition_code):
+        """
+        Unslotted matches: a player's next match in the edition is their
+        first appearance in a later round. Links the match to it when that
+        player won (or may have won: the winner is unknown and the other
+        player doesn't appear later).
+        """
+        rows = np.flatnonzero(self.slot < 0)
+        app = pd.DataFrame({
+            "edition": np.concatenate([edition_code[rows]] * 2),
+            "player": np.concatenate([self.p1[rows], self.p2[rows]]),
+            "round_order": np.concatenate([self.round_order[rows]] * 2),
+            "row": np.concatenate([rows] * 2),
+            "side": np.repeat([1, 2], len(rows)),
+        })
+        app = app[(app["player"] >= 0) & (app["round_order"] != ROUND_ORDER["BR"])]
+        app = app.sort_values(["edition", "player", "round_order", "row"], kind="stable")
+        first = app.drop_duplicates(["edition", "player", "round_order"])
+        later = first.groupby(["edition", "player"])["row"].shift(-1)
+        first = first.assign(next_row=later.to_numpy())
+        app = app.merge(first[["edition", "player", "round_order", "next_row"]], on=["edition", "player", "round_order"])
+        app = app.dropna(subset=["next_row"])
+
+        winner = self.winner[app["row"].to_numpy()]
+        advanced = app.groupby("row")["side"].transform("size") == 1
+        take = (winner == app["side"].to_numpy()) | ((winner == 0) & advanced.to_numpy())
+        chosen = app[take]
+        self.next[chosen["row"].to_numpy()] = chosen["next_row"].to_numpy(dtype=np.int32)
+
+    def _infer_winners(self):
+        """
+        A player who shows up in the next match won this one.
+        """
+        rows = np.flatnonzero((self.winner == 0) & (self.next >= 0))
+        nxt = self.next[rows]
+        in_next_1 = (self.p1[rows] >= 0) & ((self.p1[rows] == self.p1[nxt]) | (self.p1[rows] == self.p2[nxt]))
+        in_next_2 = (self.p2[rows] >= 0) & ((self.p2[rows] == self.p1[nxt]) | (self.p2[rows] == self.p2[nxt]))
+        self.winner[rows] = np.select([in_next_1 & ~in_next_2, in_next_2 & ~in_next_1], [1, 2], 0)
+        # Slot links are structural: keep them even when the winner is unknown,
+        # but drop appearance links that turned out to follow the loser
+        unlinked = (self.slot < 0) & (self.next >= 0) & (self.winner > 0)
+        winner_code = np.where(self.winner == 1, self.p1, self.p2)
+        nxt = self.next[unlinked]
+        follows = (winner_code[unlinked] == self.p1[nxt]) | (winner_code[unlinked] == self.p2[nxt])
+        self.next[np.flatnonzero(unlinked)[~follows]] = -1
+
+    # ---------------------------
+    # QUERIES
+    # ---------------------------
+    def edition_rows(self, edition):
+        e = self._edition_pos[edition]
+        return np.arange(self.edition_ptr[e], self.edition_ptr[e + 1])
+
+    def find_editions(self, tournament, year=None, gender=None):
+        """
+        Edition keys whose tournament name contains `tournament`.
+        """
+        found = [e for e in self.editions.tolist() if tournament.lower() in e.split("-", 2)[2].lower()]
+        if year is not None:
+            found = [e for e in found if e.split(":", 1)[1].startswith(f"{year}-")]
+        if gender is not None:
+            found = [e for e in found if e.split("-")[1] == gender]
+        return found
+
+    def path(self, edition, player_id):
+        """
+        Rows of the player's run through the edition: from their first match
+        along the winner links until they lose (or reach the final).
+        """
+        i = self._player_pos.get(player_id, -2)
+        rows = self.edition_rows(edition)
+        mine = rows[(self.p1[rows] == i) | (self.p2[rows] == i)]
+        if len(mine) == 0:
+            return mine
+        run = [mine[0]]
+        while True:
+            row = run[-1]
+            side = 1 if self.p1[row] == i else 2
+            nxt = self.next[row]
+            if nxt < 0 or self.winner[row] not in (0, side) or i not in (self.p1[nxt], self.p2[nxt]):
+                break
+            run.append(nxt)
+        return np.array(run)
+
+    def path_frame(self, edition, player_id):
+        rows = self.path(edition, player_id)
+        frame = self.records.iloc[rows][["match_id", "round", "slot", "player1_id", "player2_id"]].copy()
+        frame["opponent_id"] = np.where(frame["player1_id"] == player_id, frame["player2_id"], frame["player1_id"])
+        frame["won"] = np.where(self.winner[rows] == 0, None, np.where(self.winner[rows] == 1, frame["player1_id"], frame["player2_id"]) == player_id)
+        return frame
+
+    def section_players(self, row):
+        """
+        Player codes in the first-round slots that feed a slam match: the
+        part of the draw its two players came from.
+        """
+        rows = self.edition_rows(self.records.at[row, "edition"])
+        depth = list(SLAM_ROUND_ORDER.values()).index(self.round_order[row])
+        width = 1 << depth
+        first = rows[self.round_order[rows] == min(SLAM_ROUND_ORDER.values())]
+        slots = self.slot[first]
+        inside = (slots > (self.slot[row] - 1) * width) & (slots <= self.slot[row] * width)
+        return np.concatenate([self.p1[first[inside]], self.p2[first[inside]]])
+
+    def strength_of_draw(self, edition, player_id, ratings):
+        """
+        Ratings of the opponents on the player's path, and for slot-linked
+        editions the mean rating of the half of each match's section the
+        opponent came from (everyone the player could have met there).
+        Unrated players count as missing.
+        """
+        rating = pd.Series(self.player_ids).map(ratings).to_numpy(dtype=float)
+        i = self._player_pos.get(player_id, -2)
+        rows = self.path(edition, player_id)
+        result = self.path_frame(edition, player_id)
+        opponent = np.where(self.p1[rows] == i, self.p2[rows], self.p1[rows])
+        result["opponent_rating"] = np.where(opponent >= 0, rating[np.maximum(opponent, 0)], np.nan)
+        section = []
+        for row in rows:
+            if self.slot[row] < 0:
+                section.append(np.nan)
+                continue
+            players = self.section_players(row)
+            players = players[(players >= 0) & (players != i)]
+            own_half = self.section_players(self._feeder(row, i)) if self._feeder(row, i) >= 0 else np.array([], dtype=np.int32)
+            others = np.setdiff1d(players, own_half)
+            section.append(np.nanmean(rating[others]) if len(others) and np.isfinite(rating[others]).any() else np.nan)
+        result["section_rating"] = section
+        return result
+
+    def _feeder(self, row, player):
+        """
+        The match of the previous round that sent `player` to `row`, or -1.
+        """
+        feeders = np.flatnonzero(self.next == row)
+        mine = feeders[(self.p1[feeders] == player) | (self.p2[feeders] == player)]
+        return int(mine[0]) if len(mine) else -1
+
+    def summary(self):
+        editions = self.records.groupby("edition").agg(
+            source=("source", "first"), tournament=("tournament", "first"), year=("year", "first"),
+            gender=("gender", "first"), matches=("match_id", "size"),
+        )
+        linked = pd.Series(self.next >= 0).groupby(self.records["edition"]).sum()
+        known = pd.Series(self.winner > 0).groupby(self.records["edition"]).sum()
+        return editions.assign(linked=linked, winners_known=known)
+
+    def save(self, path):
+        np.savez(path, editions=self.editions, player_ids=self.player_ids, **{name: getattr(self, name) for name in BRACKET_ARRAYS})
+
+def build_brackets(root, index=None):
+    data_directory = root / "data"
+    index = index or load_player_index(data_directory / "canonical" / "players" / "players.csv")
+    records = pd.concat([
+        load_mcp_draw_records(data_directory / "canonical", data_directory / "raw" / "stats"),
+        load_slam_draw_records(data_directory / "old_data" / "matches", data_directory / "old_data" / "points", index),
+    ], ignore_index=True)
+    return Brackets(records)
+
+
+if __name__ == "__main__":
+    root = find_repo_root()
+    output_directory = root / "data" / "processed" / "brackets"
+
+    parser = argparse.ArgumentParser(description="Reconstruct tournament draws as linked brackets; path-to-final and strength-of-draw queries.")
+    parser.add_argument("--tournament", help="Tournament name (substring) to query")
+    parser.add_argument("--year", type=int)
+    parser.add_argument("--gender", choices=["M", "W"])
+    parser.add_argument("--player", help="Player name for path / strength-of-draw")
+    args = parser.parse_args()
+
+    print(f"[INFO] - Repository Root: {root}")
+    start = time.perf_counter()
+    index = load_player_index(root / "data" / "canonical" / "players" / "players.csv")
+    brackets = build_brackets(root, index)
+    build_s = time.perf_counter() - start
+
+    output_directory.mkdir(parents=True, exist_ok=True)
+    summary = brackets.summary()
+    summary.to_csv(output_directory / "editions.csv")
+    brackets.save(output_directory / "brackets.npz")
+
+    print("\n----------- SUMMARY -------------")
+    print(f"Editions: {len(brackets.editions):,} ({(summary['source'] == 'slam').sum()} slam draws)")
+    print(f"Matches: {len(brackets.records):,}  linked: {(brackets.next >= 0).sum():,}  winner known: {(brackets.winner > 0).sum():,}")
+    print(f"Built in {build_s:.2f}s")
+    print(f"Written: {output_directory}")
+
+    if args.tournament:
+        editions = brackets.find_editions(args.tournament, args.year, args.gender)
+        if not editions:
+            print(f"[ERROR] - No edition matches '{args.tournament}'")
+            quit()
+        print(summary.loc[editions].to_string())
+        if args.player:
+            player_id = player_ids(pd.Series([args.player]), index).iloc[0]
+            ratings = points_won_ratings(root / "data" / "raw" / "stats")
+            for edition in editions:
+                start = time.perf_counter()
+                result = brackets.strength_of_draw(edition, player_id, ratings)
+                query_ms = (time.perf_counter() - start) * 1000
+                if result.empty:
+                    continue
+                print(f"\n----------- {edition}: {args.player} ({query_ms:.2f} ms) -------------")
+                print(result.drop(columns=["player1_id", "player2_id"]).to_string(index=False))
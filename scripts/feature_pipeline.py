@@ -0,0 +1,397 @@
+import argparse
+import hashlib
+import json
+import re
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from tennis_research import find_repo_root
+
+# Bump when the normalized point schema or a block's logic changes so stale
+# cache entries are ignored.
+PIPELINE_VERSION = 2
+
+SLAM_MONTHS = {"ausopen": 1, "frenchopen": 5, "wimbledon": 6, "usopen": 8}
+RALLY_BUCKETS = [(0, 3), (4, 6), (7, 9), (10, 999)]
+# MCP serve codes: 4 = wide, 5 = body, 6 = down the T
+MCP_SERVE_DIRECTIONS = {"4": 1, "5": 2, "6": 3}
+
+# ---------------------------
+# NORMALIZED POINTS
+# ---------------------------
+# Every source is mapped to one narrow schema before any feature is built:
+#   match_id, order_key, server (1/2), winner (1/2), speed_kmh, serve_number,
+#   serve_dir (1 wide / 2 body / 3 T), court ('d'/'a'), rally_len, break_point
+def slam_order_key(match_id):
+    """
+    Sortable date-like key for a slam match_id ('2013-usopen-1101'):
+    YYYYMM of the slam plus the round digit of the match number.
+    """
+    year, slam, match_num = str(match_id).split("-", 2)
+    round_digit = int(match_num[1]) if len(match_num) == 4 and match_num[1].isdigit() else 0
+    return int(year) * 10000 + SLAM_MONTHS.get(slam, 0) * 100 + round_digit
+
+def load_slam_points(file_path):
+    return normalize_slam_points(pd.read_csv(file_path, dtype=str))
+
+def normalize_slam_points(df):
+    """
+    Normalizes slam point rows (one file or a chunk of one). Doubles servers
+    (3/4) fold onto their side, ServeNumber is used where the file has it,
+    and Rally falls back to RallyCount for the 2018+ files.
+    """
+    num = lambda col: pd.to_numeric(df[col], errors="coerce") if col in df else pd.Series(np.nan, index=df.index)
+
+    server = num("PointServer")
+    winner = num("PointWinner")
+    keep = server.isin([1, 2, 3, 4]) & winner.isin([1, 2])
+    rally = num("Rally") if "Rally" in df and df["Rally"].notna().any() else num("RallyCount")
+    direction = num("Serve_Direction")
+    court = df["ServingTo"].str.strip().str.lower() if "ServingTo" in df else pd.Series(np.nan, index=df.index)
+    speed = num("Speed_KMH")
+    server_side = (server - 1) % 2 + 1
+    break_point = np.where(server_side == 1, num("P2BreakPoint"), num("P1BreakPoint"))
+
+    points = pd.DataFrame({
+        "match_id": df["match_id"],
+        "order_key": df["match_id"].map(slam_order_key),
+        "server": server_side,
+        "winner": winner,
+        "speed_kmh": speed.where(speed > 0),
+        "serve_number": num("ServeNumber").where(lambda s: s.isin([1, 2])),
+        "serve_dir": direction.where(direction.isin([1, 2, 3])),
+        "court": court.where(court.isin(["d", "a"])),
+        "rally_len": rally.where(rally > 0),
+        "break_point": pd.Series(break_point, index=df.index).fillna(0) > 0,
+    })
+    return points[keep.to_numpy()]
+
+def load_mcp_points(file_path):
+    return normalize_mcp_points(pd.read_csv(file_path, dtype=str, encoding="latin-1"))
+
+def normalize_mcp_points(df):
+    """
+    Normalizes MCP point rows: serve direction and serve number come from
+    the '1st'/'2nd' shot strings, rally length from the number of shot
+    letters in the played string, court side and break points from the
+    point score (Pts, server first, before the point).
+    """
+    server = pd.to_numeric(df["Svr"], errors="coerce")
+    winner = pd.to_numeric(df["PtWinner"], errors="coerce")
+    keep = server.isin([1, 2]) & winner.isin([1, 2])
+
+    second = df["2nd"].fillna("").str.strip()
+    played = np.where(second != "", second, df["1st"].fillna("").str.strip())
+    played = pd.Series(played, index=df.index)
+    serve_number = np.where(second != "", 2, 1)
+    serve_dir = played.str[:1].map(MCP_SERVE_DIRECTIONS)
+    rally_len = played.str[1:].str.count(r"[fbrsvzopuylmhijkt]") + 1
+
+    # Points played so far in the game decides the court: even -> deuce side
+    pts = df["Pts"].fillna("0-0").str.split("-", n=1, expand=True)
+    point_values = {"0": 0, "15": 1, "30": 2, "40": 3, "AD": 4}
+    played_in_game = pts[0].map(point_values).fillna(pd.to_numeric(pts[0], errors="coerce")) + pts[1].map(point_values).fillna(pd.to_numeric(pts[1], errors="coerce"))
+    court = np.where(played_in_game.fillna(0) % 2 == 0, "d", "a")
+
+    # Break point: the returner wins the game with this point. Tiebreaks
+    # (games level at 6) have no break points.
+    server_pts, returner_pts = pts[0].map(point_values), pts[1].map(point_values)
+    games_1, games_2 = pd.to_numeric(df["Gm1"], errors="coerce"), pd.to_numeric(df["Gm2"], errors="coerce")
+    tiebreak = (games_1 == games_2) & (games_1 >= 6)
+    break_point = (returner_pts >= 3) & (returner_pts > server_pts) & ~tiebreak
+
+    points = pd.DataFrame({
+        "match_id": df["match_id"],
+        "order_key": pd.to_numeric(df["match_id"].str[:8], errors="coerce"),
+        "server": server,
+        "winner": winner,
+        "speed_kmh": np.nan,
+        "serve_number": serve_number,
+        "serve_dir": serve_dir,
+        "court": court,
+        "rally_len": rally_len,
+        "break_point": break_point,
+    })
+    return points[keep.to_numpy()]
+
+def load_player_names(matches_directory):
+    """
+    (match_id, side) -> player name from the slam matches files. Doubles
+    sides are named 'Player / Partner'.
+    """
+    frames = []
+    for file_path in sorted(Path(matches_directory).glob("*-matches*.csv")):
+        df = pd.read_csv(file_path, dtype=str)
+        for side in (1, 2):
+            name = df[f"player{side}"].fillna("")
+            if f"partner{side}" in df:
+                partner = df[f"partner{side}"].fillna("")
+                name = np.where(partner != "", name + " / " + partner, name)
+            frames.append(pd.DataFrame({"match_id": df["match_id"], "side": side, "player": name}))
+    if not frames:
+        return pd.DataFrame(columns=["match_id", "side", "player"])
+    return pd.concat(frames, ignore_index=True).drop_duplicates(["match_id", "side"])
+
+# ---------------------------
+# FEATURE BLOCKS
+# ---------------------------
+# Each block takes the normalized points and returns one float row per
+# (match_id, side). Blocks are registered declaratively below and cached
+# independently, so changing one block never recomputes the others.
+def serve_speed_block(points):
+    served = points.dropna(subset=["speed_kmh"])
+    keys = [served["match_id"], served["server"].rename("side")]
+    speed = served.groupby(keys)["speed_kmh"]
+    block = pd.DataFrame({
+        "speed_p10": speed.quantile(0.10),
+        "speed_p50": speed.quantile(0.50),
+        "speed_p90": speed.quantile(0.90),
+        "speed_mean": speed.mean(),
+    })
+    by_number = served.dropna(subset=["serve_number"]).groupby(keys + [served["serve_number"]])["speed_kmh"].median().unstack()
+    block["speed_first_p50"] = by_number.get(1.0)
+    block["speed_second_p50"] = by_number.get(2.0)
+    return block
+
+def serve_direction_block(points):
+    served = points.dropna(subset=["serve_dir", "court"])
+    labels = {1: "wide", 2: "body", 3: "t"}
+    counts = pd.crosstab([served["match_id"], served["server"].rename("side")], [served["court"], served["serve_dir"]])
+    totals = counts.T.groupby(level=0).sum().T
+    block = pd.DataFrame(index=counts.index)
+    for court, court_name in (("d", "deuce"), ("a", "ad")):
+        for code, label in labels.items():
+            column = counts[(court, float(code))] if (court, float(code)) in counts else 0
+            block[f"{court_name}_{label}"] = column / totals.get(court, np.nan)
+    return block
+
+def rally_length_block(points):
+    rallies = points.dropna(subset=["rally_len"])
+    block = []
+    for side in (1, 2):
+        on_serve = rallies["server"] == side
+        length = rallies["rally_len"]
+        frame = pd.DataFrame({
+            "match_id": rallies["match_id"],
+            "serve_len": length.where(on_serve),
+            "return_len": length.where(~on_serve),
+        })
+        for low, high in RALLY_BUCKETS:
+            in_bucket = length.between(low, high)
+            frame[f"rally_{low}_{min(high, 99)}_share"] = in_bucket.astype(float)
+            frame[f"rally_{low}_{min(high, 99)}_won"] = np.where(in_bucket, rallies["winner"] == side, np.nan)
+        agg = frame.groupby("match_id").mean()
+        agg["side"] = side
+        block.append(agg.reset_index())
+    return pd.concat(block).set_index(["match_id", "side"]).rename(columns={"serve_len": "rally_mean_on_serve", "return_len": "rally_mean_on_return"})
+
+def pressure_block(points):
+    frame = pd.DataFrame({"match_id": points["match_id"]})
+    block = []
+    for side in (1, 2):
+        on_serve = points["server"] == side
+        won = points["winner"] == side
+        frame["serve_won"] = np.where(on_serve, won, np.nan)
+        frame["return_won"] = np.where(~on_serve, won, np.nan)
+        frame["bp_saved"] = np.where(on_serve & points["break_point"], won, np.nan)
+        frame["bp_converted"] = np.where(~on_serve & points["break_point"], won, np.nan)
+        frame["bp_faced"] = (on_serve & points["break_point"]).astype(float)
+        agg = frame.groupby("match_id").agg(
+            serve_won=("serve_won", "mean"),
+            return_won=("return_won", "mean"),
+            bp_saved=("bp_saved", "mean"),
+            bp_converted=("bp_converted", "mean"),
+            bp_faced=("bp_faced", "sum"),
+        )
+        agg["bp_serve_delta"] = agg["bp_saved"] - agg["serve_won"]
+        agg["side"] = side
+        block.append(agg.reset_index())
+    return pd.concat(block).set_index(["match_id", "side"])
+
+FEATURE_BLOCKS = {
+    "serve_speed": {"func": serve_speed_block, "version": 1},
+    "serve_direction": {"func": serve_direction_block, "version": 1},
+    "rally_length": {"func": rally_length_block, "version": 1},
+    "pressure": {"func": pressure_block, "version": 1},
+}
+
+# ---------------------------
+# CACHE
+# ---------------------------
+def fingerprint_files(file_paths, *extra):
+    """
+    Cheap input fingerprint: path, size and mtime of every file plus any
+    extra tokens (block name, version).
+    """
+    h = hashlib.sha1()
+    for file_path in sorted(Path(p) for p in file_paths):
+        stat = file_path.stat()
+        h.update(f"{file_path.name}|{stat.st_size}|{stat.st_mtime_ns}\n".encode("utf-8"))
+    for token in extra:
+        h.update(f"{token}\n".encode("utf-8"))
+    return h.hexdigest()[:16]
+
+def save_block(path, block):
+    """
+    Stores a block as float32 values plus its (match_id, side) index in one .npz.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    np.savez(
+        path,
+        values=block.to_numpy(dtype=np.float32),
+        match_id=block.index.get_level_values(0).to_numpy(dtype=str),
+        side=block.index.get_level_values(1).to_numpy(dtype=np.int8),
+        columns=np.array(block.columns, dtype=str),
+    )
+
+def load_block(path):
+    with np.load(path) as data:
+        index = pd.MultiIndex.from_arrays([data["match_id"], data["side"].astype(int)], names=["match_id", "side"])
+        return pd.DataFrame(data["values"], index=index, columns=data["columns"])
+
+def cached(cache_directory, name, key, build):
+    """
+    Returns the cached block for `key` or builds, stores and returns it.
+    """
+    path = Path(cache_directory) / f"{name}-{key}.npz"
+    if path.exists():
+        return load_block(path), True
+    block = build()
+    save_block(path, block)
+    return block, False
+
+def load_normalized_points(points_files, cache_directory):
+    """
+    Normalized points for all inputs, cached per source file so a data drop
+    only re-parses the files that changed.
+    """
+    frames = []
+    for file_path in points_files:
+        key = fingerprint_files([file_path], "points", PIPELINE_VERSION)
+        path = Path(cache_directory) / f"points-{file_path.stem}-{key}.pkl"
+        if path.exists():
+            frames.append(pd.read_pickle(path))
+            continue
+        loader = load_mcp_points if file_path.name.startswith("charting-") else load_slam_points
+        df = loader(file_path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        df.to_pickle(path)
+        frames.append(df)
+    return pd.concat(frames, ignore_index=True)
+
+# ---------------------------
+# PIPELINE
+# ---------------------------
+def add_rolling_features(features, index, window=10):
+    """
+    Per-player rolling means over the previous `window` matches (the current
+    match is excluded so the features are safe to train on).
+    """
+    order = index.sort_values(["player", "order_key", "match_id"]).index
+    players = index.loc[order, "player"].to_numpy()
+    previous = features.loc[order].groupby(players, sort=False).shift(1)
+
+    # Windowed mean from grouped running sums/counts (NaNs are skipped)
+    sums = previous.fillna(0).groupby(players, sort=False).cumsum()
+    counts = previous.notna().astype(np.float32).groupby(players, sort=False).cumsum()
+    window_sums = sums - sums.groupby(players, sort=False).shift(window).fillna(0)
+    window_counts = counts - counts.groupby(players, sort=False).shift(window).fillna(0)
+    rolled = (window_sums / window_counts.where(window_counts > 0)).astype(np.float32)
+    rolled.columns = [f"roll{window}_{c}" for c in rolled.columns]
+    return rolled.loc[features.index]
+
+def build_feature_matrix(points_files, matches_directory, cache_directory, blocks=None, window=10):
+    """
+    Runs the declared feature blocks (cached by input fingerprint) and joins
+    them into one float32 matrix with per-player rolling columns appended.
+    Returns (matrix, index DataFrame, column names).
+    """
+    blocks = blocks or list(FEATURE_BLOCKS)
+    points_files = sorted(Path(p) for p in points_files)
+    input_key = fingerprint_files(points_files, PIPELINE_VERSION)
+
+    points = None
+    parts = []
+    for name in blocks:
+        spec = FEATURE_BLOCKS[name]
+        key = fingerprint_files(points_files, name, spec["version"], PIPELINE_VERSION)
+
+        def build():
+            nonlocal points
+            if points is None:
+                points = load_normalized_points(points_files, cache_directory)
+            return spec["func"](points).astype(np.float32)
+
+        start = time.perf_counter()
+        block, hit = cached(cache_directory, name, key, build)
+        print(f"[INFO] - Feature block {name}: {block.shape[1]} columns, {'cache hit' if hit else 'built'} ({time.perf_counter() - start:.2f}s)")
+        block.columns = [f"{name}__{c}" for c in block.columns]
+        parts.append(block)
+
+    features = pd.concat(parts, axis=1).sort_index()
+    names = load_player_names(matches_directory).set_index(["match_id", "side"])["player"]
+    index = pd.DataFrame(index=features.index)
+    index["player"] = names.reindex(features.index).fillna("")
+    # Unnamed sides (no matches file) stay unique per match so they never roll together
+    unnamed = index["player"] == ""
+    index.loc[unnamed, "player"] = [f"{m}#{s}" for m, s in index.index[unnamed]]
+    index["order_key"] = [slam_order_key(m) if re.match(r"^\d{4}-", m) else int(m[:8]) for m in index.index.get_level_values(0)]
+
+    rolled = add_rolling_features(features, index, window)
+    matrix = pd.concat([features, rolled], axis=1)
+    print(f"[INFO] - Feature matrix input fingerprint: {input_key}")
+    return matrix.to_numpy(dtype=np.float32), index.reset_index(), list(matrix.columns)
+
+def write_feature_matrix(output_directory, matrix, index, columns):
+    """
+    Writes features.npy (float32, memory-mappable), the row index and the
+    column list, plus a Parquet copy when pyarrow is installed.
+    """
+    output_directory = Path(output_directory)
+    output_directory.mkdir(parents=True, exist_ok=True)
+    np.save(output_directory / "features.npy", matrix)
+    index.to_csv(output_directory / "features_index.csv", index=False)
+    (output_directory / "features_columns.json").write_text(json.dumps(columns, indent=2))
+    try:
+        frame = pd.concat([index, pd.DataFrame(matrix, columns=columns)], axis=1)
+        frame.to_parquet(output_directory / "features.parquet", index=False)
+    except ImportError:
+        print("[WARN] - pyarrow not installed, skipping features.parquet")
+
+def load_feature_matrix(output_directory):
+    """
+    Loads a written feature matrix without touching raw CSVs. The matrix is
+    memory-mapped. Returns (matrix, index DataFrame, column names).
+    """
+    output_directory = Path(output_directory)
+    matrix = np.load(output_directory / "features.npy", mmap_mode="r")
+    index = pd.read_csv(output_directory / "features_index.csv")
+    columns = json.loads((output_directory / "features_columns.json").read_text())
+    return matrix, index, columns
+
+
+if __name__ == "__main__":
+    root = find_repo_root()
+    data_directory = root / "data"
+    output_directory = data_directory / "processed" / "features"
+    cache_directory = output_directory / "cache"
+
+    parser = argparse.ArgumentParser(description="Build model-ready serve/rally feature matrices from point data.")
+    parser.add_argument("--blocks", nargs="*", default=None, choices=list(FEATURE_BLOCKS), help="Feature blocks to build (default: all)")
+    parser.add_argument("--window", type=int, default=10, help="Rolling window in matches")
+    args = parser.parse_args()
+
+    points_files = sorted((data_directory / "old_data" / "points").glob("*-points*.csv"))
+    points_files += sorted((data_directory / "raw" / "points").glob("charting-*-points*.csv"))
+
+    print(f"[INFO] - Repository Root: {root}")
+    print(f"[INFO] - Found {len(points_files)} points files")
+
+    start = time.perf_counter()
+    matrix, index, columns = build_feature_matrix(points_files, data_directory / "old_data" / "matches", cache_directory, args.blocks, args.window)
+    write_feature_matrix(output_directory, matrix, index, columns)
+    print(f"[INFO] - Feature matrix {matrix.shape[0]}x{matrix.shape[1]} ({matrix.nbytes / 1024 ** 2:.2f} MB float32) in {time.perf_counter() - start:.2f}s")
+    print(f"[INFO] - Features written to: {output_directory}")
@@ -0,0 +1,287 @@
+import argparse
+import hashlib
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from tennis_research import find_repo_root, normalize_name, generate_player_id
+
+INDEX_VERSION = 1
+
+# ---------------------------
+# RESULTS AND RATINGS
+# ---------------------------
+def infer_match_winners(matches, stats_directory):
+    """
+    The canonical matches table has no winner column, so results are inferred
+    from the per-set -stats-Overview rows: the player who won more points in a
+    set is taken as the set winner, and the player with more sets as the
+    match winner. Matches without Overview stats (or level on sets) stay
+    unknown. Returns a Series match_id -> winning player_id.
+    """
+    frames = [pd.read_csv(p) for p in sorted(Path(stats_directory).glob("*-stats-Overview.csv"))]
+    if not frames:
+        return pd.Series(dtype=object)
+    sets = pd.concat(frames, ignore_index=True)
+    sets = sets[sets["set"].astype(str) != "Total"]
+    sets = sets.assign(
+        player_id=sets["player"].map(lambda n: generate_player_id(normalize_name(n)) if normalize_name(n) else None),
+        pts_won=sets["first_won"] + sets["second_won"] + sets["return_pts_won"],
+    )
+
+    top = sets.sort_values("pts_won", ascending=False).groupby(["match_id", "set"])
+    set_winner = top["player_id"].first()
+    margin = top["pts_won"].agg(lambda s: s.iloc[0] - s.iloc[1] if len(s) > 1 else 0)
+    set_winner = set_winner[margin > 0]
+    sets_won = set_winner.groupby(level=0).value_counts().rename("sets").reset_index()
+    sets_won = sets_won.sort_values(["match_id", "sets"], ascending=[True, False])
+    best = sets_won.groupby("match_id")["sets"].agg(lambda s: s.iloc[0] - s.iloc[1] if len(s) > 1 else s.iloc[0])
+    winners = sets_won.drop_duplicates("match_id").set_index("match_id")["player_id"]
+    return winners[best.reindex(winners.index) > 0]
+
+def points_won_ratings(stats_directory):
+    """
+    Default opponent-strength rating: smoothed serve plus return point-win
+    rate from the charted stats (0 is tour average). Higher is stronger.
+    """
+    from match_simulator import load_player_point_probabilities
+
+    probs = load_player_point_probabilities(stats_directory)
+    return (probs["serve_prob"] - probs.attrs["tour_serve"]) + (probs["return_prob"] - probs.attrs["tour_return"])
+
+# ---------------------------
+# INDEX
+# ---------------------------
+class MatchIndex:
+    """
+    Precomputed lookup structures over the canonical matches table:
+
+    - per player: row ids sorted by date (CSR layout: ptr/rows/dates)
+    - per unordered player pair: sorted int64 pair keys with CSR row lists
+
+    Every query is a binary search into these arrays; the matches table is
+    never scanned.
+    """
+
+    def __init__(self, matches, players, winners=None, ratings=None):
+        self.matches = matches.reset_index(drop=True)
+        self.players = players.reset_index(drop=True)
+        self.player_ids = self.players["player_id"].to_numpy()
+        self.player_pos = {pid: i for i, pid in enumerate(self.player_ids)}
+        self.name_lookup = dict(zip(self.players["canonical_name"], self.player_ids))
+
+        n = len(self.player_ids)
+        p1 = self.matches["player1_id"].map(self.player_pos).fillna(-1).astype(np.int64).to_numpy()
+        p2 = self.matches["player2_id"].map(self.player_pos).fillna(-1).astype(np.int64).to_numpy()
+        self.dates = pd.to_numeric(self.matches["date"], errors="coerce").fillna(0).astype(np.int64).to_numpy()
+        self.p1, self.p2 = p1, p2
+
+        winner = self.matches["match_id"].map(winners) if winners is not None else pd.Series(np.nan, index=self.matches.index)
+        self.winner = np.where(winner == self.matches["player1_id"], 1, np.where(winner == self.matches["player2_id"], 2, 0)).astype(np.int8)
+
+        # Player -> date-sorted rows
+        rows = np.arange(len(self.matches))
+        owner = np.concatenate([p1, p2])
+        both_rows = np.concatenate([rows, rows])
+        valid = owner >= 0
+        order = np.lexsort((self.dates[both_rows[valid]], owner[valid]))
+        self.player_rows = both_rows[valid][order]
+        self.player_dates = self.dates[self.player_rows]
+        self.player_ptr = np.concatenate([[0], np.cumsum(np.bincount(owner[valid], minlength=n))])
+
+        # Unordered pair -> date-sorted rows
+        valid = (p1 >= 0) & (p2 >= 0)
+        lo, hi = np.minimum(p1, p2)[valid], np.maximum(p1, p2)[valid]
+        keys = lo * n + hi
+        order = np.lexsort((self.dates[rows[valid]], keys))
+        sorted_keys = keys[order]
+        self.pair_rows = rows[valid][order]
+        self.pair_keys, starts = np.unique(sorted_keys, return_index=True)
+        self.pair_ptr = np.concatenate([starts, [len(sorted_keys)]])
+
+        self.rating = None
+        self.rating_rank = None
+        if ratings is not None:
+            self.rating = ratings.reindex(self.player_ids).to_numpy(dtype=float)
+            # Ranks are per tour so "top 20" means the same thing for men and women
+            ranked = pd.Series(self.rating).groupby(self.players["gender"].fillna("?").to_numpy()).rank(ascending=False, method="min")
+            self.rating_rank = ranked.fillna(np.inf).to_numpy()
+
+    # ---------------------------
+    # PERSISTENCE
+    # ---------------------------
+    ARRAYS = ["p1", "p2", "dates", "winner", "player_rows", "player_dates", "player_ptr", "pair_rows", "pair_keys", "pair_ptr", "rating", "rating_rank"]
+
+    def save(self, path):
+        arrays = {k: getattr(self, k) for k in self.ARRAYS if getattr(self, k) is not None}
+        np.savez(path, **arrays)
+
+    @classmethod
+    def load(cls, path, matches, players):
+        index = cls.__new__(cls)
+        index.matches = matches.reset_index(drop=True)
+        index.players = players.reset_index(drop=True)
+        index.player_ids = index.players["player_id"].to_numpy()
+        index.player_pos = {pid: i for i, pid in enumerate(index.player_ids)}
+        index.name_lookup = dict(zip(index.players["canonical_name"], index.player_ids))
+        with np.load(path) as data:
+            for k in cls.ARRAYS:
+                setattr(index, k, data[k] if k in data.files else None)
+        return index
+
+    # ---------------------------
+    # LOOKUPS
+    # ---------------------------
+    def resolve(self, player):
+        """
+        Accepts a player_id or any spelling of a name; returns the index position.
+        """
+        if player in self.player_pos:
+            return self.player_pos[player]
+        pid = self.name_lookup.get(normalize_name(player))
+        if pid is None:
+            raise KeyError(f"Unknown player: {player}")
+        return self.player_pos[pid]
+
+    def _date_window(self, rows, dates, since=None, until=None):
+        lo = np.searchsorted(dates, since, side="left") if since is not None else 0
+        hi = np.searchsorted(dates, until, side="right") if until is not None else len(dates)
+        return rows[lo:hi]
+
+    def player_matches(self, player, since=None, until=None):
+        """
+        Row ids of a player's matches in date order, windowed by binary search.
+        """
+        i = self.resolve(player)
+        start, end = self.player_ptr[i], self.player_ptr[i + 1]
+        return self._date_window(self.player_rows[start:end], self.player_dates[start:end], since, until)
+
+    def pair_matches(self, a, b, since=None, until=None):
+        """
+        Row ids of every meeting between two players, in date order.
+        """
+        i, j = self.resolve(a), self.resolve(b)
+        key = min(i, j) * len(self.player_ids) + max(i, j)
+        k = np.searchsorted(self.pair_keys, key)
+        if k == len(self.pair_keys) or self.pair_keys[k] != key:
+            return np.array([], dtype=np.int64)
+        rows = self.pair_rows[self.pair_ptr[k]:self.pair_ptr[k + 1]]
+        return self._date_window(rows, self.dates[rows], since, until)
+
+    def _record(self, player_pos, rows):
+        side = np.where(self.p1[rows] == player_pos, 1, 2)
+        wins = int(np.sum(self.winner[rows] == side))
+        unknown = int(np.sum(self.winner[rows] == 0))
+        return {"matches": len(rows), "wins": wins, "losses": len(rows) - wins - unknown, "unknown": unknown}
+
+    def _surface_mask(self, rows, surface):
+        if surface is None:
+            return rows
+        return rows[self.matches["surface"].to_numpy()[rows] == surface.title()]
+
+    def head_to_head(self, a, b, surface=None, since=None, until=None):
+        """
+        H2H record for `a` against `b` plus the meetings themselves.
+        """
+        rows = self._surface_mask(self.pair_matches(a, b, since, until), surface)
+        record = self._record(self.resolve(a), rows)
+        record["rows"] = self.matches.iloc[rows]
+        return record
+
+    def recent_form(self, player, n=10, before=None, surface=None):
+        """
+        Record over the player's last `n` matches before a date (exclusive).
+        """
+        rows = self.player_matches(player, until=before - 1 if before is not None else None)
+        rows = self._surface_mask(rows, surface)[-n:]
+        record = self._record(self.resolve(player), rows)
+        record["rows"] = self.matches.iloc[rows]
+        return record
+
+    def opponent_strength_split(self, player, top=20, since=None, until=None, surface=None):
+        """
+        Record against opponents ranked inside the top `top` of the rating
+        versus everyone else (and unrated opponents separately).
+        """
+        if self.rating_rank is None:
+            raise RuntimeError("Index was built without ratings")
+        i = self.resolve(player)
+        rows = self._surface_mask(self.player_matches(player, since, until), surface)
+        opponent = np.where(self.p1[rows] == i, self.p2[rows], self.p1[rows])
+        rank = np.where(opponent >= 0, self.rating_rank[np.maximum(opponent, 0)], np.inf)
+        return {
+            f"vs_top_{top}": self._record(i, rows[rank <= top]),
+            "vs_rest": self._record(i, rows[(rank > top) & np.isfinite(rank)]),
+            "vs_unrated": self._record(i, rows[~np.isfinite(rank)]),
+        }
+
+def load_match_index(canonical_directory, stats_directory, cache_directory):
+    """
+    Loads the cached index for the current canonical tables or builds it.
+    """
+    matches_path = Path(canonical_directory) / "matches" / "matches.csv"
+    players_path = Path(canonical_directory) / "players" / "players.csv"
+    matches = pd.read_csv(matches_path)
+    players = pd.read_csv(players_path)
+
+    h = hashlib.sha1(str(INDEX_VERSION).encode("utf-8"))
+    for p in [matches_path, players_path] + sorted(Path(stats_directory).glob("*-stats-Overview.csv")):
+        stat = p.stat()
+        h.update(f"{p.name}|{stat.st_size}|{stat.st_mtime_ns}".encode("utf-8"))
+    cache_path = Path(cache_directory) / f"match_index-{h.hexdigest()[:16]}.npz"
+    if cache_path.exists():
+        return MatchIndex.load(cache_path, matches, players)
+
+    index = MatchIndex(matches, players, infer_match_winners(matches, stats_directory), points_won_ratings(stats_directory))
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    index.save(cache_path)
+    return index
+
+def print_record(label, record):
+    print(f"{label}: {record['wins']}-{record['losses']} ({record['matches']} matches, {record['unknown']} unknown result)")
+
+
+if __name__ == "__main__":
+    root = find_repo_root()
+    canonical_directory = root / "data" / "canonical"
+    stats_directory = root / "data" / "raw" / "stats"
+    cache_directory = root / "data" / "processed" / "cache"
+
+    parser = argparse.ArgumentParser(description="Head-to-head, recent form and opponent-strength queries over canonical matches.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    h2h = sub.add_parser("h2h", help="Head-to-head record between two players")
+    h2h.add_argument("player_a")
+    h2h.add_argument("player_b")
+    h2h.add_argument("--surface", choices=["Hard", "Clay", "Grass"])
+    form = sub.add_parser("form", help="Recent form window")
+    form.add_argument("player")
+    form.add_argument("-n", type=int, default=10)
+    form.add_argument("--before", type=int, help="YYYYMMDD (exclusive)")
+    form.add_argument("--surface", choices=["Hard", "Clay", "Grass"])
+    split = sub.add_parser("split", help="Record vs top-rated opponents")
+    split.add_argument("player")
+    split.add_argument("--top", type=int, default=20)
+    split.add_argument("--surface", choices=["Hard", "Clay", "Grass"])
+    args = parser.parse_args()
+
+    index = load_match_index(canonical_directory, stats_directory, cache_directory)
+    columns = ["match_id", "date", "tournament", "round", "surface"]
+
+    try:
+        if args.command == "h2h":
+            record = index.head_to_head(args.player_a, args.player_b, surface=args.surface)
+            print_record(f"{args.player_a} vs {args.player_b}", record)
+            if len(record["rows"]):
+                print(record["rows"][columns].to_string(index=False))
+        elif args.command == "form":
+            record = index.recent_form(args.player, n=args.n, before=args.before, surface=args.surface)
+            print_record(f"{args.player} last {args.n}", record)
+            if len(record["rows"]):
+                print(record["rows"][columns].to_string(index=False))
+        elif args.command == "split":
+            for label, record in index.opponent_strength_split(args.player, top=args.top, surface=args.surface).items():
+                print_record(f"{args.player} {label}", record)
+    except KeyError as e:
+        print(f"[ERROR] - {e.args[0]}")
+        quit()
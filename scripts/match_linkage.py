@@ -0,0 +1,280 @@
+import argparse
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from build_canonical_dataset import publish_atomic
+from tennis_research import find_repo_root, get_file_encoding_type, normalize_name, generate_player_id
+
+# Slam files carry no dates, only the event and year, so each slam gets the
+# (month, day) window its main draw is normally played in.
+SLAM_TOURNAMENTS = {"ausopen": "Australian Open", "frenchopen": "Roland Garros", "wimbledon": "Wimbledon", "usopen": "US Open"}
+SLAM_WINDOWS = {
+    "ausopen": ((1, 10), (2, 3)),
+    "frenchopen": ((5, 18), (6, 12)),
+    "wimbledon": ((6, 22), (7, 18)),
+    "usopen": ((8, 22), (9, 14)),
+}
+# Editions played outside their usual window
+SLAM_WINDOW_OVERRIDES = {("frenchopen", 2020): ((9, 25), (10, 12)), ("ausopen", 2021): ((2, 8), (2, 21))}
+# Slam singles match_num: event then round digit then two digits, with the
+# event as 1 (men) / 2 (women), or MS / WS in the AO 2021 files
+SLAM_SINGLES_NUM = r"(?P<event>[12]|[MW]S)(?P<round>\d)\d{2}"
+SLAM_SINGLES_GENDER = {"1": "M", "2": "W", "MS": "M", "WS": "W"}
+SLAM_ROUNDS = {"1": "R128", "2": "R64", "3": "R32", "4": "R16", "5": "QF", "6": "SF", "7": "F"}
+# Name tokens dropped before taking the surname
+NAME_SUFFIXES = {"jr", "sr", "ii", "iii", "iv"}
+
+WINDOW = 8
+DATE_TOLERANCE_DAYS = 2
+MATCH_THRESHOLD = 0.75
+WEIGHTS = {"both_players": 0.6, "one_player": 0.3, "tournament": 0.15, "round": 0.15, "date": 0.1}
+
+# ---------------------------
+# RECORDS
+# ---------------------------
+# Both sources are mapped to one record layout before blocking:
+#   source, source_id, tournament, year, gender, round, date_lo, date_hi
+#   (days since epoch), player_a/player_b (ids, sorted), pair_key
+def to_days(dates):
+    return (pd.to_datetime(dates, format="%Y%m%d", errors="coerce") - pd.Timestamp("1970-01-01")).dt.days
+
+def player_key(name):
+    """
+    First initial + surname ('n djokovic'): the part of a name the full
+    ('Novak Djokovic') and abbreviated ('N. Djokovic', 'N Djokovic') slam
+    spellings share.
+    """
+    canonical = normalize_name(name) if isinstance(name, str) else None
+    tokens = [t for t in canonical.split() if t not in NAME_SUFFIXES] if canonical else []
+    if not tokens:
+        return None
+    return tokens[0] if len(tokens) == 1 else f"{tokens[0][0]} {tokens[-1]}"
+
+def load_player_index(players_path):
+    """
+    Lookups from the canonical players table: canonical name -> player_id,
+    and player_key -> player_id for keys only one canonical player has.
+    Empty when the table isn't built yet.
+    """
+    if not Path(players_path).exists():
+        return {"names": {}, "keys": {}}
+    players = pd.read_csv(players_path, usecols=["player_id", "canonical_name"], dtype=str).dropna()
+    keys = players["canonical_name"].map(player_key)
+    unique = ~keys.duplicated(keep=False)
+    return {
+        "names": dict(zip(players["canonical_name"], players["player_id"])),
+        "keys": dict(zip(keys[unique], players["player_id"][unique])),
+    }
+
+def player_ids(names, index=None):
+    """
+    Player ids for a Series of names. A name resolves to the canonical
+    player with the same full name, else to the only canonical player with
+    its player_key; anything else gets the id of its key, so the spellings
+    of one uncatalogued player still agree.
+    """
+    index = index or {"names": {}, "keys": {}}
+
+    def resolve(name):
+        canonical = normalize_name(name) if isinstance(name, str) else None
+        if not canonical:
+            return None
+        if canonical in index["names"]:
+            return index["names"][canonical]
+        key = player_key(canonical)
+        return index["keys"].get(key) or generate_player_id(key)
+
+    unique = pd.unique(names.dropna())
+    return names.map(dict(zip(unique, map(resolve, unique))))
+
+def parse_singles_match_num(match_num):
+    """
+    (gender, round digit) per slam match_num; NaN for doubles and mixed.
+    """
+    parts = match_num.fillna("").str.extract("^" + SLAM_SINGLES_NUM + "$")
+    return parts["event"].map(SLAM_SINGLES_GENDER), parts["round"]
+
+def finish_records(records, p1, p2):
+    a, b = np.minimum(p1.fillna(""), p2.fillna("")), np.maximum(p1.fillna(""), p2.fillna(""))
+    records["player_a"] = a
+    records["player_b"] = b
+    records["pair_key"] = a + "|" + b
+    return records
+
+def load_mcp_records(matches_path, index=None):
+    df = pd.read_csv(matches_path, encoding=get_file_encoding_type(matches_path), dtype=str)
+    days = to_days(df["Date"])
+    records = pd.DataFrame({
+        "source": "mcp",
+        "source_id": df["match_id"],
+        "tournament": df["Tournament"].fillna(""),
+        "year": df["Date"].str[:4],
+        "gender": df["match_id"].str.split("-").str[1],
+        "round": df["Round"].fillna(""),
+        "date_lo": days,
+        "date_hi": days,
+    })
+    records = finish_records(records, player_ids(df["Player 1"], index), player_ids(df["Player 2"], index))
+    return records.dropna(subset=["date_lo"])
+
+def slam_window_days(slam, year):
+    (m0, d0), (m1, d1) = SLAM_WINDOW_OVERRIDES.get((slam, year), SLAM_WINDOWS[slam])
+    start = (pd.Timestamp(year, m0, d0) - pd.Timestamp("1970-01-01")).days
+    end = (pd.Timestamp(year, m1, d1) - pd.Timestamp("1970-01-01")).days
+    return start, end
+
+def load_slam_records(matches_directory, index=None):
+    """
+    Singles matches from the slam matches files; see SLAM_SINGLES_NUM for
+    how match_num gives the gender and round. Abbreviated names resolve
+    through `index` (load_player_index()).
+    """
+    frames = []
+    for file_path in sorted(Path(matches_directory).glob("*-matches.csv")):
+        df = pd.read_csv(file_path, dtype=str)
+        gender, round_digit = parse_singles_match_num(df["match_num"])
+        singles = gender.notna().to_numpy()
+        df, gender, round_digit = df[singles], gender[singles], round_digit[singles]
+        if df.empty:
+            continue
+        year, slam = int(df["year"].iloc[0]), df["slam"].iloc[0]
+        start, end = slam_window_days(slam, year)
+        records = pd.DataFrame({
+            "source": "slam",
+            "source_id": df["match_id"],
+            "tournament": SLAM_TOURNAMENTS.get(slam, slam),
+            "year": str(year),
+            "gender": gender,
+            "round": round_digit.map(SLAM_ROUNDS).fillna(""),
+            "date_lo": start,
+            "date_hi": end,
+        })
+        frames.append(finish_records(records, player_ids(df["player1"], index), player_ids(df["player2"], index)))
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+# ---------------------------
+# SORTED NEIGHBOURHOOD
+# ---------------------------
+# Each pass sorts all records on one blocking key and only compares records
+# that land within WINDOW positions of each other, so the work is
+# O(passes * n * WINDOW) instead of O(n^2). Different keys catch records a
+# single key would separate (e.g. one misspelled player).
+BLOCKING_KEYS = [
+    ["pair_key", "year"],
+    ["tournament", "year", "gender", "round", "player_a"],
+    ["tournament", "year", "gender", "round", "player_b"],
+]
+
+def score_pairs(records, i, j):
+    """
+    Similarity for record pairs (i, j): shared players dominate, then
+    tournament, round and overlapping date windows.
+    """
+    a_i, b_i = records["player_a"].to_numpy()[i], records["player_b"].to_numpy()[i]
+    a_j, b_j = records["player_a"].to_numpy()[j], records["player_b"].to_numpy()[j]
+    shared = ((a_i == a_j) & (a_i != "")).astype(int) + ((b_i == b_j) & (b_i != "")).astype(int)
+    shared = np.maximum(shared, ((a_i == b_j) & (a_i != "")).astype(int) + ((b_i == a_j) & (b_i != "")).astype(int))
+
+    same = lambda col: records[col].to_numpy()[i] == records[col].to_numpy()[j]
+    lo, hi = records["date_lo"].to_numpy(), records["date_hi"].to_numpy()
+    dates_overlap = (lo[i] <= hi[j] + DATE_TOLERANCE_DAYS) & (lo[j] <= hi[i] + DATE_TOLERANCE_DAYS)
+
+    score = np.where(shared == 2, WEIGHTS["both_players"], np.where(shared == 1, WEIGHTS["one_player"], 0.0))
+    score += WEIGHTS["tournament"] * same("tournament") + WEIGHTS["round"] * same("round") + WEIGHTS["date"] * dates_overlap
+    # Different gender or disjoint dates can never be the same match
+    return np.where(same("gender") & dates_overlap, score, 0.0), shared
+
+def candidate_pairs(records, window=WINDOW):
+    """
+    All (i, j) pairs, i < j, that fall within `window` of each other in any
+    blocking pass.
+    """
+    pairs = []
+    for key in BLOCKING_KEYS:
+        order = np.lexsort([records[c].astype(str).to_numpy() for c in reversed(key)])
+        for k in range(1, window):
+            i, j = order[:-k], order[k:]
+            pairs.append(np.column_stack([np.minimum(i, j), np.maximum(i, j)]))
+    pairs = np.unique(np.concatenate(pairs), axis=0) if pairs else np.empty((0, 2), dtype=np.int64)
+    return pairs[:, 0], pairs[:, 1]
+
+def link_records(records, window=WINDOW, threshold=MATCH_THRESHOLD):
+    """
+    Scores every candidate pair once and returns (links, duplicates):
+    links are one-to-one slam <-> MCP matches (best score first), duplicates
+    are same-source pairs above the threshold.
+    """
+    i, j = candidate_pairs(records, window)
+    score, shared = score_pairs(records, i, j)
+    keep = score >= threshold
+    i, j, score, shared = i[keep], j[keep], score[keep], shared[keep]
+
+    source = records["source"].to_numpy()
+    ids = records["source_id"].to_numpy()
+    cross = source[i] != source[j]
+
+    # Greedy one-to-one assignment, best scores first
+    ci, cj, cs, csh = i[cross], j[cross], score[cross], shared[cross]
+    slam_idx = np.where(source[ci] == "slam", ci, cj)
+    mcp_idx = np.where(source[ci] == "slam", cj, ci)
+    order = np.argsort(-cs, kind="stable")
+    used_slam, used_mcp, rows = set(), set(), []
+    for k in order:
+        s, m = slam_idx[k], mcp_idx[k]
+        if s in used_slam or m in used_mcp:
+            continue
+        used_slam.add(s)
+        used_mcp.add(m)
+        rows.append((ids[s], ids[m], round(float(cs[k]), 3), int(csh[k])))
+    links = pd.DataFrame(rows, columns=["slam_match_id", "mcp_match_id", "score", "players_matched"])
+    meta = records.set_index("source_id")[["tournament", "year", "gender", "round"]]
+    links = links.join(meta, on="mcp_match_id").sort_values("slam_match_id").reset_index(drop=True)
+
+    same = ~cross
+    duplicates = pd.DataFrame({
+        "source": source[i][same], "match_id": ids[i][same], "duplicate_of": ids[j][same], "score": score[same].round(3),
+    })
+    return links, duplicates
+
+
+if __name__ == "__main__":
+    root = find_repo_root()
+    mcp_matches = root / "data" / "raw" / "matches" / "matches.csv"
+    players_path = root / "data" / "canonical" / "players" / "players.csv"
+    slam_matches = root / "data" / "old_data" / "matches"
+    output_directory = root / "data" / "canonical" / "crosswalk"
+
+    parser = argparse.ArgumentParser(description="Link slam matches to MCP matches and flag near-duplicate matches.")
+    parser.add_argument("--window", type=int, default=WINDOW, help="Sorted-neighbourhood window size")
+    parser.add_argument("--threshold", type=float, default=MATCH_THRESHOLD)
+    args = parser.parse_args()
+
+    print(f"[INFO] - Repository Root: {root}")
+    start = time.perf_counter()
+    index = load_player_index(players_path)
+    records = pd.concat([load_mcp_records(mcp_matches, index), load_slam_records(slam_matches, index)], ignore_index=True)
+    load_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    links, duplicates = link_records(records, args.window, args.threshold)
+    link_s = time.perf_counter() - start
+
+    publish_atomic({output_directory / "match_crosswalk.csv": links, output_directory / "match_duplicates.csv": duplicates})
+
+    slam = records[records["source"] == "slam"]
+    editions = pd.DataFrame({
+        "slam_matches": slam["source_id"].str.rsplit("-", n=1).str[0].value_counts(),
+        "linked": links["slam_match_id"].str.rsplit("-", n=1).str[0].value_counts(),
+    }).fillna(0).astype(int).sort_index()
+    print("\n----------- LINKS PER EDITION -------------")
+    print(editions.to_string())
+
+    print("\n----------- SUMMARY -------------")
+    print(f"Records: {len(records):,} ({(records['source'] == 'mcp').sum():,} MCP, {(records['source'] == 'slam').sum():,} slam)")
+    print(f"Linked matches: {len(links):,} ({(links['players_matched'] == 2).sum():,} with both players resolved)")
+    print(f"Near-duplicate pairs: {len(duplicates):,}")
+    print(f"Load: {load_s:.2f}s  Link: {link_s:.2f}s")
+    print(f"Crosswalk written to: {output_directory / 'match_crosswalk.csv'}")
@@ -0,0 +1,476 @@
+import argparse
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from tennis_research import find_repo_root, normalize_name, generate_player_id
+
+# ---------------------------
+# MATCH FORMATS
+# ---------------------------
+# Regular sets are always first to 6 games with a 7-point tiebreak at 6-6.
+# The final set depends on the MCP "Final TB?" code:
+#   1 -> 7-point tiebreak at 6-6      0 -> advantage set (no tiebreak)
+#   A -> 10-point tiebreak at 6-6     T -> 7-point tiebreak at 12-12
+#   S -> 10-point match tiebreak played instead of the final set
+# Anything else (N, V, W, blank) falls back to the regular set rules.
+FINAL_SET_RULES = {
+    "1": {"tb_at": 6, "tb_target": 7, "match_tb": False},
+    "0": {"tb_at": None, "tb_target": 7, "match_tb": False},
+    "A": {"tb_at": 6, "tb_target": 10, "match_tb": False},
+    "T": {"tb_at": 12, "tb_target": 7, "match_tb": False},
+    "S": {"tb_at": None, "tb_target": 10, "match_tb": True},
+}
+REGULAR_SET_RULE = FINAL_SET_RULES["1"]
+
+def get_set_rule(final_tb, is_final_set):
+    """
+    Returns the set rule dict for a set given the match "Final TB?" code.
+    """
+    if not is_final_set:
+        return REGULAR_SET_RULE
+    code = str(final_tb).strip().upper() if not pd.isna(final_tb) else "1"
+    return FINAL_SET_RULES.get(code, REGULAR_SET_RULE)
+
+def parse_best_of(best_of):
+    """
+    Normalizes the "Best of" column to 3 or 5 (defaults to 3 when missing).
+    """
+    try:
+        return 5 if int(float(best_of)) == 5 else 3
+    except (TypeError, ValueError):
+        return 3
+
+# ---------------------------
+# POINT PROBABILITIES
+# ---------------------------
+def load_player_point_probabilities(stats_directory, prior_points=200):
+    """
+    Builds per-player serve and return point-win probabilities from the
+    -stats-Overview files ('Total' rows), topped up with ServeBasics serve
+    totals for players that only appear there.
+
+    Rates are shrunk toward the tour average with `prior_points` pseudo points
+    so lightly charted players don't get extreme probabilities.
+    Returns a DataFrame indexed by player_id.
+    """
+    stats_directory = Path(stats_directory)
+    frames = []
+    for file_path in sorted(stats_directory.glob("*-stats-Overview.csv")):
+        df = pd.read_csv(file_path)
+        df = df[df["set"].astype(str) == "Total"]
+        frames.append(pd.DataFrame({
+            "player": df["player"],
+            "serve_pts": df["serve_pts"],
+            "serve_won": df["first_won"] + df["second_won"],
+            "return_pts": df["return_pts"],
+            "return_won": df["return_pts_won"],
+        }))
+
+    overview_players = set(pd.concat(frames)["player"]) if frames else set()
+    for file_path in sorted(stats_directory.glob("*-stats-ServeBasics.csv")):
+        df = pd.read_csv(file_path)
+        df = df[(df["row"].astype(str) == "Total") & ~df["player"].isin(overview_players)]
+        frames.append(pd.DataFrame({
+            "player": df["player"],
+            "serve_pts": df["pts"],
+            "serve_won": df["pts_won"],
+            "return_pts": 0,
+            "return_won": 0,
+        }))
+
+    if not frames:
+        raise FileNotFoundError(f"No Overview/ServeBasics stats found in: {stats_directory}")
+
+    totals = pd.concat(frames, ignore_index=True)
+    totals["canonical_name"] = totals["player"].map(normalize_name)
+    totals = totals.dropna(subset=["canonical_name"])
+    totals = totals.groupby("canonical_name", as_index=False)[["serve_pts", "serve_won", "return_pts", "return_won"]].sum()
+
+    tour_serve = totals["serve_won"].sum() / totals["serve_pts"].sum()
+    tour_return = totals["return_won"].sum() / max(totals["return_pts"].sum(), 1)
+
+    totals["serve_prob"] = (totals["serve_won"] + prior_points * tour_serve) / (totals["serve_pts"] + prior_points)
+    totals["return_prob"] = (totals["return_won"] + prior_points * tour_return) / (totals["return_pts"] + prior_points)
+    totals["player_id"] = totals["canonical_name"].apply(generate_player_id)
+    totals = totals.set_index("player_id")
+    totals.attrs["tour_serve"] = tour_serve
+    totals.attrs["tour_return"] = tour_return
+    return totals
+
+def matchup_serve_probabilities(probs, player_a, player_b):
+    """
+    Opponent-adjusted serve point-win probabilities for a matchup.
+
+    Uses the additive Barnett-Clarke form: a player's serve rate moves away
+    from the tour average by how much the opponent's return rate differs from
+    the tour return average. Accepts scalars or arrays of player ids.
+    Returns (pa, pb): P(A wins a point on A's serve), P(B wins a point on B's serve).
+    """
+    tour_serve = probs.attrs["tour_serve"]
+    tour_return = probs.attrs["tour_return"]
+    serve = probs["serve_prob"]
+    ret = probs["return_prob"]
+    a = np.atleast_1d(player_a)
+    b = np.atleast_1d(player_b)
+    pa = serve.reindex(a).fillna(tour_serve).to_numpy() - (ret.reindex(b).fillna(tour_return).to_numpy() - tour_return)
+    pb = serve.reindex(b).fillna(tour_serve).to_numpy() - (ret.reindex(a).fillna(tour_return).to_numpy() - tour_return)
+    return np.clip(pa, 0.01, 0.99), np.clip(pb, 0.01, 0.99)
+
+# ---------------------------
+# ANALYTIC (MARKOV CHAIN) MODE
+# ---------------------------
+# Every function below is elementwise over NumPy arrays of probabilities, so
+# thousands of matchups are solved in one call.
+def game_win_probability(p):
+    """
+    Probability that the server holds, given point-win probability p on serve.
+    """
+    p = np.asarray(p, dtype=float)
+    q = 1 - p
+    deuce = p ** 2 / (1 - 2 * p * q)
+    return p ** 4 * (1 + 4 * q + 10 * q ** 2) + 20 * p ** 3 * q ** 3 * deuce
+
+def tiebreak_win_probability(pa, pb, target=7):
+    """
+    Probability that A wins a tiebreak to `target` (win by two) when A serves
+    the first point. pa/pb are each player's point-win probability on serve.
+    """
+    pa = np.asarray(pa, dtype=float)
+    pb = np.asarray(pb, dtype=float)
+
+    def a_wins_point(n):
+        # A serves point 0, then servers alternate every two points
+        return pa if ((n + 1) // 2) % 2 == 0 else 1 - pb
+
+    reach = {(0, 0): np.ones_like(pa + pb)}
+    win = np.zeros_like(pa + pb)
+    for total in range(2 * (target - 1) + 1):
+        for i in range(max(0, total - (target - 1)), min(total, target - 1) + 1):
+            j = total - i
+            prob = reach.pop((i, j), None)
+            if prob is None:
+                continue
+            if i == j == target - 1:
+                # From (t-1, t-1) each pair of points has one serve apiece
+                both = pa * (1 - pb)
+                win = win + prob * both / (both + (1 - pa) * pb)
+                continue
+            p_point = a_wins_point(total)
+            if i + 1 == target:
+                win = win + prob * p_point
+            else:
+                reach[(i + 1, j)] = reach.get((i + 1, j), 0) + prob * p_point
+            if j + 1 != target:
+                reach[(i, j + 1)] = reach.get((i, j + 1), 0) + prob * (1 - p_point)
+    return win
+
+def set_outcome_probabilities(pa, pb, rule=REGULAR_SET_RULE):
+    """
+    Exact set outcome for A serving the first game.
+
+    Returns (a_win_a_next, a_win_b_next, b_win_a_next, b_win_b_next): the
+    probability of each set winner combined with who serves first in the
+    next set, which keeps the match chain exact across sets.
+    """
+    pa = np.asarray(pa, dtype=float)
+    pb = np.asarray(pb, dtype=float)
+    zero = np.zeros_like(pa + pb)
+    out = [zero.copy() for _ in range(4)]  # (A,A next) (A,B next) (B,A next) (B,B next)
+
+    def record(a_won, games_played, prob):
+        a_next = games_played % 2 == 0
+        out[(0 if a_won else 2) + (0 if a_next else 1)] += prob
+
+    if rule["match_tb"]:
+        tb = tiebreak_win_probability(pa, pb, rule["tb_target"])
+        record(True, 1, tb)
+        record(False, 1, 1 - tb)
+        return tuple(out)
+
+    hold_a = game_win_probability(pa)
+    hold_b = game_win_probability(pb)
+    tb_at = rule["tb_at"]
+    cap = tb_at if tb_at is not None else 5
+
+    reach = {(0, 0): np.ones_like(zero)}
+    for total in range(2 * cap + 1):
+        for i in range(max(0, total - cap), min(total, cap) + 1):
+            j = total - i
+            prob = reach.pop((i, j), None)
+            if prob is None:
+                continue
+            if i == j == cap:
+                if tb_at is not None:
+                    tb = tiebreak_win_probability(pa, pb, rule["tb_target"])
+                    record(True, total + 1, prob * tb)
+                    record(False, total + 1, prob * (1 - tb))
+                else:
+                    # Advantage set from 5-5: each pair of games has one service game apiece
+                    both = hold_a * (1 - hold_b)
+                    a_set = both / (both + (1 - hold_a) * hold_b)
+                    record(True, total, prob * a_set)
+                    record(False, total, prob * (1 - a_set))
+                continue
+            p_game = hold_a if total % 2 == 0 else 1 - hold_b
+            for a_won, (ni, nj), p in ((True, (i + 1, j), p_game), (False, (i, j + 1), 1 - p_game)):
+                if max(ni, nj) >= 6 and abs(ni - nj) >= 2:
+                    record(a_won, total + 1, prob * p)
+                else:
+                    reach[(ni, nj)] = reach.get((ni, nj), 0) + prob * p
+    return tuple(out)
+
+def match_win_probability(pa, pb, best_of=3, final_tb="1"):
+    """
+    Exact probability that A wins the match when A serves first, chaining the
+    set outcome distributions through (sets_a, sets_b, next server) states.
+    """
+    pa = np.asarray(pa, dtype=float)
+    pb = np.asarray(pb, dtype=float)
+    best_of = parse_best_of(best_of)
+    need = best_of // 2 + 1
+
+    set_cache = {}
+
+    def set_outcomes(a_serves, is_final):
+        key = (a_serves, is_final)
+        if key not in set_cache:
+            rule = get_set_rule(final_tb, is_final)
+            if a_serves:
+                set_cache[key] = set_outcome_probabilities(pa, pb, rule)
+            else:
+                b_a, b_b, a_a, a_b = set_outcome_probabilities(pb, pa, rule)
+                # Swap perspective: B's wins become A's losses and "B next" becomes "A next"
+                set_cache[key] = (a_b, a_a, b_b, b_a)
+        return set_cache[key]
+
+    states = {(0, 0, True): np.ones_like(pa + pb)}
+    win = np.zeros_like(pa + pb)
+    for played in range(best_of):
+        next_states = {}
+        for (sa, sb, a_serves), prob in states.items():
+            is_final = sa == sb == need - 1
+            a_a, a_b, b_a, b_b = set_outcomes(a_serves, is_final)
+            for won, a_next, p in ((True, True, a_a), (True, False, a_b), (False, True, b_a), (False, False, b_b)):
+                nsa, nsb = sa + won, sb + (not won)
+                if nsa == need:
+                    win = win + prob * p
+                elif nsb != need:
+                    key = (nsa, nsb, a_next)
+                    next_states[key] = next_states.get(key, 0) + prob * p
+        states = next_states
+    return win
+
+# ---------------------------
+# MONTE CARLO MODE
+# ---------------------------
+def simulate_matches(pa, pb, n_sims=10_000, best_of=3, final_tb="1", seed=None, max_points=2_000):
+    """
+    Simulates matches point by point with the whole batch held in NumPy state
+    arrays: every loop iteration plays one point in every unfinished match.
+
+    pa/pb may be scalars or arrays of length n_sims (one matchup per slot).
+    A always serves first. Returns a dict of per-simulation result arrays.
+    """
+    rng = np.random.default_rng(seed)
+    pa = np.broadcast_to(np.asarray(pa, dtype=float), (n_sims,))
+    pb = np.broadcast_to(np.asarray(pb, dtype=float), (n_sims,))
+    best_of = parse_best_of(best_of)
+    need = best_of // 2 + 1
+    regular = REGULAR_SET_RULE
+    final = get_set_rule(final_tb, True)
+
+    pts = np.zeros((2, n_sims), dtype=np.int16)
+    games = np.zeros((2, n_sims), dtype=np.int16)
+    sets = np.zeros((2, n_sims), dtype=np.int8)
+    total_games = np.zeros(n_sims, dtype=np.int16)
+    total_points = np.zeros(n_sims, dtype=np.int32)
+    server = np.zeros(n_sims, dtype=np.int8)      # 0 = A serving, 1 = B serving
+    tb_first = np.zeros(n_sims, dtype=np.int8)    # who served the first tiebreak point
+    in_tb = np.zeros(n_sims, dtype=bool)
+    tb_target = np.full(n_sims, regular["tb_target"], dtype=np.int16)
+    done = np.zeros(n_sims, dtype=bool)
+
+    # Match tiebreak formats skip straight to a tiebreak when the final set starts
+    def start_final_set_tiebreaks(idx):
+        if not final["match_tb"] or idx.size == 0:
+            return
+        final_now = idx[(sets[0, idx] == need - 1) & (sets[1, idx] == need - 1)]
+        in_tb[final_now] = True
+        tb_first[final_now] = server[final_now]
+        tb_target[final_now] = final["tb_target"]
+
+    for _ in range(max_points):
+        idx = np.flatnonzero(~done)
+        if idx.size == 0:
+            break
+
+        p_a_point = np.where(server[idx] == 0, pa[idx], 1 - pb[idx])
+        a_won = rng.random(idx.size) < p_a_point
+        pts[0, idx] += a_won
+        pts[1, idx] += ~a_won
+        total_points[idx] += 1
+
+        p0, p1 = pts[0, idx], pts[1, idx]
+        tb = in_tb[idx]
+        lead = np.abs(p0 - p1) >= 2
+        game_over = np.where(tb, (np.maximum(p0, p1) >= tb_target[idx]) & lead, (np.maximum(p0, p1) >= 4) & lead)
+
+        # Tiebreak serve rotation: switch after the first point, then every two points
+        tb_continue = idx[tb & ~game_over]
+        played = pts[0, tb_continue] + pts[1, tb_continue]
+        server[tb_continue] = tb_first[tb_continue] ^ ((played + 1) // 2 % 2).astype(np.int8)
+
+        ended = idx[game_over]
+        if ended.size == 0:
+            continue
+        game_winner = (pts[1, ended] > pts[0, ended]).astype(np.int8)
+        games[game_winner, ended] += 1
+        total_games[ended] += 1
+        pts[:, ended] = 0
+
+        was_tb = in_tb[ended]
+        server[ended] = np.where(was_tb, 1 - tb_first[ended], 1 - server[ended])
+        in_tb[ended] = False
+
+        g0, g1 = games[0, ended], games[1, ended]
+        is_final = (sets[0, ended] == need - 1) & (sets[1, ended] == need - 1)
+        tb_at = np.where(is_final, final["tb_at"] or 10_000, regular["tb_at"])
+        set_over = was_tb | ((np.maximum(g0, g1) >= 6) & (np.abs(g0 - g1) >= 2))
+
+        to_tb = ~set_over & (g0 == g1) & (g0 == tb_at)
+        start_tb = ended[to_tb]
+        in_tb[start_tb] = True
+        tb_first[start_tb] = server[start_tb]
+        tb_target[start_tb] = np.where(is_final[to_tb], final["tb_target"], regular["tb_target"])
+
+        finished_set = ended[set_over]
+        if finished_set.size == 0:
+            continue
+        set_winner = np.where(was_tb[set_over], game_winner[set_over], (games[1, finished_set] > games[0, finished_set]).astype(np.int8))
+        sets[set_winner, finished_set] += 1
+        games[:, finished_set] = 0
+        done[finished_set] = sets[:, finished_set].max(axis=0) == need
+        start_final_set_tiebreaks(finished_set[~done[finished_set]])
+
+    return {
+        "a_wins": sets[0] == need,
+        "sets_a": sets[0].copy(),
+        "sets_b": sets[1].copy(),
+        "total_games": total_games,
+        "total_points": total_points,
+        "finished": done,
+    }
+
+# ---------------------------
+# DRAW PRICING
+# ---------------------------
+def pairwise_match_probabilities(probs, player_ids, best_of=3, final_tb="1"):
+    """
+    Analytic win-probability matrix M[i, j] = P(player i beats player j),
+    solved for every pair in one vectorized call. The first server is unknown
+    in advance, so both serve orders are averaged.
+    """
+    player_ids = np.asarray(player_ids)
+    n = len(player_ids)
+    ii, jj = np.meshgrid(np.arange(n), np.arange(n), indexing="ij")
+    pa, pb = matchup_serve_probabilities(probs, player_ids[ii.ravel()], player_ids[jj.ravel()])
+    a_first = match_win_probability(pa, pb, best_of, final_tb)
+    b_first = 1 - match_win_probability(pb, pa, best_of, final_tb)
+    return ((a_first + b_first) / 2).reshape(n, n)
+
+def price_draw(probs, player_ids, best_of=3, final_tb="1", mode="analytic", n_sims=10_000, seed=None):
+    """
+    Probability of every player in a draw reaching each round.
+
+    `player_ids` is the draw in bracket order (length must be a power of two).
+    mode="analytic" runs the exact bracket recursion over the pairwise matrix;
+    mode="mc" simulates every match of every round across all tournaments in
+    one batch per round. Returns a DataFrame with one column per round.
+    """
+    player_ids = list(player_ids)
+    n = len(player_ids)
+    rounds = int(np.log2(n))
+    if 2 ** rounds != n:
+        raise ValueError(f"Draw size must be a power of two, got {n}")
+
+    named_rounds = {8: "QF", 4: "SF", 2: "F"}
+    columns = [named_rounds.get(n // 2 ** r, f"R{n // 2 ** r}") for r in range(rounds)] + ["W"]
+    result = pd.DataFrame({"player_id": player_ids})
+
+    if mode == "analytic":
+        M = pairwise_match_probabilities(probs, player_ids, best_of, final_tb)
+        reach = np.ones(n)
+        result[columns[0]] = reach
+        for r in range(1, rounds + 1):
+            block = 2 ** r
+            half = block // 2
+            idx = np.arange(n)
+            # Opponents come from the other half of each player's current block
+            opp_start = (idx // block) * block + np.where((idx % block) < half, half, 0)
+            nxt = np.empty(n)
+            for i in range(n):
+                opp = slice(opp_start[i], opp_start[i] + half)
+                nxt[i] = reach[i] * np.dot(reach[opp], M[i, opp])
+            reach = nxt
+            result[columns[r]] = reach
+        return result
+
+    if mode != "mc":
+        raise ValueError(f"Unknown pricing mode: {mode}")
+
+    rng = np.random.default_rng(seed)
+    alive = np.tile(np.arange(n), (n_sims, 1))
+    counts = np.zeros((rounds + 1, n))
+    counts[0] = n_sims
+    ids = np.asarray(player_ids)
+    for r in range(1, rounds + 1):
+        a, b = alive[:, 0::2], alive[:, 1::2]
+        a_first = rng.random(a.shape) < 0.5
+        first = np.where(a_first, a, b).ravel()
+        second = np.where(a_first, b, a).ravel()
+        pa, pb = matchup_serve_probabilities(probs, ids[first], ids[second])
+        sim = simulate_matches(pa, pb, n_sims=first.size, best_of=best_of, final_tb=final_tb, seed=rng.integers(1 << 32))
+        alive = np.where(sim["a_wins"], first, second).reshape(a.shape)
+        counts[r] = np.bincount(alive.ravel(), minlength=n)
+    for r in range(rounds + 1):
+        result[columns[r]] = counts[r] / n_sims
+    return result
+
+
+if __name__ == "__main__":
+    root = find_repo_root()
+    data_directory = root / "data" / "raw"
+    canonical_directory = root / "data" / "canonical"
+
+    parser = argparse.ArgumentParser(description="Simulate tennis matches and price draws from charted serve/return stats.")
+    parser.add_argument("--draw-size", type=int, default=64, help="Draw size (power of two) built from the most charted players")
+    parser.add_argument("--best-of", type=int, default=3)
+    parser.add_argument("--final-tb", default="1", help="MCP 'Final TB?' code for the final set")
+    parser.add_argument("--sims", type=int, default=10_000)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    print(f"[INFO] - Repository Root: {root}")
+    print(f"[INFO] - Data Directory: {data_directory}")
+
+    probs = load_player_point_probabilities(data_directory / "stats")
+    print(f"[INFO] - Loaded point probabilities for {len(probs)} players (tour serve {probs.attrs['tour_serve']:.3f}, return {probs.attrs['tour_return']:.3f})")
+
+    players = pd.read_csv(canonical_directory / "players" / "players.csv").set_index("player_id")
+    draw = probs.sort_values("serve_pts", ascending=False).head(args.draw_size).index.tolist()
+
+    start = time.perf_counter()
+    analytic = price_draw(probs, draw, args.best_of, args.final_tb, mode="analytic")
+    print(f"[INFO] - Analytic draw pricing ({len(draw)} players): {time.perf_counter() - start:.2f}s")
+
+    start = time.perf_counter()
+    simulated = price_draw(probs, draw, args.best_of, args.final_tb, mode="mc", n_sims=args.sims, seed=args.seed)
+    print(f"[INFO] - Monte Carlo draw pricing ({args.sims} tournaments): {time.perf_counter() - start:.2f}s")
+
+    analytic.insert(1, "display_name", players["display_name"].reindex(analytic["player_id"]).to_numpy())
+    analytic["W_mc"] = simulated["W"].to_numpy()
+    print("\n----------- TITLE ODDS -------------")
+    print(analytic.sort_values("W", ascending=False).head(10).to_string(index=False))
@@ -0,0 +1,429 @@
+import argparse
+import json
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from match_linkage import SLAM_TOURNAMENTS, load_player_index, parse_singles_match_num, player_ids
+from point_store import ELAPSED_MISSING, FLAG_NUMERIC_SCORE_1, FLAG_NUMERIC_SCORE_2, PointStore, load_canonical_points, write_point_store
+from tennis_research import find_repo_root, get_file_encoding_type
+
+# Gaps longer than these (seconds from one point's start to the next) are
+# interruptions (rain, medical time-outs, clock glitches): they are kept in
+# the durations but flagged, and left out of every pace statistic.
+GAP_LIMITS = {"point": 120, "game": 300, "set": 600}
+GAP_KINDS = list(GAP_LIMITS)
+# A match is used for durations when at least this share of its points
+# has an elapsed time
+MIN_ELAPSED_COVERAGE = 0.9
+# Pseudo-matches of the best_of mean a player's pace is shrunk towards
+PLAYER_PRIOR_MATCHES = 5
+
+# ---------------------------
+# POINTS
+# ---------------------------
+def load_point_arrays(store_directory, points_files=(), match_ids=None):
+    """
+    Flat per-point arrays, points in order inside each match, for matches
+    whose elapsed times cover at least MIN_ELAPSED_COVERAGE of the points,
+    and that are in `match_ids` when given. The store also holds doubles and
+    mixed matches, so pass the singles ids (load_slam_players()) for
+    singles-only results. Reads the point store (building it from
+    points_files when missing).
+    """
+    store_directory = Path(store_directory)
+    if not (store_directory / "store.json").exists():
+        if not points_files:
+            raise FileNotFoundError(f"No point store in {store_directory} and no points files to build it from")
+        print(f"[INFO] - Building the point store in {store_directory}")
+        write_point_store(load_canonical_points(points_files), store_directory)
+    store = PointStore(store_directory)
+    records = np.asarray(store.records)
+    match = np.repeat(np.arange(len(store)), np.diff(store.offsets))
+    elapsed = records["elapsed_s"].astype(np.int64)
+    timed = elapsed != ELAPSED_MISSING
+
+    coverage = np.bincount(match, weights=timed, minlength=len(store)) / np.maximum(np.diff(store.offsets), 1)
+    wanted = coverage >= MIN_ELAPSED_COVERAGE
+    if match_ids is not None:
+        wanted &= np.isin(store.match_ids, np.asarray(match_ids, dtype=str))
+    keep = wanted[match]
+    kept_matches = np.flatnonzero(wanted)
+    remap = np.full(len(store), -1)
+    remap[kept_matches] = np.arange(len(kept_matches))
+    rally = records["rally_len"][keep].astype(np.float64)
+    return {
+        "match_ids": store.match_ids[kept_matches],
+        "coverage": coverage[kept_matches],
+        "match": remap[match[keep]],
+        "elapsed": np.where(timed[keep], elapsed[keep], np.nan).astype(np.float64),
+        "set_no": records["set_no"][keep].astype(np.int64),
+        "games": records["games_1"][keep].astype(np.int64) + records["games_2"][keep].astype(np.int64),
+        "server": records["server"][keep].astype(np.int64),
+        "rally": np.where(rally > 0, rally, np.nan),
+        "tiebreak": (records["flags"][keep] & (FLAG_NUMERIC_SCORE_1 | FLAG_NUMERIC_SCORE_2)) > 0,
+    }
+
+def point_gaps(arrays):
+    """
+    Per-point boundaries and the gap from each point's start to the next
+    one's. Games and scores are recorded after the point, so a point ends a
+    game when the games total changes on it, and ends a set when the next
+    point is in another set (or it is the match's last). The gap after a
+    point is a 'point', 'game' or 'set' gap by what that point ended.
+    """
+    match, set_no, games, elapsed = arrays["match"], arrays["set_no"], arrays["games"], arrays["elapsed"]
+    n = len(match)
+    first = np.ones(n, dtype=bool)
+    first[1:] = match[1:] != match[:-1]
+    last = np.ones(n, dtype=bool)
+    last[:-1] = match[1:] != match[:-1]
+    new_set = first.copy()
+    new_set[1:] |= set_no[1:] != set_no[:-1]
+    ends_set = np.roll(new_set, -1)
+    ends_set[-1:] = True
+    games_before = np.where(new_set, 0, np.roll(games, 1))
+    ends_game = (games != games_before) | ends_set
+
+    gap = np.full(n, np.nan)
+    gap[:-1] = elapsed[1:] - elapsed[:-1]
+    gap[last] = np.nan
+    kind = np.where(ends_set, 2, np.where(ends_game, 1, 0))
+    limit = np.array(list(GAP_LIMITS.values()), dtype=np.float64)[kind]
+    valid = (gap > 0) & (gap <= limit)
+    interrupted = (gap > limit) | (gap <= 0)
+    return {"first": first, "last": last, "new_set": new_set, "ends_set": ends_set, "ends_game": ends_game,
+            "gap": gap, "kind": kind, "valid": valid, "interrupted": interrupted}
+
+# ---------------------------
+# DURATIONS
+# ---------------------------
+def match_point_gap(arrays, gaps):
+    """
+    Median valid in-game gap per match: the estimated length of a match's
+    last point, which has no next start to measure against.
+    """
+    in_game = gaps["valid"] & (gaps["kind"] == 0)
+    medians = pd.Series(gaps["gap"][in_game]).groupby(arrays["match"][in_game]).median()
+    fallback = np.nanmedian(gaps["gap"][in_game]) if in_game.any() else 0.0
+    return medians.reindex(np.arange(len(arrays["match_ids"]))).fillna(fallback).to_numpy()
+
+def unit_durations(arrays, gaps, starts, end_gap):
+    """
+    Durations of contiguous units (games or sets) that begin at `starts`:
+    the next unit's first start minus this one's, and for a match's final
+    unit, its last point's start plus that match's median point gap.
+    Also points per unit and whether any gap inside it was an interruption.
+    """
+    elapsed, match = arrays["elapsed"], arrays["match"]
+    ends = np.append(starts[1:], len(match)) - 1
+    final = gaps["last"][ends]
+    next_start = elapsed[np.minimum(ends + 1, len(match) - 1)]
+    end_time = np.where(final, elapsed[ends] + end_gap[match[ends]], next_start)
+    interrupted = np.add.reduceat(gaps["interrupted"].astype(np.int64), starts) > 0
+    return end_time - elapsed[starts], ends - starts + 1, interrupted
+
+def game_table(arrays, gaps, end_gap):
+    starts = np.flatnonzero(gaps["first"] | np.roll(gaps["ends_game"], 1))
+    duration, points, interrupted = unit_durations(arrays, gaps, starts, end_gap)
+    match = arrays["match"][starts]
+    index = np.arange(len(starts))
+    game_no = index - np.maximum.accumulate(np.where(gaps["new_set"][starts], index, 0)) + 1
+    # 6-6 is only a tiebreak where the set uses one (not advantage final
+    # sets), which the numeric tiebreak scores tell apart
+    games_before = np.where(gaps["new_set"][starts], 0, np.roll(arrays["games"], 1)[starts])
+    tiebreak = (games_before == 12) & (np.add.reduceat(arrays["tiebreak"].astype(np.int64), starts) > 0)
+    return pd.DataFrame({
+        "match_id": arrays["match_ids"][match],
+        "set_no": arrays["set_no"][starts],
+        "game_no": game_no,
+        "server": arrays["server"][starts],
+        "tiebreak": tiebreak,
+        "points": points,
+        "duration_s": duration,
+        "interrupted": interrupted,
+    })
+
+def set_table(arrays, gaps, end_gap):
+    starts = np.flatnonzero(gaps["new_set"])
+    duration, points, interrupted = unit_durations(arrays, gaps, starts, end_gap)
+    ends = np.append(starts[1:], len(arrays["match"])) - 1
+    return pd.DataFrame({
+        "match_id": arrays["match_ids"][arrays["match"][starts]],
+        "set_no": arrays["set_no"][starts],
+        "games": arrays["games"][ends],
+        "points": points,
+        "duration_s": duration,
+        "interrupted": interrupted,
+    })
+
+def match_table(arrays, gaps, end_gap, players):
+    """
+    One row per match: points, sets, duration (first point start to the
+    estimated end of the last point), players and best_of.
+    """
+    match = arrays["match"]
+    n = len(arrays["match_ids"])
+    last = np.flatnonzero(gaps["last"])
+    first = np.flatnonzero(gaps["first"])
+    table = pd.DataFrame({
+        "match_id": arrays["match_ids"],
+        "points": np.bincount(match, minlength=n),
+        "sets": np.bincount(match, weights=gaps["new_set"], minlength=n).astype(np.int64),
+        "duration_s": arrays["elapsed"][last] + end_gap - arrays["elapsed"][first],
+        "interruptions": np.bincount(match, weights=gaps["interrupted"], minlength=n).astype(np.int64),
+        "elapsed_coverage": arrays["coverage"].round(4),
+    })
+    return table.merge(players, on="match_id", how="left")
+
+# ---------------------------
+# PACE
+# ---------------------------
+def seconds_per_shot(arrays, gaps):
+    """
+    Least-squares slope of in-game gap on rally length: the seconds each
+    extra shot adds, so a gap minus rally * slope is the time between
+    points (the part a shot clock governs).
+    """
+    use = gaps["valid"] & (gaps["kind"] == 0) & ~np.isnan(arrays["rally"])
+    if use.sum() < 2:
+        return 0.0
+    slope, _ = np.polyfit(arrays["rally"][use], gaps["gap"][use], 1)
+    return float(slope)
+
+def server_pace(arrays, gaps, players, shot_seconds):
+    """
+    Between-point time by server: in-game gaps grouped by the serving
+    player. rest_s removes the rally's share (rally * shot_seconds) where
+    the rally length is known.
+    """
+    use = gaps["valid"] & (gaps["kind"] == 0)
+    sides = players.set_index("match_id")[["player1_id", "player2_id"]]
+    match_ids = arrays["match_ids"][arrays["match"][use]]
+    side = arrays["server"][use]
+    p1 = sides["player1_id"].reindex(match_ids).to_numpy()
+    p2 = sides["player2_id"].reindex(match_ids).to_numpy()
+    gaps_df = pd.DataFrame({
+        "player_id": np.where(side == 1, p1, p2),
+        "match_id": match_ids,
+        "gap_s": gaps["gap"][use],
+        "rest_s": gaps["gap"][use] - arrays["rally"][use] * shot_seconds,
+    }).dropna(subset=["player_id"])
+    grouped = gaps_df.groupby("player_id")
+    pace = grouped.agg(
+        matches=("match_id", "nunique"), points_served=("gap_s", "size"),
+        median_gap_s=("gap_s", "median"), mean_gap_s=("gap_s", "mean"), median_rest_s=("rest_s", "median"),
+    )
+    pace["p90_gap_s"] = grouped["gap_s"].quantile(0.9)
+    names = pd.concat([players[["player1_id", "player1"]].set_axis(["player_id", "name"], axis=1),
+                       players[["player2_id", "player2"]].set_axis(["player_id", "name"], axis=1)]).drop_duplicates("player_id").set_index("player_id")["name"]
+    pace.insert(0, "name", names.reindex(pace.index))
+    return pace.round(2).sort_values("points_served", ascending=False)
+
+def load_slam_players(matches_directory, index=None):
+    """
+    match_id -> player ids, names and best_of for the singles matches in the
+    slam matches files (men's singles are best of five). Names resolve
+    through `index` (load_player_index()).
+    """
+    frames = []
+    for file_path in sorted(Path(matches_directory).glob("*-matches.csv")):
+        df = pd.read_csv(file_path, encoding=get_file_encoding_type(file_path), dtype=str)
+        gender, _ = parse_singles_match_num(df["match_num"])
+        df, gender = df[gender.notna().to_numpy()], gender.dropna()
+        frames.append(pd.DataFrame({
+            "match_id": df["match_id"],
+            "tournament": df["slam"].map(SLAM_TOURNAMENTS).fillna(df["slam"]),
+            "year": pd.to_numeric(df["year"], errors="coerce"),
+            "best_of": np.where(gender == "M", 5, 3),
+            "player1": df["player1"],
+            "player2": df["player2"],
+            "player1_id": player_ids(df["player1"], index),
+            "player2_id": player_ids(df["player2"], index),
+        }))
+    if not frames:
+        return pd.DataFrame(columns=["match_id", "tournament", "year", "best_of", "player1", "player2", "player1_id", "player2_id"])
+    return pd.concat(frames, ignore_index=True).drop_duplicates("match_id")
+
+# ---------------------------
+# DURATION MODEL
+# ---------------------------
+class PaceModel:
+    """
+    Predicted match length = expected points for the format x the pair's
+    seconds per point (the mean of the two players' rates, each shrunk
+    towards the format's mean by PLAYER_PRIOR_MATCHES pseudo-matches).
+    Everything is precomputed into plain dicts, so predict() is a few
+    lookups: cheap enough to call per slot from a scheduling tool.
+    """
+
+    def __init__(self, expected_points, prior_spp, player_spp):
+        self.expected_points = {int(k): float(v) for k, v in expected_points.items()}
+        self.prior_spp = {int(k): float(v) for k, v in prior_spp.items()}
+        self.player_spp = {k: {int(b): float(v) for b, v in by_format.items()} for k, by_format in player_spp.items()}
+
+    @classmethod
+    def fit(cls, matches):
+        """
+        Fits from a match_table() frame; interrupted matches are skipped.
+        """
+        clean = matches[(matches["interruptions"] == 0) & matches["best_of"].notna() & (matches["duration_s"] > 0)].copy()
+        clean["best_of"] = clean["best_of"].astype(int)
+        clean["spp"] = clean["duration_s"] / clean["points"]
+        expected_points = clean.groupby("best_of")["points"].mean().to_dict()
+        prior_spp = clean.groupby("best_of")["spp"].mean().to_dict()
+
+        by_player = pd.concat([clean[["player1_id", "best_of", "spp"]].set_axis(["player_id", "best_of", "spp"], axis=1),
+                               clean[["player2_id", "best_of", "spp"]].set_axis(["player_id", "best_of", "spp"], axis=1)]).dropna(subset=["player_id"])
+        stats = by_player.groupby(["player_id", "best_of"])["spp"].agg(["sum", "size"]).reset_index()
+        prior = stats["best_of"].map(prior_spp)
+        stats["shrunk"] = (stats["sum"] + PLAYER_PRIOR_MATCHES * prior) / (stats["size"] + PLAYER_PRIOR_MATCHES)
+        player_spp = {}
+        for player_id, best_of, shrunk in zip(stats["player_id"], stats["best_of"], stats["shrunk"]):
+            player_spp.setdefault(player_id, {})[best_of] = shrunk
+        return cls(expected_points, prior_spp, player_spp)
+
+    def predict(self, player1_id, player2_id, best_of=3):
+        """
+        Predicted duration in seconds. Unknown players take the format's
+        mean pace; an unseen format uses the nearest one fitted.
+        """
+        if best_of not in self.expected_points:
+            best_of = min(self.expected_points, key=lambda b: abs(b - best_of))
+        prior = self.prior_spp[best_of]
+        spp_1 = self.player_spp.get(player1_id, {}).get(best_of, prior)
+        spp_2 = self.player_spp.get(player2_id, {}).get(best_of, prior)
+        return self.expected_points[best_of] * (spp_1 + spp_2) / 2
+
+    def to_json(self, path):
+        Path(path).write_text(json.dumps({
+            "expected_points": self.expected_points, "prior_spp": self.prior_spp, "player_spp": self.player_spp,
+        }))
+
+    @classmethod
+    def from_json(cls, path):
+        data = json.loads(Path(path).read_text())
+        return cls(data["expected_points"], data["prior_spp"], data["player_spp"])
+
+def evaluate(model_class, matches, test_year):
+    """
+    Mean absolute error (minutes) of the model and of the per-format mean
+    duration when fitted on matches before test_year and scored on it.
+    """
+    train, test = matches[matches["year"] < test_year], matches[(matches["year"] == test_year) & (matches["interruptions"] == 0)]
+    test = test[test["best_of"].notna()]
+    if train.empty or test.empty:
+        return None
+    model = model_class.fit(train)
+    predicted = np.array([model.predict(a, b, int(f)) for a, b, f in zip(test["player1_id"], test["player2_id"], test["best_of"])])
+    baseline = test["best_of"].map(train.groupby("best_of")["duration_s"].mean()).to_numpy()
+    actual = test["duration_s"].to_numpy()
+    return {"matches": len(test), "model_mae_min": np.abs(predicted - actual).mean() / 60, "baseline_mae_min": np.abs(baseline - actual).mean() / 60}
+
+def parse_start_time(times):
+    """
+    Scheduled start strings from the MCP matches file ('3:00 PM', '7pm',
+    '14:30') to minutes after midnight (vectorized); unparseable -> NaN.
+    """
+    parts = times.astype("string").str.strip().str.lower().str.extract(r"^(\d{1,2})(?::(\d{2}))?\s*(am|pm)?$")
+    hour = pd.to_numeric(parts[0], errors="coerce")
+    minute = pd.to_numeric(parts[1], errors="coerce").fillna(0)
+    meridiem = parts[2].fillna("")
+    hour = hour.where(meridiem != "pm", hour % 12 + 12).where(meridiem != "am", hour % 12)
+    return (hour * 60 + minute).where(hour.between(0, 23)).astype(float)
+
+def predict_end_times(matches, model):
+    """
+    Adds predicted_min and, where the scheduled time parses, predicted_end
+    ('HH:MM') to a canonical matches frame.
+    """
+    best_of = matches["best_of"].fillna(3).astype(int)
+    predicted = np.array([model.predict(a, b, f) for a, b, f in zip(matches["player1_id"], matches["player2_id"], best_of)]) / 60
+    # Round to whole minutes before splitting, so 16:59.6 becomes 17:00
+    end = ((parse_start_time(matches["time"]) + predicted).round() % (24 * 60)).astype("Int64")
+    return matches.assign(
+        predicted_min=predicted.round(1),
+        predicted_end=(end // 60).astype("string").str.zfill(2) + ":" + (end % 60).astype("string").str.zfill(2),
+    )
+
+
+if __name__ == "__main__":
+    root = find_repo_root()
+    data_directory = root / "data"
+    store_directory = data_directory / "processed" / "point_store"
+    output_directory = data_directory / "processed" / "pace"
+
+    parser = argparse.ArgumentParser(description="Point gaps, game/set/match durations, server pace and a match duration model from ElapsedTime.")
+    parser.add_argument("--points-dir", nargs="+", default=[str(data_directory / "old_data" / "points")], help="Used to build the point store if it is missing")
+    parser.add_argument("--test-year", type=int, default=None, help="Year held out to score the duration model (default: latest)")
+    parser.add_argument("--top", type=int, default=10, help="Servers to show, fastest and slowest")
+    args = parser.parse_args()
+
+    print(f"[INFO] - Repository Root: {root}")
+    points_files = sorted(f for d in args.points_dir for f in Path(d).glob("*.csv"))
+    start = time.perf_counter()
+    players = load_slam_players(data_directory / "old_data" / "matches", load_player_index(data_directory / "canonical" / "players" / "players.csv"))
+    arrays = load_point_arrays(store_directory, points_files, players["match_id"])
+    load_s = time.perf_counter() - start
+    if not len(arrays["match_ids"]):
+        print("[ERROR] - No singles matches with elapsed times in the point store")
+        quit()
+
+    start = time.perf_counter()
+    gaps = point_gaps(arrays)
+    end_gap = match_point_gap(arrays, gaps)
+    games = game_table(arrays, gaps, end_gap)
+    sets = set_table(arrays, gaps, end_gap)
+    matches = match_table(arrays, gaps, end_gap, players)
+    shot_seconds = seconds_per_shot(arrays, gaps)
+    pace = server_pace(arrays, gaps, players, shot_seconds)
+    analytics_s = time.perf_counter() - start
+
+    model = PaceModel.fit(matches)
+    test_year = args.test_year or int(matches["year"].max())
+    scores = evaluate(PaceModel, matches, test_year)
+    sample = matches[["player1_id", "player2_id", "best_of"]].dropna().head(10000)
+    start = time.perf_counter()
+    for a, b, f in zip(sample["player1_id"], sample["player2_id"], sample["best_of"].astype(int)):
+        model.predict(a, b, f)
+    predict_us = (time.perf_counter() - start) / max(len(sample), 1) * 1e6
+
+    output_directory.mkdir(parents=True, exist_ok=True)
+    games.to_csv(output_directory / "games.csv", index=False)
+    sets.to_csv(output_directory / "sets.csv", index=False)
+    matches.to_csv(output_directory / "matches.csv", index=False)
+    pace.to_csv(output_directory / "server_pace.csv")
+    model.to_json(output_directory / "pace_model.json")
+
+    canonical_path = data_directory / "canonical" / "matches" / "matches.csv"
+    if canonical_path.exists():
+        scheduled = predict_end_times(pd.read_csv(canonical_path), model)
+        scheduled[["match_id", "time", "court", "best_of", "predicted_min", "predicted_end"]].to_csv(output_directory / "scheduled_matches.csv", index=False)
+
+    gap_valid = gaps["valid"]
+    print("\n----------- SUMMARY -------------")
+    print(f"Singles matches with elapsed times: {len(matches):,} ({len(arrays['match']):,} points, loaded in {load_s:.2f}s, analysed in {analytics_s:.2f}s)")
+    for code, kind in enumerate(GAP_KINDS):
+        of_kind = gap_valid & (gaps["kind"] == code)
+        print(f"{kind.title()} gaps: median {np.median(gaps['gap'][of_kind]):.0f}s over {of_kind.sum():,} (> {GAP_LIMITS[kind]}s treated as interruptions)")
+    print(f"Interruptions: {int(gaps['interrupted'].sum()):,} in {(matches['interruptions'] > 0).sum():,} matches")
+    print(f"Seconds per extra shot: {shot_seconds:.2f}")
+    clean = matches[matches["interruptions"] == 0]
+    for best_of, group in clean.groupby("best_of"):
+        print(f"Best of {int(best_of)}: median match {group['duration_s'].median() / 60:.0f} min, {group['points'].median():.0f} points")
+    print(f"Median game: {games.loc[~games['interrupted'] & ~games['tiebreak'], 'duration_s'].median():.0f}s, tiebreak {games.loc[~games['interrupted'] & games['tiebreak'], 'duration_s'].median():.0f}s; median set {sets.loc[~sets['interrupted'], 'duration_s'].median() / 60:.0f} min")
+    if scores:
+        print(f"Duration model on {test_year} ({scores['matches']:,} matches): MAE {scores['model_mae_min']:.1f} min (format mean: {scores['baseline_mae_min']:.1f} min)")
+    print(f"Prediction: {predict_us:.2f} us per match")
+    print(f"Written to: {output_directory}")
+
+    regular = pace[pace["points_served"] >= 500]
+    if not regular.empty:
+        print(f"\n----------- BETWEEN-POINT TIME BY SERVER (>= 500 points) -------------")
+        columns = ["name", "matches", "points_served", "median_gap_s", "median_rest_s"]
+        print("Fastest:")
+        print(regular.sort_values("median_gap_s")[columns].head(args.top).to_string())
+        print("Slowest:")
+        print(regular.sort_values("median_gap_s", ascending=False)[columns].head(args.top).to_string())
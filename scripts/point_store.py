@@ -0,0 +1,338 @@
+import argparse
+import json
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from build_canonical_dataset import POINTS_RENAME_MAP
+from feature_pipeline import MCP_SERVE_DIRECTIONS
+from tennis_research import find_repo_root, get_file_encoding_type
+
+# Bump when POINT_DTYPE or the flag bits change so old stores are rebuilt.
+STORE_VERSION = 1
+
+# One packed, fixed-width record per point (19 bytes). 0 means unknown for
+# serve_number/serve_dir/rally_len/speed_kmh; SCORE_MISSING and
+# ELAPSED_MISSING mark missing scores and times.
+POINT_DTYPE = np.dtype([
+    ("point_num", "<u2"),
+    ("set_no", "u1"),
+    ("games_1", "u1"),
+    ("games_2", "u1"),
+    ("score_1", "u1"),
+    ("score_2", "u1"),
+    ("server", "u1"),
+    ("winner", "u1"),
+    ("serve_number", "u1"),
+    ("serve_dir", "u1"),
+    ("rally_len", "u1"),
+    ("flags", "u1"),
+    ("speed_kmh", "<u2"),
+    ("elapsed_s", "<u4"),
+])
+SCORE_MISSING = 255
+ELAPSED_MISSING = 0xFFFFFFFF
+
+FLAG_BREAK_POINT = 1
+FLAG_NUMERIC_SCORE_1 = 2  # tiebreak-style score: score_1 is a raw count
+FLAG_NUMERIC_SCORE_2 = 4
+FLAG_ACE = 8
+FLAG_DOUBLE_FAULT = 16
+
+GAME_SCORES = ["0", "15", "30", "40", "AD", "GAME"]
+GAME_SCORE_CODES = {s: i for i, s in enumerate(GAME_SCORES)}
+
+# Canonical point frame: what the store round-trips exactly.
+CANONICAL_COLUMNS = [
+    "match_id", "point_num", "set_no", "games_1", "games_2", "score_1", "score_2", "server", "winner",
+    "serve_number", "serve_dir", "rally_len", "speed_kmh", "elapsed_s", "break_point", "ace", "double_fault",
+]
+
+# ---------------------------
+# CANONICAL POINTS
+# ---------------------------
+def parse_elapsed(elapsed):
+    """
+    'H:MM:SS' strings to integer seconds (vectorized); unparseable -> NA.
+    """
+    parts = elapsed.fillna("").astype(str).str.split(":", expand=True).reindex(columns=[0, 1, 2])
+    h, m, s = (pd.to_numeric(parts[c], errors="coerce") for c in (0, 1, 2))
+    return (h * 3600 + m * 60 + s).round().astype("Int64")
+
+def finish_canonical(points):
+    """
+    Clips every field to what its packed width can hold and sets the
+    canonical dtypes, so packing is lossless from here on.
+    """
+    for col in ["serve_number", "serve_dir", "rally_len"]:
+        points[col] = pd.to_numeric(points[col], errors="coerce").where(lambda s: s > 0).clip(upper=255).round().astype("Int64")
+    points["speed_kmh"] = pd.to_numeric(points["speed_kmh"], errors="coerce").where(lambda s: s > 0).clip(upper=65535).round().astype("Int64")
+    points["elapsed_s"] = pd.to_numeric(points["elapsed_s"], errors="coerce").where(lambda s: s.between(0, ELAPSED_MISSING - 1)).astype("Int64")
+    for col in ["point_num", "set_no", "games_1", "games_2", "server", "winner"]:
+        points[col] = pd.to_numeric(points[col], errors="coerce").fillna(0).astype(np.int64)
+    for col in ["score_1", "score_2"]:
+        score = points[col].astype("string").str.strip()
+        representable = score.isin(GAME_SCORES) | score.str.fullmatch(r"\d{1,2}|1\d\d|2[0-4]\d|25[0-4]").fillna(False)
+        points[col] = score.where(representable, pd.NA)
+    for col in ["break_point", "ace", "double_fault"]:
+        points[col] = points[col].fillna(False).astype(bool)
+    return points[CANONICAL_COLUMNS].reset_index(drop=True)
+
+def canonical_slam_points(df):
+    """
+    Canonical points from a slam points file (scores are after the point).
+    Doubles servers 3/4 fold onto their side.
+    """
+    num = lambda col: pd.to_numeric(df[col], errors="coerce") if col in df else pd.Series(np.nan, index=df.index)
+    server = num("PointServer")
+    winner = num("PointWinner")
+    keep = server.isin([1, 2, 3, 4]) & winner.isin([1, 2])
+    side = (server - 1) % 2 + 1
+    rally = num("Rally") if "Rally" in df and df["Rally"].notna().any() else num("RallyCount")
+    served_by_1 = side == 1
+    points = pd.DataFrame({
+        "match_id": df["match_id"],
+        "point_num": num("PointNumber"),
+        "set_no": num("SetNo"),
+        "games_1": num("P1GamesWon"),
+        "games_2": num("P2GamesWon"),
+        "score_1": df["P1Score"] if "P1Score" in df else pd.NA,
+        "score_2": df["P2Score"] if "P2Score" in df else pd.NA,
+        "server": side,
+        "winner": winner,
+        "serve_number": num("ServeNumber"),
+        "serve_dir": num("Serve_Direction").where(lambda s: s.isin([1, 2, 3])),
+        "rally_len": rally,
+        "speed_kmh": num("Speed_KMH"),
+        "elapsed_s": parse_elapsed(df["ElapsedTime"]) if "ElapsedTime" in df else pd.NA,
+        "break_point": np.where(served_by_1, num("P2BreakPoint"), num("P1BreakPoint")) > 0,
+        "ace": np.where(served_by_1, num("P1Ace"), num("P2Ace")) > 0,
+        "double_fault": np.where(served_by_1, num("P1DoubleFault"), num("P2DoubleFault")) > 0,
+    })
+    return finish_canonical(points[keep.to_numpy()])
+
+def canonical_mcp_points(df):
+    """
+    Canonical points from an MCP points file, raw or as written by
+    clean_tennis_points. Scores are before the point and turned from
+    server-first into player 1 / player 2 order.
+    """
+    df = df.copy()
+    df.columns = [c.strip().lower().replace(" ", "_") for c in df.columns]
+    df = df.rename(columns=POINTS_RENAME_MAP)
+    server = pd.to_numeric(df["server"], errors="coerce")
+    winner = pd.to_numeric(df["ptwinner"], errors="coerce")
+    keep = server.isin([1, 2]) & winner.isin([1, 2])
+
+    second = df["second_srv"].fillna("").astype(str).str.strip()
+    played = pd.Series(np.where(second != "", second, df["first_srv"].fillna("").astype(str).str.strip()), index=df.index)
+    # Leading 'c's are lets; the serve itself follows them
+    serve = played.str.lstrip("c")
+    pts = df["pts"].fillna("").astype(str).str.split("-", n=1, expand=True).reindex(columns=[0, 1])
+    served_by_1 = server == 1
+
+    # Break point: the returner wins the game with this point (never in a
+    # tiebreak, games level at 6); Pts is server first
+    server_pts, returner_pts = pts[0].map(GAME_SCORE_CODES), pts[1].map(GAME_SCORE_CODES)
+    games_1, games_2 = pd.to_numeric(df["gm1"], errors="coerce"), pd.to_numeric(df["gm2"], errors="coerce")
+    tiebreak = (games_1 == games_2) & (games_1 >= 6)
+    break_point = (returner_pts >= 3) & (returner_pts > server_pts) & ~tiebreak
+    points = pd.DataFrame({
+        "match_id": df["match_id"],
+        "point_num": df["pt"],
+        "set_no": pd.to_numeric(df["set1"], errors="coerce") + pd.to_numeric(df["set2"], errors="coerce") + 1,
+        "games_1": df["gm1"],
+        "games_2": df["gm2"],
+        "score_1": pts[0].where(served_by_1, pts[1]),
+        "score_2": pts[1].where(served_by_1, pts[0]),
+        "server": server,
+        "winner": winner,
+        "serve_number": np.where(second != "", 2, 1),
+        "serve_dir": serve.str[:1].map(MCP_SERVE_DIRECTIONS),
+        "rally_len": serve.str[1:].str.count(r"[fbrsvzopuylmhijkt]") + 1,
+        "speed_kmh": np.nan,
+        "elapsed_s": pd.NA,
+        "break_point": break_point,
+        "ace": played.str.fullmatch(r"c*[0456][+c]*\*"),
+        "double_fault": (second != "") & played.str.fullmatch(r"c*[0456][+c]*[nwdxge!V]+"),
+    })
+    return finish_canonical(points[keep.to_numpy()])
+
+# ---------------------------
+# PACKING
+# ---------------------------
+def encode_scores(scores):
+    """
+    Score strings to (codes, numeric) where numeric marks tiebreak-style
+    scores stored as raw counts rather than 0/15/30/40/AD codes.
+    """
+    game = scores.map(GAME_SCORE_CODES)
+    count = pd.to_numeric(scores, errors="coerce")
+    numeric = (game.isna() & count.notna()).to_numpy()
+    codes = game.fillna(count).fillna(SCORE_MISSING).clip(upper=SCORE_MISSING).to_numpy()
+    return codes.astype(np.uint8), numeric
+
+def decode_scores(codes, numeric):
+    labels = np.array(GAME_SCORES + [None] * (256 - len(GAME_SCORES)), dtype=object)
+    out = np.where(numeric, codes.astype(str), labels[codes])
+    out = pd.array(out, dtype="string")
+    out[codes == SCORE_MISSING] = pd.NA
+    return out
+
+def pack_points(points):
+    """
+    Canonical point frame -> POINT_DTYPE array (same row order).
+    """
+    records = np.zeros(len(points), dtype=POINT_DTYPE)
+    for col in ["point_num", "set_no", "games_1", "games_2", "server", "winner"]:
+        records[col] = points[col].to_numpy()
+    for col in ["serve_number", "serve_dir", "rally_len", "speed_kmh"]:
+        records[col] = points[col].fillna(0).to_numpy()
+    records["elapsed_s"] = points["elapsed_s"].fillna(ELAPSED_MISSING).to_numpy()
+
+    score_1, numeric_1 = encode_scores(points["score_1"])
+    score_2, numeric_2 = encode_scores(points["score_2"])
+    records["score_1"], records["score_2"] = score_1, score_2
+    flags = (FLAG_BREAK_POINT * points["break_point"].to_numpy()
+             + FLAG_NUMERIC_SCORE_1 * numeric_1
+             + FLAG_NUMERIC_SCORE_2 * numeric_2
+             + FLAG_ACE * points["ace"].to_numpy()
+             + FLAG_DOUBLE_FAULT * points["double_fault"].to_numpy())
+    records["flags"] = flags
+    return records
+
+def unpack_points(records, match_ids):
+    """
+    POINT_DTYPE array (+ a match_id per record) -> canonical point frame.
+    """
+    unknown_zero = lambda col: pd.array(np.where(records[col] == 0, pd.NA, records[col]), dtype="Int64")
+    elapsed = records["elapsed_s"].astype(np.int64)
+    return pd.DataFrame({
+        "match_id": match_ids,
+        "point_num": records["point_num"].astype(np.int64),
+        "set_no": records["set_no"].astype(np.int64),
+        "games_1": records["games_1"].astype(np.int64),
+        "games_2": records["games_2"].astype(np.int64),
+        "score_1": decode_scores(records["score_1"], (records["flags"] & FLAG_NUMERIC_SCORE_1) > 0),
+        "score_2": decode_scores(records["score_2"], (records["flags"] & FLAG_NUMERIC_SCORE_2) > 0),
+        "server": records["server"].astype(np.int64),
+        "winner": records["winner"].astype(np.int64),
+        "serve_number": unknown_zero("serve_number"),
+        "serve_dir": unknown_zero("serve_dir"),
+        "rally_len": unknown_zero("rally_len"),
+        "speed_kmh": unknown_zero("speed_kmh"),
+        "elapsed_s": pd.array(np.where(elapsed == ELAPSED_MISSING, pd.NA, elapsed), dtype="Int64"),
+        "break_point": (records["flags"] & FLAG_BREAK_POINT) > 0,
+        "ace": (records["flags"] & FLAG_ACE) > 0,
+        "double_fault": (records["flags"] & FLAG_DOUBLE_FAULT) > 0,
+    })
+
+# ---------------------------
+# STORE
+# ---------------------------
+def write_point_store(points, store_directory):
+    """
+    Writes canonical points as one contiguous block per match:
+      points.npy       POINT_DTYPE records, matches in first-seen order and
+                       points in point_num order inside each block
+      match_index.npz  match_ids and offsets (block i is offsets[i]:offsets[i+1])
+      store.json       version and counts
+    Returns the canonical frame in stored order.
+    """
+    store_directory = Path(store_directory)
+    store_directory.mkdir(parents=True, exist_ok=True)
+    codes, match_ids = pd.factorize(points["match_id"])
+    order = np.lexsort([points["point_num"].to_numpy(), codes])
+    points = points.iloc[order].reset_index(drop=True)
+    codes = codes[order]
+
+    offsets = np.zeros(len(match_ids) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum(np.bincount(codes, minlength=len(match_ids)))
+    np.save(store_directory / "points.npy", pack_points(points))
+    np.savez(store_directory / "match_index.npz", match_ids=np.asarray(match_ids, dtype=str), offsets=offsets)
+    (store_directory / "store.json").write_text(json.dumps({"version": STORE_VERSION, "matches": len(match_ids), "points": len(points)}))
+    return points
+
+class PointStore:
+    """
+    Memory-mapped, read-only view of a point store. match() returns a
+    zero-copy slice of the mapped records; nothing is read from disk until
+    those records are touched.
+    """
+
+    def __init__(self, store_directory):
+        store_directory = Path(store_directory)
+        meta = json.loads((store_directory / "store.json").read_text())
+        if meta["version"] != STORE_VERSION:
+            raise ValueError(f"Point store version {meta['version']} != {STORE_VERSION}, rebuild it")
+        self.records = np.load(store_directory / "points.npy", mmap_mode="r")
+        with np.load(store_directory / "match_index.npz") as index:
+            self.match_ids = index["match_ids"]
+            self.offsets = index["offsets"]
+        self._position = {m: i for i, m in enumerate(self.match_ids.tolist())}
+
+    def __len__(self):
+        return len(self.match_ids)
+
+    def __contains__(self, match_id):
+        return match_id in self._position
+
+    def match(self, match_id):
+        i = self._position[match_id]
+        return self.records[self.offsets[i]:self.offsets[i + 1]]
+
+    def match_frame(self, match_id):
+        records = self.match(match_id)
+        return unpack_points(records, np.full(len(records), match_id, dtype=object))
+
+    def to_frame(self):
+        match_ids = np.repeat(self.match_ids.astype(object), np.diff(self.offsets))
+        return unpack_points(np.asarray(self.records), match_ids)
+
+def load_canonical_points(points_files):
+    frames = []
+    for file_path in points_files:
+        df = pd.read_csv(file_path, encoding=get_file_encoding_type(file_path), dtype=str)
+        frames.append(canonical_mcp_points(df) if "Svr" in df or "server" in df else canonical_slam_points(df))
+    return pd.concat(frames, ignore_index=True)
+
+
+if __name__ == "__main__":
+    root = find_repo_root()
+    store_directory = root / "data" / "processed" / "point_store"
+
+    parser = argparse.ArgumentParser(description="Build a memory-mapped binary point store and check the round trip.")
+    parser.add_argument("--points-dir", nargs="+", default=[str(root / "data" / "old_data" / "points"), str(root / "data" / "canonical" / "points")])
+    args = parser.parse_args()
+
+    points_files = sorted(f for d in args.points_dir for f in Path(d).glob("*.csv"))
+    if not points_files:
+        print(f"[ERROR] - No points files found in: {args.points_dir}")
+        quit()
+
+    print(f"[INFO] - Repository Root: {root}")
+    start = time.perf_counter()
+    points = load_canonical_points(points_files)
+    csv_s = time.perf_counter() - start
+    stored = write_point_store(points, store_directory)
+
+    store = PointStore(store_directory)
+    if not store.to_frame().equals(stored):
+        print("[FATAL] - Round trip mismatch between canonical points and the point store")
+        quit()
+
+    sample = store.match_ids[:: max(1, len(store) // 1000)]
+    start = time.perf_counter()
+    for match_id in sample:
+        store.match(match_id)
+    lookup_us = (time.perf_counter() - start) / len(sample) * 1e6
+
+    size = sum(f.stat().st_size for f in store_directory.iterdir())
+    print("\n----------- SUMMARY -------------")
+    print(f"Points: {len(stored):,} in {len(store):,} matches ({POINT_DTYPE.itemsize} bytes/point)")
+    print(f"Store size: {size / 1e6:.1f} MB (CSV input {sum(f.stat().st_size for f in points_files) / 1e6:.1f} MB, parsed in {csv_s:.1f}s)")
+    print(f"Round trip: OK")
+    print(f"Match lookup: {lookup_us:.1f} us")
+    print(f"Store written to: {store_directory}")
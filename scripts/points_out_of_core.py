@@ -0,0 +1,301 @@
+import argparse
+import math
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from feature_pipeline import normalize_slam_points, normalize_mcp_points, load_player_names
+from stage_profiler import StageProfiler
+from tennis_research import find_repo_root, get_file_encoding_type, normalize_name, generate_player_id
+
+try:
+    import pyarrow  # noqa: F401
+    SPILL_FORMAT = "parquet"
+except ImportError:
+    SPILL_FORMAT = "pkl"
+
+# Rows read per chunk and the raw input bytes each spill partition should
+# hold; together they cap the working set at a few hundred MB.
+CHUNK_ROWS = 250_000
+PARTITION_BYTES = 64 * 1024 * 1024
+
+# Raw columns the normalizers read; everything else is skipped at parse time
+SLAM_COLUMNS = {"match_id", "PointServer", "PointWinner", "Rally", "RallyCount", "Serve_Direction", "ServingTo",
+                "Speed_KMH", "ServeNumber", "P1BreakPoint", "P2BreakPoint"}
+MCP_COLUMNS = {"match_id", "Svr", "PtWinner", "1st", "2nd", "Pts", "Gm1", "Gm2"}
+
+MATCH_STAT_COLUMNS = [
+    "points_played", "points_won", "serve_pts", "serve_won", "return_pts", "return_won",
+    "bp_faced", "bp_saved", "longest_run",
+]
+
+# ---------------------------
+# SPILL PARTITIONS
+# ---------------------------
+def partition_of(keys, n_partitions):
+    """
+    Stable hash partition for every key, the same in every chunk and run.
+    """
+    return (pd.util.hash_pandas_object(keys, index=False).to_numpy() % n_partitions).astype(np.int64)
+
+class SpillPartitioner:
+    """
+    Hash-partitions rows on a key column into spill files on disk so a
+    groupby or join on that key can later run one partition at a time.
+    Every chunk written adds at most one file per partition.
+    """
+
+    def __init__(self, spill_directory, name, n_partitions):
+        self.directory = Path(spill_directory) / name
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.n_partitions = n_partitions
+        self.rows = np.zeros(n_partitions, dtype=np.int64)
+        self._chunks = 0
+
+    def write(self, df, key):
+        if df.empty:
+            return
+        parts = partition_of(df[key], self.n_partitions)
+        for p, frame in df.groupby(parts, sort=False):
+            path = self.directory / f"part-{p:04d}-{self._chunks:06d}.{SPILL_FORMAT}"
+            if SPILL_FORMAT == "parquet":
+                frame.to_parquet(path, index=False)
+            else:
+                frame.reset_index(drop=True).to_pickle(path)
+            self.rows[p] += len(frame)
+        self._chunks += 1
+
+    def read(self, p):
+        files = sorted(self.directory.glob(f"part-{p:04d}-*.{SPILL_FORMAT}"))
+        if not files:
+            return None
+        reader = pd.read_parquet if SPILL_FORMAT == "parquet" else pd.read_pickle
+        return pd.concat([reader(f) for f in files], ignore_index=True)
+
+    def __iter__(self):
+        for p in range(self.n_partitions):
+            frame = self.read(p)
+            if frame is not None:
+                yield p, frame
+
+def spill_groupby_sum(frames, key, spill_directory, name, n_partitions, columns):
+    """
+    Out-of-core groupby(key).sum(): partial sums per chunk are spilled by
+    key hash and each partition is reduced on its own.
+    """
+    spill = SpillPartitioner(spill_directory, name, n_partitions)
+    for frame in frames:
+        spill.write(frame.groupby(key, as_index=False)[columns].sum(), key)
+    results = [frame.groupby(key, as_index=False)[columns].sum() for _, frame in spill]
+    return pd.concat(results, ignore_index=True) if results else pd.DataFrame(columns=[key] + columns)
+
+# ---------------------------
+# MATCH RECONSTRUCTION
+# ---------------------------
+def summarize_matches(points):
+    """
+    Per-(match_id, side) totals from the normalized points of whole
+    matches, in played order (`seq`). Longest run is the longest streak of
+    consecutive points won, found with one grouped pass over run ids.
+    """
+    points = points.sort_values(["match_id", "seq"], kind="stable")
+    match = points["match_id"].to_numpy()
+    winner = points["winner"].to_numpy().astype(np.int64)
+    server = points["server"].to_numpy().astype(np.int64)
+    break_point = points["break_point"].to_numpy().astype(bool)
+
+    new_run = np.ones(len(points), dtype=bool)
+    new_run[1:] = (match[1:] != match[:-1]) | (winner[1:] != winner[:-1])
+    run_id = np.cumsum(new_run)
+    run_length = np.bincount(run_id)[run_id]
+
+    frames = []
+    for side in (1, 2):
+        serving = server == side
+        frame = pd.DataFrame({
+            "match_id": match,
+            "points_played": 1,
+            "points_won": winner == side,
+            "serve_pts": serving,
+            "serve_won": serving & (winner == side),
+            "return_pts": ~serving,
+            "return_won": ~serving & (winner == side),
+            "bp_faced": serving & break_point,
+            "bp_saved": serving & break_point & (winner == side),
+            "longest_run": np.where(winner == side, run_length, 0),
+        })
+        agg = {c: "sum" for c in MATCH_STAT_COLUMNS}
+        agg["longest_run"] = "max"
+        frame = frame.groupby("match_id", as_index=False, sort=False).agg(agg)
+        frame.insert(1, "side", side)
+        frames.append(frame)
+    return pd.concat(frames, ignore_index=True)
+
+def load_side_names(matches_directory, mcp_matches_path=None):
+    """
+    (match_id, side, player_id) for slam matches and, if given, the MCP
+    matches file. Doubles sides keep their 'Player / Partner' name.
+    """
+    names = [load_player_names(matches_directory)]
+    if mcp_matches_path and Path(mcp_matches_path).exists():
+        df = pd.read_csv(mcp_matches_path, encoding=get_file_encoding_type(mcp_matches_path), dtype=str)
+        for side in (1, 2):
+            names.append(pd.DataFrame({"match_id": df["match_id"], "side": side, "player": df[f"Player {side}"]}))
+    names = pd.concat(names, ignore_index=True).drop_duplicates(["match_id", "side"])
+    canonical = names["player"].map(normalize_name)
+    names["player_id"] = canonical.map(lambda n: generate_player_id(n) if n else None)
+    return names.dropna(subset=["player_id"])
+
+# ---------------------------
+# PIPELINE
+# ---------------------------
+def read_normalized_chunks(file_path, chunksize):
+    """
+    Streams one points file as normalized chunks with `seq`, the row number
+    within the file, so point order survives the shuffle through spill
+    files. seq restarts for every file; it only orders points within a
+    match, and each match comes from a single file.
+    """
+    is_mcp = file_path.name.startswith("charting-")
+    encoding = "latin-1" if is_mcp else get_file_encoding_type(file_path)
+    seq = 0
+    columns = MCP_COLUMNS if is_mcp else SLAM_COLUMNS
+    for chunk in pd.read_csv(file_path, dtype=str, encoding=encoding, chunksize=chunksize, usecols=lambda c: c in columns):
+        chunk.index = pd.RangeIndex(seq, seq + len(chunk))
+        normalized = normalize_mcp_points(chunk) if is_mcp else normalize_slam_points(chunk)
+        normalized = normalized[["match_id", "server", "winner", "break_point"]].copy()
+        normalized["seq"] = normalized.index.to_numpy()
+        seq += len(chunk)
+        yield normalized
+
+def run_out_of_core(points_files, side_names, spill_directory, n_partitions=None, chunksize=CHUNK_ROWS, profiler=None):
+    """
+    Per-match and per-player point totals with memory bounded by one chunk
+    plus one partition.
+
+    1. Stream every file in chunks and spill points by match_id hash, so
+       each partition holds whole matches.
+    2. Reconstruct each partition's matches and join them to the side names
+       spilled on the same hash (partition-wise hash join).
+    3. Sum per player with a second spilled groupby keyed by player_id.
+
+    Every row is read and written a constant number of times, so runtime
+    grows linearly with the corpus. Returns (match_stats, player_stats).
+    """
+    profiler = profiler or StageProfiler()
+    if n_partitions is None:
+        total_bytes = sum(f.stat().st_size for f in points_files)
+        n_partitions = max(1, math.ceil(total_bytes / PARTITION_BYTES))
+
+    with profiler.stage("partition_points") as stage:
+        points_spill = SpillPartitioner(spill_directory, "points", n_partitions)
+        for file_path in points_files:
+            stage.add_file(file_path)
+            for chunk in read_normalized_chunks(file_path, chunksize):
+                points_spill.write(chunk, "match_id")
+                stage.add_rows(rows_out=len(chunk))
+        names_spill = SpillPartitioner(spill_directory, "names", n_partitions)
+        names_spill.write(side_names[["match_id", "side", "player_id"]], "match_id")
+
+    match_spill = SpillPartitioner(spill_directory, "matches", n_partitions)
+    with profiler.stage("reconstruct_matches") as stage:
+        for p, points in points_spill:
+            stage.add_rows(rows_in=len(points))
+            summary = summarize_matches(points)
+            names = names_spill.read(p)
+            if names is not None:
+                summary = summary.merge(names, on=["match_id", "side"], how="left")
+            else:
+                summary["player_id"] = None
+            match_spill.write(summary, "match_id")
+            stage.add_rows(rows_out=len(summary))
+
+    with profiler.stage("aggregate_players") as stage:
+        match_stats = pd.concat([frame for _, frame in match_spill], ignore_index=True)
+        named = (frame.dropna(subset=["player_id"]).assign(matches=1) for _, frame in match_spill)
+        sum_columns = ["matches"] + [c for c in MATCH_STAT_COLUMNS if c != "longest_run"]
+        player_stats = spill_groupby_sum(named, "player_id", spill_directory, "players", n_partitions, sum_columns)
+        stage.add_rows(rows_in=len(match_stats), rows_out=len(player_stats))
+
+    return match_stats, player_stats
+
+# ---------------------------
+# PARITY CHECK
+# ---------------------------
+def check_parity(points_files, side_names, spill_directory, n_partitions=4, chunksize=10_000):
+    """
+    Runs the out-of-core path with small chunks and several partitions and
+    compares its match totals with summarize_matches over each file read
+    whole. Adds a synthetic MCP points file when none is given, so both
+    normalizers are always covered. Returns the number of mismatched rows.
+    """
+    points_files = list(points_files)
+    if not any(f.name.startswith("charting-") for f in points_files):
+        from benchmark_pipeline import generate_synthetic_data
+        generate_synthetic_data(spill_directory / "synthetic", scale=1)
+        points_files.append(spill_directory / "synthetic" / "points" / "charting-m-points-synthetic.csv")
+
+    # A file has fewer rows than bytes, so this reads each one as a single chunk
+    in_memory = pd.concat([chunk for f in points_files for chunk in read_normalized_chunks(f, f.stat().st_size + 1)], ignore_index=True)
+    expected = summarize_matches(in_memory)
+    actual, _ = run_out_of_core(points_files, side_names, spill_directory / "run", n_partitions, chunksize)
+
+    key = ["match_id", "side"]
+    expected = expected.sort_values(key).reset_index(drop=True)
+    actual = actual[expected.columns].sort_values(key).reset_index(drop=True)
+    if len(expected) != len(actual):
+        print(f"[ERROR] - Parity: {len(actual):,} out-of-core match sides vs {len(expected):,} in memory")
+        return abs(len(expected) - len(actual))
+    actual[MATCH_STAT_COLUMNS] = actual[MATCH_STAT_COLUMNS].astype(np.int64)
+    expected[MATCH_STAT_COLUMNS] = expected[MATCH_STAT_COLUMNS].astype(np.int64)
+    mismatched = int((actual != expected).any(axis=1).sum())
+    n_mcp = sum(f.name.startswith("charting-") for f in points_files)
+    print(f"[INFO] - Parity: {len(points_files)} files ({n_mcp} MCP), {len(expected):,} match sides, {mismatched} mismatched")
+    return mismatched
+
+
+if __name__ == "__main__":
+    root = find_repo_root()
+    data_directory = root / "data"
+    output_directory = data_directory / "processed" / "out_of_core"
+
+    parser = argparse.ArgumentParser(description="Out-of-core per-match and per-player point aggregation.")
+    parser.add_argument("--points-dir", nargs="+", default=[str(data_directory / "old_data" / "points"), str(data_directory / "raw" / "points")])
+    parser.add_argument("--partitions", type=int, default=None, help="Spill partitions (default: input size / 64 MB)")
+    parser.add_argument("--chunksize", type=int, default=CHUNK_ROWS)
+    parser.add_argument("--spill-dir", default=None, help="Where to spill (default: a temp directory)")
+    parser.add_argument("--check", action="store_true", help="Compare out-of-core totals with an in-memory run and exit")
+    args = parser.parse_args()
+
+    points_files = sorted(f for d in args.points_dir for f in Path(d).glob("*.csv"))
+    if not points_files:
+        print(f"[ERROR] - No points files found in: {args.points_dir}")
+        quit()
+
+    print(f"[INFO] - Repository Root: {root}")
+    print(f"[INFO] - {len(points_files)} points files, {sum(f.stat().st_size for f in points_files) / 1e6:.1f} MB")
+    side_names = load_side_names(data_directory / "old_data" / "matches", data_directory / "raw" / "matches" / "matches.csv")
+    spill_directory = Path(tempfile.mkdtemp(prefix="points-spill-", dir=args.spill_dir))
+    if args.check:
+        try:
+            mismatched = check_parity(points_files, side_names, spill_directory)
+        finally:
+            shutil.rmtree(spill_directory, ignore_errors=True)
+        quit(1 if mismatched else 0)
+    profiler = StageProfiler()
+    start = time.perf_counter()
+    try:
+        match_stats, player_stats = run_out_of_core(points_files, side_names, spill_directory, args.partitions, args.chunksize, profiler)
+    finally:
+        shutil.rmtree(spill_directory, ignore_errors=True)
+
+    output_directory.mkdir(parents=True, exist_ok=True)
+    match_stats.to_csv(output_directory / "match_point_stats.csv", index=False)
+    player_stats.to_csv(output_directory / "player_point_stats.csv", index=False)
+    profiler.print_summary()
+    print(f"[INFO] - {len(match_stats):,} match sides, {len(player_stats):,} players in {time.perf_counter() - start:.1f}s")
+    print(f"[INFO] - Outputs written to: {output_directory}")
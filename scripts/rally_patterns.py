@@ -0,0 +1,306 @@
+import argparse
+import re
+import time
+
+import numpy as np
+import pandas as pd
+
+from tennis_research import find_repo_root, get_file_encoding_type, normalize_name, generate_player_id
+
+# ---------------------------
+# SHOT VOCABULARY
+# ---------------------------
+# Every token fits in one byte, so an n-gram of up to MAX_N tokens packs
+# into the low 8 * MAX_N bits of an int64 key and the slice id (player or
+# surface) goes in the bits above it.
+MAX_N = 5
+GRAM_BITS = 8 * MAX_N
+
+# MCP serve codes: 4 = wide, 5 = body, 6 = down the T, 0 = unknown
+SERVE_TOKENS = {"4": 1, "5": 2, "6": 3, "0": 4}
+SHOT_TYPES = "fbrsvzopuylmhijktq"
+SHOT_NAMES = {
+    "f": "forehand", "b": "backhand", "r": "fh slice", "s": "bh slice", "v": "fh volley",
+    "z": "bh volley", "o": "overhead", "p": "bh overhead", "u": "fh drop", "y": "bh drop",
+    "l": "fh lob", "m": "bh lob", "h": "fh half-volley", "i": "bh half-volley",
+    "j": "fh swinging volley", "k": "bh swinging volley", "t": "trick shot", "q": "unknown shot",
+}
+SHOT_BASE = 10  # shot token = SHOT_BASE + type_index * 10 + direction (0-9)
+OUTCOME_TOKENS = {"ace": 200, "unreturned": 201, "winner": 202, "forced_error": 203, "unforced_error": 204, "double_fault": 205}
+TOKEN_NAMES = {v: f"serve {k}" for k, v in {"wide": 1, "body": 2, "T": 3, "unknown": 4}.items()}
+TOKEN_NAMES.update({v: k.replace("_", " ") for k, v in OUTCOME_TOKENS.items()})
+for _t, _type in enumerate(SHOT_TYPES):
+    for _d in range(10):
+        TOKEN_NAMES[SHOT_BASE + _t * 10 + _d] = f"{SHOT_NAMES[_type]}{'' if _d == 0 else f' {_d}'}"
+
+SHOT_RE = re.compile(r"([" + SHOT_TYPES + r"])[+\-=;^]*(\d?)\d*[nwdxge!]*([*#@]?)")
+SERVE_RE = re.compile(r"^c*([0456])[+c]*([nwdxge!V]*)([*#]?)")
+
+def tokenize_point(code, is_second_serve):
+    """
+    Decodes an MCP shot string ('4f2b3*', '6d', 'c6f1*' ...) into token ids:
+    the serve (leading lets, 'c', skipped), every rally shot as (shot type,
+    first direction digit) and a closing outcome token. Returns an empty
+    list for unparseable strings.
+    """
+    m = SERVE_RE.match(code)
+    if not m:
+        return []
+    tokens = [SERVE_TOKENS[m.group(1)]]
+    if m.group(2):
+        return tokens + [OUTCOME_TOKENS["double_fault"]] if is_second_serve else []
+    if m.group(3) == "*":
+        return tokens + [OUTCOME_TOKENS["ace"]]
+    if m.group(3) == "#":
+        return tokens + [OUTCOME_TOKENS["unreturned"]]
+
+    ending = ""
+    for shot in SHOT_RE.finditer(code, m.end()):
+        direction = int(shot.group(2)) if shot.group(2) else 0
+        tokens.append(SHOT_BASE + SHOT_TYPES.index(shot.group(1)) * 10 + direction)
+        ending = shot.group(3)
+        if ending:
+            break
+    outcome = {"*": "winner", "#": "forced_error", "@": "unforced_error"}.get(ending)
+    if outcome:
+        tokens.append(OUTCOME_TOKENS[outcome])
+    return tokens
+
+def decode_gram(key):
+    """
+    Turns a packed n-gram key back into readable token names.
+    """
+    names = []
+    key = int(key) & ((1 << GRAM_BITS) - 1)
+    while key:
+        names.append(TOKEN_NAMES.get(key & 0xFF, str(key & 0xFF)))
+        key >>= 8
+    return " -> ".join(reversed(names))
+
+# ---------------------------
+# N-GRAM COUNTING
+# ---------------------------
+def pack_ngrams(tokens, point_of, n):
+    """
+    Builds every n-gram window that stays inside one point.
+
+    tokens is the flat token array for all points and point_of[i] is the
+    point token i belongs to. Windows may not start on an outcome token.
+    Returns (keys, start positions) where keys are packed int64 n-grams.
+    """
+    total = len(tokens)
+    if total < n:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    starts = np.arange(total - n + 1)
+    same_point = point_of[starts] == point_of[starts + n - 1]
+    starts = starts[same_point & (tokens[starts] < OUTCOME_TOKENS["ace"])]
+    keys = np.zeros(starts.size, dtype=np.int64)
+    for k in range(n):
+        keys = (keys << 8) | tokens[starts + k].astype(np.int64)
+    return keys, starts
+
+def merge_counts(table, keys, wins):
+    """
+    Merges a batch of keys (with per-key win flags) into a sorted
+    (keys, counts, wins) table without ever holding raw windows twice.
+    """
+    if keys.size:
+        uniq, inverse = np.unique(keys, return_inverse=True)
+        batch = (uniq, np.bincount(inverse).astype(np.int64), np.bincount(inverse, weights=wins).astype(np.int64))
+    else:
+        batch = (np.empty(0, np.int64), np.empty(0, np.int64), np.empty(0, np.int64))
+    if table is None:
+        return batch
+    all_keys = np.concatenate([table[0], batch[0]])
+    uniq, inverse = np.unique(all_keys, return_inverse=True)
+    counts = np.bincount(inverse, weights=np.concatenate([table[1], batch[1]])).astype(np.int64)
+    won = np.bincount(inverse, weights=np.concatenate([table[2], batch[2]])).astype(np.int64)
+    return uniq, counts, won
+
+class RallyPatternIndex:
+    """
+    Shot n-gram counts and win counts held as sorted int64 key arrays, with
+    per-player and per-surface slices packed into the key's upper bits.
+    Each n-gram is credited to the player who hits its first shot.
+    """
+
+    def __init__(self, max_n=4):
+        if max_n > MAX_N:
+            raise ValueError(f"max_n must be <= {MAX_N}")
+        self.max_n = max_n
+        self.tables = {"all": None, "player": None, "surface": None}
+        self.player_ids = []
+        self.player_pos = {}
+        self.surfaces = ["Hard", "Clay", "Grass", "Carpet", "Unknown"]
+        self.points_indexed = 0
+
+    def _player_index(self, player_ids):
+        out = np.empty(len(player_ids), dtype=np.int64)
+        for i, pid in enumerate(player_ids):
+            if pid not in self.player_pos:
+                self.player_pos[pid] = len(self.player_ids)
+                self.player_ids.append(pid)
+            out[i] = self.player_pos[pid]
+        return out
+
+    def add_points(self, points, match_meta):
+        """
+        Indexes one batch of MCP points. match_meta maps match_id to
+        player1_id, player2_id and surface.
+        """
+        second = points["2nd"].fillna("").astype(str).str.strip()
+        first = points["1st"].fillna("").astype(str).str.strip()
+        played = np.where(second != "", second, first)
+        is_second = (second != "").to_numpy()
+        sequences = [tokenize_point(code, sec) for code, sec in zip(played, is_second)]
+
+        lengths = np.fromiter((len(s) for s in sequences), dtype=np.int64, count=len(sequences))
+        keep = lengths > 0
+        if not keep.any():
+            return
+        offsets = np.concatenate([[0], np.cumsum(lengths[keep])[:-1]])
+        tokens = np.fromiter((t for s, k in zip(sequences, keep) if k for t in s), dtype=np.int64)
+
+        pts = points[keep]
+        meta = match_meta.reindex(pts["match_id"])
+        server = pd.to_numeric(pts["Svr"], errors="coerce").fillna(1).to_numpy().astype(int)
+        winner = pd.to_numeric(pts["PtWinner"], errors="coerce").fillna(0).to_numpy().astype(int)
+        p1 = self._player_index(meta["player1_id"].fillna("unknown").to_numpy())
+        p2 = self._player_index(meta["player2_id"].fillna("unknown").to_numpy())
+        surface = meta["surface"].fillna("Unknown").map(lambda s: self.surfaces.index(s) if s in self.surfaces else len(self.surfaces) - 1).to_numpy()
+
+        point_of = np.repeat(np.arange(keep.sum()), lengths[keep])
+        position = np.arange(tokens.size) - offsets[point_of]
+        # Server hits the serve and every even shot; outcome tokens never start a window
+        hitter = np.where(position % 2 == 0, server[point_of], 3 - server[point_of])
+        hitter_id = np.where(hitter == 1, p1[point_of], p2[point_of])
+        hitter_won = winner[point_of] == hitter
+
+        for n in range(2, self.max_n + 1):
+            keys, starts = pack_ngrams(tokens, point_of, n)
+            wins = hitter_won[starts].astype(np.float64)
+            self.tables["all"] = merge_counts(self.tables["all"], keys, wins)
+            self.tables["player"] = merge_counts(self.tables["player"], (hitter_id[starts] << GRAM_BITS) | keys, wins)
+            self.tables["surface"] = merge_counts(self.tables["surface"], (surface[point_of][starts] << GRAM_BITS) | keys, wins)
+        self.points_indexed += int(keep.sum())
+
+    def top_patterns(self, k=20, n=None, player=None, surface=None, min_count=20, sort_by="count"):
+        """
+        Top-k n-grams overall or within one player/surface slice. The slice
+        is located with a binary search over the packed keys.
+        Returns a DataFrame with the readable pattern, count and win rate.
+        """
+        if player is not None:
+            table, slice_id = self.tables["player"], self.player_pos.get(player)
+            if slice_id is None:
+                raise KeyError(f"Player not indexed: {player}")
+        elif surface is not None:
+            table, slice_id = self.tables["surface"], self.surfaces.index(surface.title())
+        else:
+            table, slice_id = self.tables["all"], 0
+        if table is None:
+            return pd.DataFrame(columns=["pattern", "n", "count", "win_rate"])
+
+        keys, counts, wins = table
+        lo = np.searchsorted(keys, slice_id << GRAM_BITS)
+        hi = np.searchsorted(keys, (slice_id + 1) << GRAM_BITS)
+        keys, counts, wins = keys[lo:hi], counts[lo:hi], wins[lo:hi]
+        gram = keys & ((1 << GRAM_BITS) - 1)
+        length = (np.floor(np.log2(np.maximum(gram, 1))) // 8 + 1).astype(int)
+
+        mask = counts >= min_count
+        if n is not None:
+            mask &= length == n
+        idx = np.flatnonzero(mask)
+        score = counts[idx] if sort_by == "count" else wins[idx] / counts[idx]
+        top = idx[np.argsort(-score, kind="stable")[:k]]
+        return pd.DataFrame({
+            "pattern": [decode_gram(g) for g in gram[top]],
+            "n": length[top],
+            "count": counts[top],
+            "win_rate": wins[top] / counts[top],
+        })
+
+    def save(self, path):
+        arrays = {"player_ids": np.array(self.player_ids, dtype=str), "max_n": np.int64(self.max_n), "points_indexed": np.int64(self.points_indexed)}
+        for name, table in self.tables.items():
+            if table is not None:
+                arrays[f"{name}_keys"], arrays[f"{name}_counts"], arrays[f"{name}_wins"] = table
+        np.savez(path, **arrays)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            index = cls(int(data["max_n"]))
+            index.player_ids = list(data["player_ids"])
+            index.player_pos = {pid: i for i, pid in enumerate(index.player_ids)}
+            index.points_indexed = int(data["points_indexed"])
+            for name in index.tables:
+                if f"{name}_keys" in data.files:
+                    index.tables[name] = (data[f"{name}_keys"], data[f"{name}_counts"], data[f"{name}_wins"])
+        return index
+
+def load_match_meta(matches_path):
+    """
+    match_id -> player ids and surface from an MCP matches file.
+    """
+    df = pd.read_csv(matches_path, encoding=get_file_encoding_type(matches_path), dtype=str)
+    meta = pd.DataFrame({
+        "match_id": df["match_id"],
+        "player1_id": df["Player 1"].map(lambda n: generate_player_id(normalize_name(n)) if normalize_name(n) else None),
+        "player2_id": df["Player 2"].map(lambda n: generate_player_id(normalize_name(n)) if normalize_name(n) else None),
+        "surface": df["Surface"],
+    })
+    return meta.drop_duplicates("match_id").set_index("match_id")
+
+def build_pattern_index(points_files, match_meta, max_n=4, chunksize=200_000):
+    """
+    Streams every points file in chunks so memory is bounded by the number of
+    distinct n-grams, not the number of points.
+    """
+    index = RallyPatternIndex(max_n)
+    for file_path in points_files:
+        start = time.perf_counter()
+        reader = pd.read_csv(file_path, encoding=get_file_encoding_type(file_path), dtype=str,
+                             usecols=["match_id", "Svr", "1st", "2nd", "PtWinner"], chunksize=chunksize)
+        for chunk in reader:
+            index.add_points(chunk, match_meta)
+        print(f"[INFO] - Indexed {file_path.name} ({time.perf_counter() - start:.2f}s, {index.points_indexed:,} points so far)")
+    return index
+
+
+if __name__ == "__main__":
+    root = find_repo_root()
+    data_directory = root / "data" / "raw"
+    points_directory = data_directory / "points"
+    index_path = root / "data" / "processed" / "cache" / "rally_patterns.npz"
+
+    parser = argparse.ArgumentParser(description="Mine shot n-gram patterns from MCP point strings.")
+    parser.add_argument("--rebuild", action="store_true", help="Rebuild the index from the points files")
+    parser.add_argument("--max-n", type=int, default=4)
+    parser.add_argument("-k", type=int, default=20)
+    parser.add_argument("-n", type=int, default=None, help="Only patterns of this length")
+    parser.add_argument("--player", help="Player name or id slice")
+    parser.add_argument("--surface", choices=["Hard", "Clay", "Grass"])
+    parser.add_argument("--min-count", type=int, default=20)
+    parser.add_argument("--sort-by", choices=["count", "win_rate"], default="count")
+    args = parser.parse_args()
+
+    print(f"[INFO] - Repository Root: {root}")
+    if args.rebuild or not index_path.exists():
+        points_files = sorted(points_directory.glob("charting-*-points*.csv"))
+        if not points_files:
+            print(f"[ERROR] - No MCP points files (charting-*-points*.csv) found in: {points_directory}")
+            quit()
+        match_meta = load_match_meta(data_directory / "matches" / "matches.csv")
+        index = build_pattern_index(points_files, match_meta, args.max_n)
+        index_path.parent.mkdir(parents=True, exist_ok=True)
+        index.save(index_path)
+        print(f"[INFO] - Pattern index written to: {index_path}")
+    else:
+        index = RallyPatternIndex.load(index_path)
+
+    player = args.player
+    if player and player not in index.player_pos:
+        player = generate_player_id(normalize_name(player))
+    print(index.top_patterns(args.k, args.n, player, args.surface, args.min_count, args.sort_by).to_string(index=False))
@@ -0,0 +1,159 @@
+import cProfile
+import functools
+import json
+import resource
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+# ---------------------------
+# MEMORY
+# ---------------------------
+def reset_peak_rss():
+    """
+    Resets the kernel's RSS high-water mark (Linux only) so each stage gets
+    its own peak. Returns False where that isn't supported.
+    """
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+def peak_rss_mb():
+    """
+    Peak resident set size in MB, from /proc (resettable) when available,
+    falling back to getrusage (process lifetime peak).
+    """
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+# ---------------------------
+# STAGES
+# ---------------------------
+class StageRecord:
+    """
+    Counters for one named stage. Entering the same stage name again (e.g.
+    once per points file) accumulates into the same record.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.calls = 0
+        self.wall_s = 0.0
+        self.rows_in = None
+        self.rows_out = None
+        self.bytes_read = 0
+        self.peak_rss_mb = 0.0
+
+    def add_rows(self, rows_in=None, rows_out=None):
+        if rows_in is not None:
+            self.rows_in = (self.rows_in or 0) + int(rows_in)
+        if rows_out is not None:
+            self.rows_out = (self.rows_out or 0) + int(rows_out)
+
+    def add_file(self, path):
+        self.bytes_read += Path(path).stat().st_size
+
+    def to_dict(self):
+        out = {"stage": self.name, "calls": self.calls, "wall_s": round(self.wall_s, 4), "peak_rss_mb": round(self.peak_rss_mb, 1)}
+        if self.rows_in is not None:
+            out["rows_in"] = self.rows_in
+        if self.rows_out is not None:
+            out["rows_out"] = self.rows_out
+        if self.bytes_read:
+            out["bytes_read"] = self.bytes_read
+        return out
+
+class StageProfiler:
+    """
+    Times named pipeline stages and collects row counts, bytes read and the
+    memory high-water mark per stage. With profile_directory set, every
+    stage also runs under cProfile and is dumped to <stage>.prof there.
+
+    Usage:
+        profiler = StageProfiler()
+        with profiler.stage("load") as s:
+            s.add_file(path)
+            df = pd.read_csv(path)
+            s.add_rows(rows_out=len(df))
+        profiler.write_report(report_path)
+    """
+
+    def __init__(self, profile_directory=None):
+        self.records = {}
+        self.profiles = {}
+        self.profile_directory = Path(profile_directory) if profile_directory else None
+        self.started = datetime.now()
+        self._start = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name):
+        record = self.records.setdefault(name, StageRecord(name))
+        profile = None
+        if self.profile_directory:
+            profile = self.profiles.setdefault(name, cProfile.Profile())
+        reset_peak_rss()
+        start = time.perf_counter()
+        if profile:
+            profile.enable()
+        try:
+            yield record
+        finally:
+            if profile:
+                profile.disable()
+            record.wall_s += time.perf_counter() - start
+            record.calls += 1
+            record.peak_rss_mb = max(record.peak_rss_mb, peak_rss_mb())
+
+    def profiled(self, name=None):
+        """
+        Decorator form of stage(); the stage is named after the function
+        unless a name is given.
+        """
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.stage(name or func.__name__):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def report(self):
+        return {
+            "started": self.started.isoformat(timespec="seconds"),
+            "total_s": round(time.perf_counter() - self._start, 4),
+            "peak_rss_mb": round(max((r.peak_rss_mb for r in self.records.values()), default=0.0), 1),
+            "stages": [r.to_dict() for r in self.records.values()],
+        }
+
+    def write_report(self, report_path):
+        """
+        Writes the compact JSON run report and any per-stage cProfile dumps.
+        Returns the report dict.
+        """
+        report = self.report()
+        report_path = Path(report_path)
+        report_path.parent.mkdir(parents=True, exist_ok=True)
+        report_path.write_text(json.dumps(report, indent=1))
+        if self.profile_directory:
+            self.profile_directory.mkdir(parents=True, exist_ok=True)
+            for name, profile in self.profiles.items():
+                profile.dump_stats(self.profile_directory / f"{name}.prof")
+        return report
+
+    def print_summary(self):
+        print("\n----------- STAGES -------------")
+        for r in self.records.values():
+            rows = f"{r.rows_in if r.rows_in is not None else '-':>9} -> {r.rows_out if r.rows_out is not None else '-':<9}"
+            print(f"{r.name:<20} {r.wall_s:>8.3f}s  {rows} {r.bytes_read / 1e6:>8.1f} MB read  {r.peak_rss_mb:>8.1f} MB peak")
@@ -0,0 +1,421 @@
+import argparse
+import json
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from tennis_research import find_repo_root, get_file_encoding_type, normalize_name, generate_player_id
+
+INDEX_VERSION = 2
+
+# ---------------------------
+# FEATURES
+# ---------------------------
+# Per family, the rows and columns summed per player over every ingested
+# match. Sums are additive, so new matches only add to them. ServeInfluence
+# holds percentages, which are summed weighted by the row's `pts` (with the
+# weight summed alongside, since some percentages are '-').
+SUM_COLUMNS = {
+    "ServeDirection": {"Total": ["deuce_wide", "deuce_middle", "deuce_t", "ad_wide", "ad_middle", "ad_t",
+                                 "err_net", "err_wide", "err_deep", "err_wide_deep", "err_foot", "err_unknown"]},
+    "ShotDirection": {"Total": ["crosscourt", "down_middle", "down_the_line", "inside_out", "inside_in"],
+                      "F": ["crosscourt", "down_middle", "down_the_line", "inside_out", "inside_in"]},
+    "NetPoints": {"NetPoints": ["net_pts", "pts_won"], "Approach": ["net_pts"]},
+    "SnV": {"SnV": ["snv_pts", "pts_won"], "nonSnV": ["snv_pts"]},
+    "ServeInfluence": {"1": ["pts", "won_1+", "won_3+", "won_5+", "won_7+", "won_10+"],
+                       "2": ["pts", "won_1+", "won_3+", "won_5+", "won_7+", "won_10+"]},
+}
+WEIGHT_COLUMN = {"ServeInfluence": "pts"}
+
+def sum_key(family, row, column):
+    return f"{family}.{row}.{column}"
+
+SD, SH, NP, SV, SI = "ServeDirection.Total", "ShotDirection", "NetPoints", "SnV", "ServeInfluence"
+DEUCE = [f"{SD}.deuce_{d}" for d in ("wide", "middle", "t")]
+AD = [f"{SD}.ad_{d}" for d in ("wide", "middle", "t")]
+SERVE_ERRORS = [f"{SD}.err_{e}" for e in ("net", "wide", "deep", "wide_deep", "foot", "unknown")]
+SHOTS = ["crosscourt", "down_middle", "down_the_line", "inside_out", "inside_in"]
+
+# Every feature is a rate: (name, numerator sum keys, denominator sum keys)
+FEATURES = (
+    [(f"deuce_{k.rsplit('_', 1)[1]}", [k], DEUCE) for k in DEUCE]
+    + [(f"ad_{k.rsplit('_', 1)[1]}", [k], AD) for k in AD]
+    + [("serve_error_rate", SERVE_ERRORS, DEUCE + AD + SERVE_ERRORS)]
+    + [(f"shot_{s}", [f"{SH}.Total.{s}"], [f"{SH}.Total.{t}" for t in SHOTS]) for s in SHOTS]
+    + [("forehand_share", [f"{SH}.F.{s}" for s in SHOTS], [f"{SH}.Total.{s}" for s in SHOTS])]
+    + [("net_rate", [f"{NP}.NetPoints.net_pts"], [f"{SI}.1.pts", f"{SI}.2.pts"]),
+       ("net_won", [f"{NP}.NetPoints.pts_won"], [f"{NP}.NetPoints.net_pts"]),
+       ("approach_share", [f"{NP}.Approach.net_pts"], [f"{NP}.NetPoints.net_pts"]),
+       ("snv_rate", [f"{SV}.SnV.snv_pts"], [f"{SV}.SnV.snv_pts", f"{SV}.nonSnV.snv_pts"]),
+       ("snv_won", [f"{SV}.SnV.pts_won"], [f"{SV}.SnV.snv_pts"])]
+    + [(f"serve{s}_won_{n}", [f"{SI}.{s}.won_{n}+"], [f"{SI}.{s}.won_{n}+#w"]) for s in (1, 2) for n in (1, 3, 5, 7, 10)]
+)
+FEATURE_NAMES = [name for name, _, _ in FEATURES]
+# Families a feature's sums come from; it is only observed for a player
+# with rows in all of them
+FEATURE_FAMILIES = {name: sorted({k.split(".")[0] for k in numerator + denominator}) for name, numerator, denominator in FEATURES}
+
+# Pseudo-count pulling a rate toward the population rate, so a player seen
+# in one match isn't an outlier on a rate built from three points.
+PRIOR_WEIGHT = 10.0
+
+def parse_stat(values):
+    """
+    Numeric stats column; '69.4%' -> 0.694 and '-' -> NaN.
+    """
+    text = values.astype(str).str.strip()
+    pct = text.str.endswith("%")
+    numbers = pd.to_numeric(text.str.rstrip("%"), errors="coerce")
+    return numbers.where(~pct, numbers / 100)
+
+def family_sums(df, family):
+    """
+    Per-player sums of one family's SUM_COLUMNS, keyed by sum_key (and
+    '<key>#w' for the weights of weighted columns), plus the player's row
+    count in '<family>#rows'.
+    """
+    spec = SUM_COLUMNS[family]
+    frames = []
+    for row, columns in spec.items():
+        part = df[df["row"].astype(str) == row]
+        if part.empty:
+            continue
+        values = pd.DataFrame({c: parse_stat(part[c]) for c in columns if c in part}, index=part.index)
+        weight_column = WEIGHT_COLUMN.get(family)
+        out = pd.DataFrame(index=part.index)
+        for column in values:
+            key = sum_key(family, row, column)
+            if weight_column and column != weight_column:
+                weight = values[weight_column].where(values[column].notna(), 0).fillna(0)
+                out[key] = (values[column].fillna(0) * weight)
+                out[f"{key}#w"] = weight
+            else:
+                out[key] = values[column].fillna(0)
+        out["player_id"] = part["player_id"]
+        frames.append(out.groupby("player_id").sum())
+    if not frames:
+        return pd.DataFrame()
+    sums = pd.concat(frames, axis=1).fillna(0)
+    sums[f"{family}#rows"] = df.groupby("player_id").size()
+    return sums
+
+def compute_features(sums, genders):
+    """
+    (n_players, n_features) rates with every rate shrunk toward its value
+    over the player's gender by PRIOR_WEIGHT pseudo-observations. NaN where
+    the player has no rows in one of the feature's families.
+    """
+    genders = pd.Series(np.asarray(genders), index=sums.index)
+    columns = {}
+    for name, numerator, denominator in FEATURES:
+        num = sums.reindex(columns=numerator, fill_value=0).sum(axis=1)
+        den = sums.reindex(columns=denominator, fill_value=0).sum(axis=1)
+        rows = sums.reindex(columns=[f"{family}#rows" for family in FEATURE_FAMILIES[name]], fill_value=0)
+        observed = (rows > 0).all(axis=1)
+        totals = pd.DataFrame({"num": num, "den": den}).where(observed, 0).groupby(genders, dropna=False).transform("sum")
+        prior = (totals["num"] / totals["den"]).where(totals["den"] > 0, 0.0)
+        columns[name] = ((num + PRIOR_WEIGHT * prior) / (den + PRIOR_WEIGHT)).where(observed)
+    return pd.DataFrame(columns, index=sums.index)
+
+def normalize_vectors(features, genders):
+    """
+    z-score every feature within each gender (over the players it is
+    observed for), set unobserved features to 0 so they add nothing to a
+    dot product, then scale every player to unit length so a dot product
+    is the cosine similarity.
+    """
+    x = features.to_numpy(dtype=np.float64, copy=True)
+    genders = np.asarray(genders)
+    for gender in pd.unique(genders):
+        rows = genders == gender
+        part = x[rows]
+        observed = ~np.isnan(part)
+        count = np.maximum(observed.sum(axis=0), 1)
+        mean = np.where(observed, part, 0).sum(axis=0) / count
+        std = np.sqrt(np.where(observed, (part - mean) ** 2, 0).sum(axis=0) / count)
+        x[rows] = np.where(observed, (part - mean) / np.where(std > 0, std, 1.0), 0.0)
+    norms = np.linalg.norm(x, axis=1, keepdims=True)
+    return (x / np.where(norms > 0, norms, 1.0)).astype(np.float32)
+
+# ---------------------------
+# APPROXIMATE INDEX
+# ---------------------------
+class IVFIndex:
+    """
+    Inverted-file index over unit vectors: k-means centroids partition the
+    players and a query only scores the players in its `nprobe` closest
+    lists. Lists are stored as one array sorted by list, with offsets, so
+    gathering candidates is a few slices.
+    """
+
+    def __init__(self, centroids):
+        self.centroids = centroids
+        self.order = np.empty(0, dtype=np.int64)
+        self.offsets = np.zeros(len(centroids) + 1, dtype=np.int64)
+        self.trained_size = 0
+
+    @classmethod
+    def train(cls, vectors, n_lists=None, iterations=10, seed=0):
+        n_lists = n_lists or max(1, int(np.sqrt(len(vectors))))
+        rng = np.random.default_rng(seed)
+        centroids = vectors[rng.choice(len(vectors), size=min(n_lists, len(vectors)), replace=False)].copy()
+        for _ in range(iterations):
+            assignment = np.argmax(vectors @ centroids.T, axis=1)
+            for c in range(len(centroids)):
+                members = vectors[assignment == c]
+                if len(members):
+                    mean = members.mean(axis=0)
+                    centroids[c] = mean / max(np.linalg.norm(mean), 1e-12)
+        index = cls(centroids)
+        index.trained_size = len(vectors)
+        index.assign(vectors)
+        return index
+
+    def assign(self, vectors):
+        """
+        (Re)assigns every vector to its closest centroid without retraining.
+        """
+        assignment = np.argmax(vectors @ self.centroids.T, axis=1)
+        self.order = np.argsort(assignment, kind="stable")
+        self.offsets = np.searchsorted(assignment[self.order], np.arange(len(self.centroids) + 1))
+
+    def candidates(self, query, nprobe):
+        lists = np.argsort(-(self.centroids @ query))[:nprobe]
+        return np.concatenate([self.order[self.offsets[c]:self.offsets[c + 1]] for c in lists])
+
+# ---------------------------
+# STYLE INDEX
+# ---------------------------
+def top_k(scores, k, exclude=None):
+    if exclude is not None:
+        scores = scores.copy()
+        scores[exclude] = -np.inf
+    k = min(k, len(scores))
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top], kind="stable")]
+
+class StyleIndex:
+    """
+    Per-player style vectors from the stats families. Holds the additive
+    per-player sums (so refresh() only reads rows of new matches), the
+    normalized float32 vector matrix and an IVF index over it.
+    """
+
+    def __init__(self):
+        self.sums = pd.DataFrame()
+        self.players = pd.DataFrame(columns=["player_id", "name", "gender", "matches"]).set_index("player_id")
+        # Ingested (family, match_id) pairs and "player_id|match_id" pairs
+        self.ingested = {family: set() for family in SUM_COLUMNS}
+        self.player_matches = set()
+        self.file_state = {}
+        self.vectors = np.zeros((0, len(FEATURE_NAMES)), dtype=np.float32)
+        self.player_ids = []
+        self.position = {}
+        self.ivf = None
+
+    def refresh(self, stats_directory):
+        """
+        Adds the rows of matches not seen yet from every stats file that
+        changed since the last refresh, then recomputes the vectors.
+        Returns the number of new (match, player) rows ingested.
+        """
+        new_sums, new_players = [], []
+        for family in SUM_COLUMNS:
+            for file_path in sorted(Path(stats_directory).glob(f"*-stats-{family}.csv")):
+                st = file_path.stat()
+                state = [st.st_mtime_ns, st.st_size]
+                if self.file_state.get(file_path.name) == state:
+                    continue
+                df = pd.read_csv(file_path, encoding=get_file_encoding_type(file_path), dtype=str)
+                df = df[~df["match_id"].isin(self.ingested[family]) & df["player"].notna()]
+                if not df.empty:
+                    canonical = df["player"].map(normalize_name)
+                    df = df.assign(player_id=canonical.map(lambda n: generate_player_id(n) if n else None)).dropna(subset=["player_id"])
+                    new_sums.append(family_sums(df, family))
+                    new_players.append(pd.DataFrame({
+                        "player_id": df["player_id"], "name": df["player"], "gender": df["match_id"].str.split("-").str[1], "match_id": df["match_id"],
+                    }))
+                    self.ingested[family].update(df["match_id"].unique())
+                self.file_state[file_path.name] = state
+        if not new_sums:
+            return 0
+
+        self.sums = pd.concat([self.sums] + new_sums).groupby(level=0).sum()
+        seen = pd.concat(new_players).drop_duplicates(["player_id", "match_id"])
+        pairs = seen["player_id"] + "|" + seen["match_id"]
+        seen = seen[~pairs.isin(self.player_matches)]
+        self.player_matches.update(pairs)
+        added = seen.groupby("player_id").agg(name=("name", "last"), gender=("gender", "last"), matches=("match_id", "size"))
+        players = pd.concat([self.players, added])
+        self.players = players.groupby(level=0).agg(name=("name", "last"), gender=("gender", "last"), matches=("matches", "sum"))
+        self.rebuild_vectors()
+        return len(seen)
+
+    def rebuild_vectors(self, retrain_growth=2.0):
+        """
+        Recomputes the normalized vectors (population stats shift with every
+        refresh). The IVF centroids are only retrained once the population
+        has grown by retrain_growth since training; otherwise players are
+        just reassigned.
+        """
+        self.sums = self.sums.sort_index()
+        self.players = self.players.reindex(self.sums.index)
+        self.player_ids = self.sums.index.tolist()
+        self.position = {p: i for i, p in enumerate(self.player_ids)}
+        genders = self.players["gender"].to_numpy()
+        self.vectors = normalize_vectors(compute_features(self.sums, genders), genders)
+        self.cache_columns()
+        if self.ivf is None or len(self.vectors) >= retrain_growth * self.ivf.trained_size:
+            self.ivf = IVFIndex.train(self.vectors)
+        else:
+            self.ivf.assign(self.vectors)
+
+    def cache_columns(self):
+        self.genders = self.players["gender"].to_numpy()
+        self.matches = self.players["matches"].to_numpy()
+
+    def resolve(self, player):
+        """
+        Position of a player given by id or by name.
+        """
+        if player in self.position:
+            return self.position[player]
+        name = normalize_name(player)
+        player_id = generate_player_id(name) if name else None
+        if player_id not in self.position:
+            raise KeyError(f"Unknown player: {player}")
+        return self.position[player_id]
+
+    def similar(self, player, k=10, same_gender=True, approximate=False, nprobe=4, min_matches=1):
+        """
+        The k players whose style vectors are closest (cosine) to `player`,
+        by exact matrix-vector scoring or, with approximate set, over the
+        IVF candidates only.
+        """
+        i = self.resolve(player)
+        query = self.vectors[i]
+        candidates = self.ivf.candidates(query, nprobe) if approximate else np.arange(len(self.vectors))
+        keep = self.matches[candidates] >= min_matches
+        if same_gender:
+            keep &= self.genders[candidates] == self.genders[i]
+        candidates = candidates[keep & (candidates != i)]
+        scores = self.vectors[candidates] @ query
+        best = candidates[top_k(scores, k)] if len(candidates) else candidates
+        result = self.players.iloc[best].reset_index()
+        result["similarity"] = (self.vectors[best] @ query).round(4)
+        return result
+
+    def feature_frame(self):
+        return pd.DataFrame(self.vectors, index=self.player_ids, columns=FEATURE_NAMES)
+
+    def save(self, directory):
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        np.savez(
+            directory / "style_index.npz",
+            vectors=self.vectors, sums=self.sums.to_numpy(), sum_keys=np.array(self.sums.columns, dtype=str),
+            player_ids=np.array(self.player_ids, dtype=str), player_matches=np.array(sorted(self.player_matches), dtype=str),
+            **{f"ingested_{family}": np.array(sorted(ids), dtype=str) for family, ids in self.ingested.items()},
+            centroids=self.ivf.centroids, ivf_trained_size=np.int64(self.ivf.trained_size),
+        )
+        self.players.to_csv(directory / "style_players.csv")
+        (directory / "style_state.json").write_text(json.dumps({"version": INDEX_VERSION, "files": self.file_state}, indent=1))
+
+    @classmethod
+    def load(cls, directory):
+        directory = Path(directory)
+        state = json.loads((directory / "style_state.json").read_text())
+        if state["version"] != INDEX_VERSION:
+            raise ValueError(f"Style index version {state['version']} != {INDEX_VERSION}, rebuild it")
+        index = cls()
+        with np.load(directory / "style_index.npz") as data:
+            index.player_ids = data["player_ids"].tolist()
+            index.sums = pd.DataFrame(data["sums"], index=index.player_ids, columns=data["sum_keys"].tolist())
+            index.player_matches = set(data["player_matches"].tolist())
+            index.ingested = {family: set(data[f"ingested_{family}"].tolist()) for family in SUM_COLUMNS}
+            index.vectors = data["vectors"]
+            index.ivf = IVFIndex(data["centroids"])
+            index.ivf.trained_size = int(data["ivf_trained_size"])
+        index.players = pd.read_csv(directory / "style_players.csv", index_col="player_id", dtype={"gender": str}).reindex(index.player_ids)
+        index.position = {p: i for i, p in enumerate(index.player_ids)}
+        index.cache_columns()
+        index.ivf.assign(index.vectors)
+        index.file_state = state["files"]
+        return index
+
+def benchmark_search(index, n_synthetic=0, queries=200, k=10, nprobe=4, seed=0):
+    """
+    Exact vs IVF query latency and IVF recall@k on the index's vectors, or
+    on n_synthetic resampled-and-jittered copies of them to stand in for a
+    larger population.
+    """
+    rng = np.random.default_rng(seed)
+    vectors = index.vectors
+    if n_synthetic:
+        base = vectors[rng.integers(0, len(vectors), n_synthetic)]
+        noisy = base + rng.normal(0, 0.15, base.shape).astype(np.float32)
+        vectors = (noisy / np.linalg.norm(noisy, axis=1, keepdims=True)).astype(np.float32)
+    ivf = IVFIndex.train(vectors, seed=seed)
+    picks = rng.choice(len(vectors), size=min(queries, len(vectors)), replace=False)
+
+    start = time.perf_counter()
+    exact = [top_k(vectors @ vectors[i], k + 1, exclude=None)[1:] for i in picks]
+    exact_ms = (time.perf_counter() - start) / len(picks) * 1000
+
+    start = time.perf_counter()
+    approx = []
+    for i in picks:
+        candidates = ivf.candidates(vectors[i], nprobe)
+        approx.append(candidates[top_k(vectors[candidates] @ vectors[i], k + 1)][1:])
+    approx_ms = (time.perf_counter() - start) / len(picks) * 1000
+    recall = np.mean([len(set(a) & set(e)) / len(e) for a, e in zip(approx, exact)])
+    return {"players": len(vectors), "lists": len(ivf.centroids), "exact_ms": exact_ms, "approx_ms": approx_ms, "recall": recall}
+
+
+if __name__ == "__main__":
+    root = find_repo_root()
+    stats_directory = root / "data" / "raw" / "stats"
+    index_directory = root / "data" / "processed" / "style"
+
+    parser = argparse.ArgumentParser(description="Player style vectors from the stats families and similar-player search.")
+    parser.add_argument("players", nargs="*", help="Players (name or id) to find similar players for")
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--approximate", action="store_true", help="Search the IVF index instead of every player")
+    parser.add_argument("--all-genders", action="store_true", help="Don't restrict results to the player's gender")
+    parser.add_argument("--min-matches", type=int, default=3, help="Only return players with at least this many matches")
+    parser.add_argument("--rebuild", action="store_true", help="Ignore the saved index and ingest everything again")
+    parser.add_argument("--bench", type=int, default=None, metavar="N", help="Benchmark exact vs approximate search (N synthetic players, 0 = real)")
+    args = parser.parse_args()
+
+    print(f"[INFO] - Repository Root: {root}")
+    index = StyleIndex()
+    if not args.rebuild and (index_directory / "style_state.json").exists():
+        try:
+            index = StyleIndex.load(index_directory)
+        except ValueError as e:
+            print(f"[WARN] - {e}")
+    start = time.perf_counter()
+    ingested = index.refresh(stats_directory)
+    print(f"[INFO] - Ingested {ingested:,} new player-match rows in {time.perf_counter() - start:.2f}s "
+          f"({len(index.player_ids):,} players x {len(FEATURE_NAMES)} features, {len(set().union(*index.ingested.values())):,} matches)")
+    index.save(index_directory)
+    print(f"[INFO] - Index written to: {index_directory}")
+
+    for player in args.players:
+        try:
+            start = time.perf_counter()
+            result = index.similar(player, args.k, not args.all_genders, args.approximate, min_matches=args.min_matches)
+            query_ms = (time.perf_counter() - start) * 1000
+        except KeyError as e:
+            print(f"[WARN] - {e}")
+            continue
+        print(f"\n----------- SIMILAR TO {player.upper()} ({query_ms:.2f} ms) -------------")
+        print(result.to_string(index=False))
+
+    if args.bench is not None:
+        bench = benchmark_search(index, args.bench)
+        print("\n----------- SEARCH BENCHMARK -------------")
+        print(f"Players: {bench['players']:,} ({bench['lists']} IVF lists)")
+        print(f"Exact: {bench['exact_ms']:.3f} ms/query  Approximate: {bench['approx_ms']:.3f} ms/query  Recall@10: {bench['recall']:.2f}")
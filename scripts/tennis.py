@@ -0,0 +1,7 @@
+from tennis_research.cli import main
+
+# Single entry point for the data tools, e.g.:
+#   python scripts/tennis.py build --points
+#   python scripts/tennis.py preview data/raw/matches/matches.csv
+if __name__ == "__main__":
+    main()
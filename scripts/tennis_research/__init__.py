@@ -0,0 +1,8 @@
+"""
+Shared helpers for the scripts in this directory. Importing the package is
+cheap (standard library only); pandas and friends are only imported by the
+scripts and CLI commands that need them.
+"""
+from .files import csv_column_names, csv_dimensions, count_lines, format_size, get_file_encoding_type, list_data_files
+from .names import generate_player_id, normalize_name
+from .paths import data_directory, find_repo_root
@@ -0,0 +1,95 @@
+import argparse
+import importlib
+import os
+import sys
+from pathlib import Path
+
+from .files import count_lines, csv_column_names, csv_dimensions, format_size, list_data_files
+from .paths import REPO_ROOT_ENV, find_repo_root
+
+SCRIPTS_DIRECTORY = Path(__file__).resolve().parents[1]
+
+# Commands backed by a script: (module, function, help). The module, and
+# with it pandas / playwright, is only imported when its command runs.
+SCRIPT_COMMANDS = {
+    "build": ("build_canonical_dataset", "main", "Build the canonical players/matches (and optionally points) tables"),
+    "points": ("build_canonical_dataset", "points_main", "Rebuild only the canonical points files"),
+    "summary": ("data_summary", "main", "Load and summarize every raw data file"),
+    "watch": ("canonical_watch", "main", "Watch the raw data and rebuild the affected canonical outputs"),
+    "snapshots": ("canonical_snapshots", "main", "Snapshot, list, read and diff versions of the canonical tables"),
+}
+SCRAPERS = {"requests": "webpage_requests_summary", "badminton": "badminton_scraper"}
+
+# ---------------------------
+# QUICK COMMANDS
+# ---------------------------
+def preview(args):
+    for file_path in args.files:
+        if args.fast:
+            rows, cols = count_lines(file_path), len(csv_column_names(file_path))
+        else:
+            rows, cols = csv_dimensions(file_path)
+        print(f"{file_path}: {rows:,} rows x {cols} columns ({format_size(Path(file_path).stat().st_size)})")
+        if args.columns:
+            print(f"  Columns: {csv_column_names(file_path)}")
+
+def files(args):
+    directory = Path(args.directory) if args.directory else find_repo_root() / "data"
+    found = list_data_files(directory)
+    for file_path in found:
+        print(f"{format_size(file_path.stat().st_size):>10}  {file_path.relative_to(directory)}")
+    print(f"[INFO] - {len(found)} data files in {directory}")
+
+def root(args):
+    print(find_repo_root())
+
+# ---------------------------
+# SCRIPT COMMANDS
+# ---------------------------
+def run_script(command, argv):
+    module_name, function_name, _ = SCRIPT_COMMANDS[command]
+    module = importlib.import_module(module_name)
+    return getattr(module, function_name)(argv)
+
+def scrape(args):
+    import asyncio
+    module = importlib.import_module(SCRAPERS[args.target])
+    asyncio.run(module.main())
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="tennis", description="Lewis University tennis research data tools.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    for command, (_, _, help_text) in SCRIPT_COMMANDS.items():
+        sub = commands.add_parser(command, help=help_text, add_help=False)
+        sub.add_argument("args", nargs=argparse.REMAINDER, help="Passed through to the script (try --help)")
+
+    sub = commands.add_parser("preview", help="Row/column counts of CSV files without loading them")
+    sub.add_argument("files", nargs="+")
+    sub.add_argument("--fast", action="store_true", help="Count raw lines instead of parsing CSV records")
+    sub.add_argument("--columns", action="store_true", help="Also print the header")
+    sub.set_defaults(func=preview)
+
+    sub = commands.add_parser("files", help="List data files with their sizes")
+    sub.add_argument("directory", nargs="?", default=None, help="Directory to list (default: data/)")
+    sub.set_defaults(func=files)
+
+    sub = commands.add_parser("scrape", help="Run one of the browser scrapers")
+    sub.add_argument("target", choices=sorted(SCRAPERS))
+    sub.set_defaults(func=scrape)
+
+    sub = commands.add_parser("root", help="Print the repository root")
+    sub.set_defaults(func=root)
+    return parser
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else list(argv)
+    os.environ.setdefault(REPO_ROOT_ENV, str(find_repo_root()))
+    if str(SCRIPTS_DIRECTORY) not in sys.path:
+        sys.path.insert(0, str(SCRIPTS_DIRECTORY))
+    # Script commands hand everything after the name (including --help) to
+    # the script's own parser
+    if argv and argv[0] in SCRIPT_COMMANDS:
+        return run_script(argv[0], argv[1:])
+    args = build_parser().parse_args(argv)
+    return args.func(args)
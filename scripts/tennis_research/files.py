@@ -0,0 +1,87 @@
+import csv
+import re
+from pathlib import Path
+
+# Standard library only: these helpers back the quick CLI commands, which
+# must not pay for a pandas import.
+DATA_FILE_PATTERN = re.compile(r"\.(xls|xlsx|csv|json)$", re.IGNORECASE)
+
+def get_file_encoding_type(file_path):
+    """
+    Tries common text encodings and returns the first one that successfully
+    reads the CSV header.
+    """
+    file_path = Path(file_path).resolve()
+    encodings = ["utf-8", "cp1252", "latin-1"]
+
+    for enc in encodings:
+        try:
+            with open(file_path, newline="", encoding=enc) as f:
+                reader = csv.reader(f)
+                next(reader)  # Try reading header
+            return enc
+        except UnicodeDecodeError:
+            continue
+
+    raise UnicodeDecodeError(
+        "utf-8",
+        b"",
+        0,
+        1,
+        f"Could not determine encoding for file: {file_path}"
+    )
+
+def csv_dimensions(file_path):
+    """
+    Returns (num_rows, num_columns) of a CSV file without fully loading it.
+    Rows include the header and quoted newlines are handled.
+    """
+    file_path = Path(file_path)
+    if not file_path.exists():
+        raise FileNotFoundError(f"CSV file does not exist: {file_path}")
+
+    num_rows = 0
+    num_columns = 0
+    with open(file_path, newline="", encoding=get_file_encoding_type(file_path)) as f:
+        reader = csv.reader(f)
+        for i, row in enumerate(reader):
+            if i == 0:
+                num_columns = len(row)
+            num_rows += 1
+    return num_rows, num_columns
+
+def count_lines(file_path, block_size=1 << 20):
+    """
+    Newline count by reading raw blocks; several times faster than
+    csv_dimensions but counts quoted newlines as rows.
+    """
+    lines = 0
+    last = b"\n"
+    with open(file_path, "rb") as f:
+        while block := f.read(block_size):
+            lines += block.count(b"\n")
+            last = block[-1:]
+    return lines + (last != b"\n")
+
+def csv_column_names(file_path):
+    file_path = Path(file_path)
+    if not file_path.exists():
+        raise FileNotFoundError(f"CSV file does not exist: {file_path}")
+
+    with open(file_path, newline="", encoding=get_file_encoding_type(file_path)) as f:
+        reader = csv.reader(f)
+        columns = next(reader)  # first row is the header
+    return columns
+
+def list_data_files(directory, pattern=DATA_FILE_PATTERN):
+    """
+    Data files (csv/json/xls/xlsx) under a directory, sorted.
+    """
+    return sorted(f for f in Path(directory).rglob("*") if f.is_file() and pattern.search(f.name))
+
+def format_size(size_bytes):
+    for unit in ["B", "KB", "MB", "GB", "TB"]:
+        if size_bytes < 1024:
+            break
+        size_bytes /= 1024
+    return f"{size_bytes:.2f} {unit}"
@@ -0,0 +1,25 @@
+import hashlib
+import re
+import unicodedata
+
+# Standard library only, like the rest of the package. Missing values
+# arrive as None, float NaN or the pandas NA/NaT scalars.
+MISSING_VALUES = {"nan", "<NA>", "NaT"}
+
+def normalize_name(name: str) -> str:
+    if name is None or (not isinstance(name, str) and str(name) in MISSING_VALUES):
+        return None
+    name = str(name).strip()
+    # Remove accents
+    name = unicodedata.normalize("NFKD", name)
+    name = "".join(c for c in name if not unicodedata.combining(c))
+    name = name.lower()
+    # Remove punctuation except spaces
+    name = re.sub(r"[^a-z\s]", " ", name)
+    # Collapse whitespace
+    name = re.sub(r"\s+", " ", name).strip()
+    return name
+
+def generate_player_id(canonical_name: str) -> str:
+    h = hashlib.sha1(canonical_name.encode("utf-8")).hexdigest()
+    return f"p_{h[:8]}"
@@ -0,0 +1,26 @@
+import os
+from functools import lru_cache
+from pathlib import Path
+
+# Set by the CLI (and inherited by anything it spawns) so the walk up the
+# tree happens once per session rather than once per script
+REPO_ROOT_ENV = "TENNIS_REPO_ROOT"
+
+@lru_cache(maxsize=None)
+def _walk_to_repo_root(start):
+    for parent in [start] + list(start.parents):
+        if (parent / ".git").exists():
+            return parent
+    raise RuntimeError("Not inside a Git repository")
+
+def find_repo_root(start_path=None):
+    """
+    Walk upward until a .git directory is found.
+    Returns the repo root as a Path; repeated calls are cached.
+    """
+    if start_path is None and os.environ.get(REPO_ROOT_ENV):
+        return Path(os.environ[REPO_ROOT_ENV])
+    return _walk_to_repo_root(Path(start_path or __file__).resolve())
+
+def data_directory(*parts):
+    return find_repo_root().joinpath("data", *parts)
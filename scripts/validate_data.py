@@ -0,0 +1,291 @@
+import argparse
+import json
+import time
+
+import numpy as np
+import pandas as pd
+
+from tennis_research import find_repo_root, get_file_encoding_type
+
+# Serve digit (README 1-6, MCP 0/4/5/6) after any lets, then only characters
+# the shot grammar uses: shot letters, directions/depths, error types,
+# modifiers and point endings.
+SERVE_CODE_PATTERN = r"c*[0-6][0-9fbrsvzopuylmhijktqnwdxgeCV+\-=;^*#@!]*"
+GAME_SCORE_VALUES = {"0": 0, "15": 1, "30": 2, "40": 3, "AD": 4, "A": 4}
+
+# ---------------------------
+# RULES
+# ---------------------------
+# Every rule is data: the table it applies to, a check kind from CHECKS and
+# that check's arguments. Adding a rule never needs new code unless it
+# needs a new kind of check.
+RULES = [
+    {"table": "matches", "name": "missing_match_id", "kind": "not_null", "columns": ["match_id"]},
+    {"table": "matches", "name": "duplicate_match_id", "kind": "unique", "columns": ["match_id"]},
+    {"table": "matches", "name": "missing_player", "kind": "not_null", "columns": ["Player 1", "Player 2"]},
+    {"table": "matches", "name": "allowed_surface", "kind": "allowed", "column": "Surface", "values": ["Hard", "Clay", "Grass", "Carpet"]},
+    {"table": "matches", "name": "allowed_best_of", "kind": "allowed", "column": "Best of", "values": ["3", "5"]},
+    {"table": "matches", "name": "date_format", "kind": "pattern", "column": "Date", "pattern": r"\d{8}"},
+    {"table": "matches", "name": "allowed_hand", "kind": "allowed", "column": "Pl 1 hand", "values": ["R", "L"], "allow_null": True},
+
+    {"table": "players", "name": "player_id_format", "kind": "pattern", "column": "player_id", "pattern": r"p_[0-9a-f]{8}"},
+    {"table": "players", "name": "duplicate_player_id", "kind": "unique", "columns": ["player_id"]},
+    {"table": "players", "name": "allowed_gender", "kind": "allowed", "column": "gender", "values": ["M", "W"]},
+    {"table": "players", "name": "seen_order", "kind": "ordered", "columns": ["first_seen", "last_seen"]},
+
+    {"table": "points", "name": "allowed_pt_winner", "kind": "allowed", "column": "PtWinner", "values": ["1", "2"]},
+    {"table": "points", "name": "allowed_server", "kind": "allowed", "column": "Svr", "values": ["1", "2"]},
+    {"table": "points", "name": "first_serve_code", "kind": "pattern", "column": "1st", "pattern": SERVE_CODE_PATTERN},
+    {"table": "points", "name": "second_serve_code", "kind": "pattern", "column": "2nd", "pattern": SERVE_CODE_PATTERN, "allow_null": True},
+    {"table": "points", "name": "duplicate_point", "kind": "unique", "columns": ["match_id", "Pt"]},
+    {"table": "points", "name": "score_monotonic", "kind": "score_monotonic", "order": "Pt", "score": "Pts",
+     "game": ["match_id", "Set1", "Set2", "Gm1", "Gm2"]},
+    {"table": "points", "name": "orphaned_point", "kind": "references", "column": "match_id", "target": "match_ids"},
+
+    {"table": "slam_points", "name": "allowed_point_winner", "kind": "allowed", "column": "PointWinner", "values": ["1", "2"]},
+    {"table": "slam_points", "name": "allowed_server", "kind": "allowed", "column": "PointServer", "values": ["1", "2", "3", "4"]},
+    {"table": "slam_points", "name": "duplicate_point", "kind": "unique", "columns": ["match_id", "PointNumber"]},
+    {"table": "slam_points", "name": "score_monotonic", "kind": "score_monotonic", "order": "PointNumber",
+     "score": ["P1Score", "P2Score"], "game": ["match_id", "SetNo", "GameNo"], "post_point": True},
+
+    {"table": "stats", "name": "missing_player", "kind": "not_null", "columns": ["player"]},
+    {"table": "stats", "name": "orphaned_stats_row", "kind": "references", "column": "match_id", "target": "match_ids"},
+]
+
+# ---------------------------
+# CHECKS
+# ---------------------------
+# Each check returns a boolean array marking the violating rows.
+def check_not_null(df, rule, context):
+    return df[rule["columns"]].isna().any(axis=1).to_numpy()
+
+def check_unique(df, rule, context):
+    return df.duplicated(rule["columns"], keep="first").to_numpy()
+
+def check_allowed(df, rule, context):
+    column = df[rule["column"]]
+    bad = ~column.isin(rule["values"])
+    if rule.get("allow_null"):
+        bad &= column.notna()
+    return bad.to_numpy()
+
+def check_pattern(df, rule, context):
+    column = df[rule["column"]]
+    bad = ~column.str.fullmatch(rule["pattern"]).fillna(False).astype(bool)
+    if rule.get("allow_null"):
+        bad &= column.notna()
+    return bad.to_numpy()
+
+def check_ordered(df, rule, context):
+    first, last = (pd.to_numeric(df[c], errors="coerce") for c in rule["columns"])
+    return (first > last).to_numpy()
+
+def check_references(df, rule, context):
+    # context targets are unique pd.Index objects; a hash lookup beats isin
+    return context[rule["target"]].get_indexer(df[rule["column"]]) < 0
+
+def score_progress(score):
+    """
+    Points played in the game implied by one side's score string: game
+    scores map 0/15/30/40/AD to 0-4, tiebreak scores are used as-is.
+    """
+    values = score.map(GAME_SCORE_VALUES)
+    return values.fillna(pd.to_numeric(score, errors="coerce")).to_numpy()
+
+def check_score_monotonic(df, rule, context):
+    """
+    Within a game (rows ordered by `order`) the points-played total must
+    go up every point; the only allowed step back is advantage returning to
+    deuce. With `post_point` scores (slam files) the last point of a game
+    may already show the next game's 0-0.
+    """
+    if isinstance(rule["score"], str):
+        sides = df[rule["score"]].fillna("").str.split("-", n=1, expand=True).reindex(columns=[0, 1])
+        total = score_progress(sides[0]) + score_progress(sides[1])
+        has_ad = (sides[0].isin(["AD", "A"]) | sides[1].isin(["AD", "A"])).to_numpy()
+    else:
+        total = score_progress(df[rule["score"][0]]) + score_progress(df[rule["score"][1]])
+        has_ad = df[rule["score"]].isin(["AD", "A"]).any(axis=1).to_numpy()
+
+    game_id = df.groupby(rule["game"], sort=False, dropna=False).ngroup().to_numpy()
+    order = pd.to_numeric(df[rule["order"]], errors="coerce").to_numpy()
+    sort = np.lexsort([order, game_id])
+    game_id, total, has_ad = game_id[sort], total[sort], has_ad[sort]
+
+    same_game = np.r_[False, game_id[1:] == game_id[:-1]]
+    step = np.r_[np.nan, np.diff(total)]
+    back_to_deuce = (step == -1) & np.r_[False, has_ad[:-1]]
+    bad_sorted = same_game & (step <= 0) & ~back_to_deuce
+    if rule.get("post_point"):
+        last_in_game = np.r_[game_id[1:] != game_id[:-1], True]
+        bad_sorted &= ~(last_in_game & (total == 0))
+
+    bad = np.zeros(len(df), dtype=bool)
+    bad[sort] = bad_sorted
+    return bad
+
+CHECKS = {
+    "not_null": check_not_null,
+    "unique": check_unique,
+    "allowed": check_allowed,
+    "pattern": check_pattern,
+    "ordered": check_ordered,
+    "references": check_references,
+    "score_monotonic": check_score_monotonic,
+}
+
+# ---------------------------
+# ENGINE
+# ---------------------------
+def validate_table(df, table, context):
+    """
+    Runs every rule for `table` over the loaded frame in one pass and
+    returns (violations, names, counts): violations is an (n_rows, n_rules)
+    bool matrix whose columns follow names; counts holds every rule's
+    violation count.
+    A rule whose columns are missing from this file is reported as skipped.
+    """
+    rules = [r for r in RULES if r["table"] == table]
+    columns, counts = [], {}
+    for rule in rules:
+        needed = rule.get("columns", []) + [rule[k] for k in ("column", "order") if k in rule]
+        needed += rule.get("game", [])
+        needed += [rule["score"]] if isinstance(rule.get("score"), str) else rule.get("score", [])
+        if rule["kind"] == "references" and rule["target"] not in context:
+            counts[rule["name"]] = "skipped"
+            continue
+        if any(c not in df for c in needed):
+            counts[rule["name"]] = "skipped"
+            continue
+        bad = CHECKS[rule["kind"]](df, rule, context)
+        columns.append((rule["name"], bad))
+        counts[rule["name"]] = int(bad.sum())
+    violations = np.column_stack([b for _, b in columns]) if columns else np.zeros((len(df), 0), dtype=bool)
+    return violations, [name for name, _ in columns], counts
+
+def read_source_file(file_path):
+    """
+    Loads one file as strings and returns (df, bad_lines). Lines with more
+    fields than the header are collected rather than dropped: the C parser
+    reads the file when it is clean and the python parser, which hands
+    every bad line to a callable, only when it is not.
+    """
+    encoding = get_file_encoding_type(file_path)
+    try:
+        return pd.read_csv(file_path, encoding=encoding, dtype=str, on_bad_lines="error"), []
+    except pd.errors.ParserError:
+        bad_lines = []
+        df = pd.read_csv(file_path, encoding=encoding, dtype=str, engine="python", on_bad_lines=lambda fields: bad_lines.append(fields))
+        return df, bad_lines
+
+def malformed_rows(df, bad_lines):
+    """
+    Quarantine rows for lines the parser couldn't fit to the header: the
+    raw fields joined in `_raw_line`, the column count in `_violations`.
+    """
+    if not bad_lines:
+        return df.iloc[:0].assign(_violations=pd.Series(dtype=str), _raw_line=pd.Series(dtype=str))
+    return pd.DataFrame({
+        **{c: pd.Series(np.nan, index=range(len(bad_lines)), dtype=object) for c in df.columns},
+        "_violations": [f"malformed_line: {len(fields)} fields, expected {len(df.columns)}" for fields in bad_lines],
+        "_raw_line": [",".join(fields) for fields in bad_lines],
+    })
+
+def quarantine_rows(df, violations, names):
+    """
+    Rows that broke at least one rule, with the broken rule names joined in
+    a `_violations` column.
+    """
+    bad = violations.any(axis=1)
+    if not bad.any():
+        return df.iloc[:0].assign(_violations=pd.Series(dtype=str))
+    labels = np.array(names, dtype=object)
+    reasons = [";".join(labels[row]) for row in violations[bad]]
+    return df[bad].assign(_violations=reasons)
+
+def validate_files(table, files, context, quarantine_directory):
+    """
+    Loads each file of a table once (as strings), validates it and writes
+    its quarantined rows, malformed lines included. Returns the per-file
+    summary entries.
+    """
+    summary = []
+    for file_path in files:
+        start = time.perf_counter()
+        df, bad_lines = read_source_file(file_path)
+        load_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        violations, names, counts = validate_table(df, table, context)
+        validate_s = time.perf_counter() - start
+        counts["malformed_line"] = len(bad_lines)
+
+        quarantined = pd.concat([quarantine_rows(df, violations, names), malformed_rows(df, bad_lines)], ignore_index=True)
+        if len(quarantined):
+            quarantine_directory.mkdir(parents=True, exist_ok=True)
+            quarantined.to_csv(quarantine_directory / f"{table}-{file_path.name}", index=False)
+        rows = len(df) + len(bad_lines)
+        summary.append({
+            "table": table, "file": file_path.name, "rows": rows, "quarantined": len(quarantined),
+            "load_s": round(load_s, 3), "validate_s": round(validate_s, 3), "rules": counts,
+        })
+        print(f"[INFO] - {table:<11} {file_path.name:<40} {rows:>9,} rows  {len(quarantined):>7,} quarantined  "
+              f"(load {load_s:.2f}s, validate {validate_s:.2f}s)")
+        if bad_lines:
+            print(f"[WARN] - {file_path.name}: {len(bad_lines):,} malformed lines quarantined")
+    return summary
+
+
+if __name__ == "__main__":
+    root = find_repo_root()
+    data_directory = root / "data"
+    output_directory = data_directory / "processed" / "validation"
+
+    parser = argparse.ArgumentParser(description="Run the declarative data-quality rules and quarantine failing rows.")
+    parser.add_argument("--tables", nargs="+", default=["matches", "players", "points", "slam_points", "stats"])
+    args = parser.parse_args()
+
+    matches_file = data_directory / "raw" / "matches" / "matches.csv"
+    table_files = {
+        "matches": [matches_file],
+        "players": [data_directory / "canonical" / "players" / "players.csv"],
+        "points": sorted((data_directory / "raw" / "points").glob("charting-*-points*.csv")),
+        "slam_points": sorted((data_directory / "old_data" / "points").glob("*-points*.csv")),
+        "stats": sorted((data_directory / "raw" / "stats").glob("*.csv")),
+    }
+    context = {}
+    if matches_file.exists():
+        context["match_ids"] = pd.Index(pd.read_csv(matches_file, usecols=["match_id"], dtype=str)["match_id"].dropna().unique())
+
+    print(f"[INFO] - Repository Root: {root}")
+    quarantine_directory = output_directory / "quarantine"
+    if quarantine_directory.exists():
+        for old in quarantine_directory.glob("*.csv"):
+            old.unlink()
+
+    summary = []
+    for table in args.tables:
+        files = [f for f in table_files[table] if f.exists()]
+        if not files:
+            print(f"[WARN] - No files found for table: {table}")
+            continue
+        summary.extend(validate_files(table, files, context, quarantine_directory))
+
+    output_directory.mkdir(parents=True, exist_ok=True)
+    summary_path = output_directory / "validation_summary.json"
+    summary_path.write_text(json.dumps(summary, indent=1))
+
+    print("\n----------- SUMMARY -------------")
+    totals = {}
+    for entry in summary:
+        for rule, count in entry["rules"].items():
+            if count != "skipped":
+                totals[(entry["table"], rule)] = totals.get((entry["table"], rule), 0) + count
+    for (table, rule), count in totals.items():
+        print(f"{table:<11} {rule:<22} {count:>9,}")
+    load_s = sum(e["load_s"] for e in summary)
+    validate_s = sum(e["validate_s"] for e in summary)
+    print(f"Rows quarantined: {sum(e['quarantined'] for e in summary):,} of {sum(e['rows'] for e in summary):,}")
+    print(f"Load: {load_s:.2f}s  Validate: {validate_s:.2f}s ({validate_s / max(load_s, 1e-9):.0%} of load)")
+    print(f"Summary written to: {summary_path}")
+    print(f"Quarantine written to: {quarantine_directory}")
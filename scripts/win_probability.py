@@ -0,0 +1,758 @@
+import argparse
+import re
+import sys
+import time
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from match_simulator import (
+    game_win_probability,
+    get_set_rule,
+    load_player_point_probabilities,
+    parse_best_of,
+)
+from tennis_research import find_repo_root, normalize_name, generate_player_id
+
+# Serve point-win probabilities are quantized onto this grid; every (pa, pb)
+# cell gets its own score-state tables.
+GRID_MIN = 0.40
+GRID_MAX = 0.85
+GRID_STEP = 0.01
+GRID = np.round(np.arange(GRID_MIN, GRID_MAX + GRID_STEP / 2, GRID_STEP), 4)
+
+GAME_SCORE_MAP = {"0": 0, "15": 1, "30": 2, "40": 3, "AD": 4, "A": 4}
+
+# ---------------------------
+# SCORE STATE TABLES
+# ---------------------------
+def grid_index(p):
+    """
+    Nearest grid index for serve point-win probabilities (scalar or array).
+    """
+    return np.clip(np.rint((np.asarray(p, dtype=float) - GRID_MIN) / GRID_STEP), 0, len(GRID) - 1).astype(np.intp)
+
+def hold_probability(p, no_ad=False):
+    """
+    P(server holds) for serve point-win probability p. With no-ad scoring
+    the point at 40-40 decides the game.
+    """
+    if not no_ad:
+        return game_win_probability(p)
+    p = np.asarray(p, dtype=float)
+    q = 1 - p
+    return p ** 4 * (1 + 4 * q + 10 * q ** 2) + 20 * p ** 4 * q ** 3
+
+def build_game_table(p, no_ad=False):
+    """
+    H[k, i, j] = P(server holds) from i server points vs j receiver points,
+    for every probability p[k]. Scores are capped at deuce: (3,3) is deuce,
+    (4,3) is advantage server and (3,4) advantage receiver. With no_ad,
+    deuce is a single deciding point and the advantage states never occur.
+    """
+    p = np.asarray(p, dtype=float)
+    q = 1 - p
+    H = np.zeros((len(p), 5, 5))
+    deuce = p if no_ad else p ** 2 / (1 - 2 * p * q)
+    H[:, 3, 3] = deuce
+    H[:, 4, 3] = 1.0 if no_ad else p + q * deuce
+    H[:, 3, 4] = 0.0 if no_ad else p * deuce
+    H[:, 4, :3] = 1.0
+    for i in range(3, -1, -1):
+        for j in range(3, -1, -1):
+            if i == j == 3:
+                continue
+            H[:, i, j] = p * H[:, i + 1, j] + q * H[:, i, j + 1]
+    return H
+
+def build_tiebreak_table(pa, pb, target):
+    """
+    T[c, i, j, s] = P(A wins the tiebreak) from i-j with server s (0 = A, 1 = B)
+    about to serve. Scores past (target-1, target-1) are folded back onto
+    (target-1 + lead, target-1) since only the lead matters there.
+    """
+    pa = np.asarray(pa, dtype=float)
+    pb = np.asarray(pb, dtype=float)
+    a_point = np.stack([pa, 1 - pb])  # P(A wins the point) when s serves
+    t = target
+    T = np.zeros((len(pa), t + 1, t + 1, 2))
+    both = pa * (1 - pb)
+    tie = both / (both + (1 - pa) * pb)
+    for s in (0, 1):
+        T[:, t - 1, t - 1, s] = tie
+        T[:, t, t - 1, s] = a_point[s] + (1 - a_point[s]) * tie
+        T[:, t - 1, t, s] = a_point[s] * tie
+        T[:, t, :t - 1, s] = 1.0
+    for total in range(2 * t - 3, -1, -1):
+        for i in range(max(0, total - (t - 1)), min(total, t - 1) + 1):
+            j = total - i
+            if i == j == t - 1:
+                continue
+            for s in (0, 1):
+                # Servers switch after the first point and then every two points
+                nxt = 1 - s if total % 2 == 0 else s
+                T[:, i, j, s] = a_point[s] * T[:, i + 1, j, nxt] + (1 - a_point[s]) * T[:, i, j + 1, nxt]
+    return T
+
+def build_match_tables(best_of=3, final_tb="1", no_ad=False):
+    """
+    Precomputes every score-state table for one match format over the full
+    (pa, pb) grid. All cells are solved at once with array arithmetic.
+    no_ad selects deciding-point games (mixed doubles at most slams).
+
+    Per cell c the tables hold P(player 1 wins the match):
+      M[c, sa, sb, s]          at the start of a set with server s
+      VA/VB[c, sa, sb, ga, gb, s] once player 1 / player 2 wins the current game
+      TA/TB[c, sa, sb, f]      once player 1 / player 2 wins the current tiebreak
+                               whose first server was f
+    """
+    best_of = parse_best_of(best_of)
+    need = best_of // 2 + 1
+    regular = get_set_rule(final_tb, False)
+    final = get_set_rule(final_tb, True)
+    final_cap = final["tb_at"] if final["tb_at"] is not None else 6
+    gm = max(7, final_cap + 1)
+
+    ia, ib = np.meshgrid(np.arange(len(GRID)), np.arange(len(GRID)), indexing="ij")
+    pa, pb = GRID[ia.ravel()], GRID[ib.ravel()]
+    C = pa.size
+    hold = np.stack([hold_probability(pa, no_ad), 1 - hold_probability(pb, no_ad)])  # P(A wins game) when s serves
+    targets = sorted({regular["tb_target"], final["tb_target"]})
+    tiebreaks = {t: build_tiebreak_table(pa, pb, t) for t in targets}
+
+    M = np.zeros((C, need + 1, need + 1, 2))
+    M[:, need, :, :] = 1.0
+    VA = np.zeros((C, need, need, gm, gm, 2))
+    VB = np.zeros_like(VA)
+    TA = np.zeros((C, need, need, 2))
+    TB = np.zeros_like(TA)
+
+    for total_sets in range(2 * need - 2, -1, -1):
+        for sa in range(max(0, total_sets - (need - 1)), min(total_sets, need - 1) + 1):
+            sb = total_sets - sa
+            rule = final if sa == sb == need - 1 else regular
+            tb = tiebreaks[rule["tb_target"]]
+
+            def after_set(a_won, next_server):
+                return M[:, sa + 1, sb, next_server] if a_won else M[:, sa, sb + 1, next_server]
+
+            # The player who received first in a tiebreak serves first in the next set
+            for f in (0, 1):
+                TA[:, sa, sb, f] = after_set(True, 1 - f)
+                TB[:, sa, sb, f] = after_set(False, 1 - f)
+
+            def tiebreak_start(f):
+                t0 = tb[:, 0, 0, f]
+                return t0 * TA[:, sa, sb, f] + (1 - t0) * TB[:, sa, sb, f]
+
+            if rule["match_tb"]:
+                for s in (0, 1):
+                    M[:, sa, sb, s] = tiebreak_start(s)
+                continue
+
+            start = np.zeros((C, gm, gm, 2))
+            tb_at = rule["tb_at"]
+            if tb_at is None:
+                # Advantage set: fold every tie from 5-5 onward onto 5-5
+                for s in (0, 1):
+                    h, h2 = hold[s], hold[1 - s]
+                    wa, wb = after_set(True, s), after_set(False, s)
+                    x = (h * h2 * wa + (1 - h) * (1 - h2) * wb) / (1 - h * (1 - h2) - (1 - h) * h2)
+                    start[:, 5, 5, s] = x
+                    VA[:, sa, sb, 5, 5, s] = h2 * wa + (1 - h2) * x
+                    VB[:, sa, sb, 5, 5, s] = h2 * x + (1 - h2) * wb
+                    VA[:, sa, sb, 6, 5, 1 - s] = wa
+                    VB[:, sa, sb, 6, 5, 1 - s] = x
+                    VA[:, sa, sb, 5, 6, 1 - s] = x
+                    VB[:, sa, sb, 5, 6, 1 - s] = wb
+                    start[:, 6, 5, 1 - s] = h2 * wa + (1 - h2) * x
+                    start[:, 5, 6, 1 - s] = h2 * x + (1 - h2) * wb
+                cap = 5
+            else:
+                cap = tb_at
+
+            for total in range(2 * cap - 1, -1, -1):
+                for ga in range(max(0, total - cap), min(total, cap) + 1):
+                    gb = total - ga
+                    if tb_at is None and ga == gb == 5:
+                        continue
+                    if max(ga, gb) >= 6 and abs(ga - gb) >= 2:
+                        continue
+                    for s in (0, 1):
+                        nxt = 1 - s
+                        values = []
+                        for a_won, (na, nb) in ((True, (ga + 1, gb)), (False, (ga, gb + 1))):
+                            if max(na, nb) >= 6 and abs(na - nb) >= 2:
+                                values.append(after_set(a_won, nxt))
+                            elif tb_at is not None and na == nb == tb_at:
+                                values.append(tiebreak_start(nxt))
+                            else:
+                                values.append(start[:, na, nb, nxt])
+                        VA[:, sa, sb, ga, gb, s], VB[:, sa, sb, ga, gb, s] = values
+                        start[:, ga, gb, s] = hold[s] * values[0] + (1 - hold[s]) * values[1]
+            M[:, sa, sb, :] = start[:, 0, 0, :]
+
+    tables = {
+        "best_of": np.int64(best_of),
+        "final_tb": np.array(str(final_tb)),
+        "no_ad": np.bool_(no_ad),
+        "H": build_game_table(GRID, no_ad).astype(np.float32),
+        "M": M.astype(np.float32),
+        "VA": VA.astype(np.float32),
+        "VB": VB.astype(np.float32),
+        "TA": TA.astype(np.float32),
+        "TB": TB.astype(np.float32),
+    }
+    for t, table in tiebreaks.items():
+        tables[f"T{t}"] = table.astype(np.float32)
+    return tables
+
+@lru_cache(maxsize=None)
+def load_match_tables(best_of=3, final_tb="1", cache_directory=None, no_ad=False):
+    """
+    Returns the score-state tables for a format, reading them from the .npz
+    cache when present and building (then caching) them otherwise.
+    """
+    best_of = parse_best_of(best_of)
+    code = str(final_tb).strip().upper() or "1"
+    if cache_directory is None:
+        return build_match_tables(best_of, code, no_ad)
+
+    cache_directory = Path(cache_directory)
+    scoring = "-noad" if no_ad else ""
+    cache_path = cache_directory / f"win_prob_tables-bo{best_of}-{code}{scoring}-{GRID_MIN:.2f}-{GRID_MAX:.2f}-{GRID_STEP:.3f}.npz"
+    if cache_path.exists():
+        with np.load(cache_path) as data:
+            return {k: data[k] for k in data.files}
+
+    tables = build_match_tables(best_of, code, no_ad)
+    cache_directory.mkdir(parents=True, exist_ok=True)
+    np.savez(cache_path, **tables)
+    return tables
+
+def lookup_win_probability(tables, cell, sa, sb, ga, gb, pts_1, pts_2, server, in_tb):
+    """
+    P(player 1 wins the match) for arrays (or scalars) of score states taken
+    between points: set and game score, point score in the current game or
+    tiebreak, who serves next (0 = player 1) and whether a tiebreak is on.
+    Every state is answered with a handful of table lookups.
+    """
+    best_of = int(tables["best_of"])
+    need = best_of // 2 + 1
+    final = get_set_rule(str(tables["final_tb"]), True)
+    n_grid = len(GRID)
+
+    cell, sa, sb, ga, gb, pts_1, pts_2, server = (np.asarray(x, dtype=np.intp) for x in (cell, sa, sb, ga, gb, pts_1, pts_2, server))
+    in_tb = np.asarray(in_tb, dtype=bool)
+    sa_c, sb_c = np.minimum(sa, need - 1), np.minimum(sb, need - 1)
+    is_final = (sa_c == need - 1) & (sb_c == need - 1)
+
+    # Regular game: fold long deuce games and long advantage sets
+    srv_pts = np.where(server == 0, pts_1, pts_2)
+    ret_pts = np.where(server == 0, pts_2, pts_1)
+    deuce = np.minimum(srv_pts, ret_pts) >= 3
+    i = np.where(deuce, 3 + (srv_pts > ret_pts), np.minimum(srv_pts, 4))
+    j = np.where(deuce, 3 + (ret_pts > srv_pts), np.minimum(ret_pts, 4))
+    p_index = np.where(server == 0, cell // n_grid, cell % n_grid)
+    hold = tables["H"][p_index, i, j]
+    g = np.where(server == 0, hold, 1 - hold)
+
+    gm = tables["VA"].shape[3] - 1
+    long_set = np.minimum(ga, gb) >= 5
+    ga_c = np.where(long_set & (gm == 6), 5 + (ga > gb), np.minimum(ga, gm))
+    gb_c = np.where(long_set & (gm == 6), 5 + (gb > ga), np.minimum(gb, gm))
+    game_prob = g * tables["VA"][cell, sa_c, sb_c, ga_c, gb_c, server] + (1 - g) * tables["VB"][cell, sa_c, sb_c, ga_c, gb_c, server]
+
+    # Tiebreak: pick the table for this set's target and recover the first server
+    target = np.where(is_final, final["tb_target"], 7)
+    played = pts_1 + pts_2
+    first = server ^ (((played + 1) // 2) % 2)
+    tb_prob = np.zeros(np.broadcast(cell, pts_1).shape)
+    for t in np.unique(target):
+        T = tables[f"T{t}"]
+        tie = np.minimum(pts_1, pts_2) >= t - 1
+        ti = np.where(tie, t - 1 + (pts_1 > pts_2), np.minimum(pts_1, t))
+        tj = np.where(tie, t - 1 + (pts_2 > pts_1), np.minimum(pts_2, t))
+        w = T[cell, ti, tj, server]
+        value = w * tables["TA"][cell, sa_c, sb_c, first] + (1 - w) * tables["TB"][cell, sa_c, sb_c, first]
+        tb_prob = np.where(target == t, value, tb_prob)
+
+    prob = np.where(in_tb, tb_prob, game_prob)
+    prob = np.where(sa >= need, 1.0, np.where(sb >= need, 0.0, prob))
+    return prob
+
+# ---------------------------
+# STREAMING MODE
+# ---------------------------
+class LiveWinProbability:
+    """
+    Tracks one match point by point and returns player 1's win probability
+    after every point. Feed point winners (1 or 2) to `update`.
+
+    With `prior_points` set, the serve probabilities are updated in-match by
+    blending the pre-match estimate with serve points won so far.
+    """
+
+    def __init__(self, pa, pb, best_of=3, final_tb="1", first_server=1, prior_points=None, cache_directory=None, no_ad=False):
+        self.tables = load_match_tables(parse_best_of(best_of), str(final_tb).strip().upper() or "1", cache_directory, no_ad)
+        self.no_ad = no_ad
+        self.need = int(self.tables["best_of"]) // 2 + 1
+        self.regular = get_set_rule(final_tb, False)
+        self.final = get_set_rule(final_tb, True)
+        self.prior = (float(pa), float(pb))
+        self.prior_points = prior_points
+        self.served = [0, 0]
+        self.served_won = [0, 0]
+        self.sets = [0, 0]
+        self.games = [0, 0]
+        self.points = [0, 0]
+        self.server = first_server - 1
+        self.tb_first = self.server
+        self.in_tb = self._is_final_set() and self.final["match_tb"]
+
+    def _is_final_set(self):
+        return self.sets[0] == self.sets[1] == self.need - 1
+
+    def _cell(self):
+        pa, pb = self.prior
+        if self.prior_points:
+            k = self.prior_points
+            pa = (self.served_won[0] + k * pa) / (self.served[0] + k)
+            pb = (self.served_won[1] + k * pb) / (self.served[1] + k)
+        return int(grid_index(pa)) * len(GRID) + int(grid_index(pb))
+
+    def probability(self):
+        """
+        Current P(player 1 wins the match).
+        """
+        if self.sets[0] >= self.need:
+            return 1.0
+        if self.sets[1] >= self.need:
+            return 0.0
+        # Scalar mirror of lookup_win_probability without the array overhead
+        t = self.tables
+        cell, s = self._cell(), self.server
+        sa, sb = self.sets
+        p1, p2 = self.points
+        if self.in_tb:
+            target = self.final["tb_target"] if self._is_final_set() else self.regular["tb_target"]
+            if min(p1, p2) >= target - 1:
+                p1, p2 = target - 1 + (p1 > p2), target - 1 + (p2 > p1)
+            first = s ^ (((self.points[0] + self.points[1] + 1) // 2) % 2)
+            w = t[f"T{target}"][cell, p1, p2, s]
+            return float(w * t["TA"][cell, sa, sb, first] + (1 - w) * t["TB"][cell, sa, sb, first])
+
+        i, j = (p1, p2) if s == 0 else (p2, p1)
+        if min(i, j) >= 3:
+            i, j = 3 + (i > j), 3 + (j > i)
+        hold = t["H"][cell // len(GRID) if s == 0 else cell % len(GRID), i, j]
+        g = hold if s == 0 else 1 - hold
+        ga, gb = self.games
+        if min(ga, gb) >= 5 and t["VA"].shape[3] == 7:
+            ga, gb = 5 + (ga > gb), 5 + (gb > ga)
+        return float(g * t["VA"][cell, sa, sb, ga, gb, s] + (1 - g) * t["VB"][cell, sa, sb, ga, gb, s])
+
+    def update(self, point_winner):
+        """
+        Applies one point (winner 1 or 2) and returns the new win probability.
+        """
+        w = int(point_winner) - 1
+        if w not in (0, 1):
+            raise ValueError(f"Point winner must be 1 or 2, got {point_winner}")
+        if self.sets[0] >= self.need or self.sets[1] >= self.need:
+            raise ValueError("Match is already finished")
+
+        self.served[self.server] += 1
+        self.served_won[self.server] += w == self.server
+        self.points[w] += 1
+        p, o = self.points[w], self.points[1 - w]
+
+        if self.in_tb:
+            rule = self.final if self._is_final_set() else self.regular
+            if p >= rule["tb_target"] and p - o >= 2:
+                self._end_set(w, 1 - self.tb_first)
+            elif (p + o) % 2 == 1:
+                self.server = 1 - self.server
+            return self.probability()
+
+        if p >= 4 and (p - o >= 2 or self.no_ad):
+            self.points = [0, 0]
+            self.games[w] += 1
+            self.server = 1 - self.server
+            g, h = self.games[w], self.games[1 - w]
+            rule = self.final if self._is_final_set() else self.regular
+            if g >= 6 and g - h >= 2:
+                self._end_set(w, self.server)
+            elif rule["tb_at"] is not None and g == h == rule["tb_at"]:
+                self.in_tb = True
+                self.tb_first = self.server
+        return self.probability()
+
+    def _end_set(self, winner, next_server):
+        self.sets[winner] += 1
+        self.games = [0, 0]
+        self.points = [0, 0]
+        self.server = next_server
+        self.in_tb = self._is_final_set() and self.final["match_tb"]
+        self.tb_first = self.server
+
+# ---------------------------
+# BATCH MODE
+# ---------------------------
+# Slam match numbers: numeric event digit (1101, 3101) or letters (MD101,
+# MS101); both map onto one event code.
+SLAM_EVENTS = {"1": "MS", "2": "WS", "3": "MD", "4": "WD", "5": "XD", "6": "XD"}
+
+def slam_event(match_id):
+    """
+    Event code (MS/WS/MD/WD/XD) of a slam points match_id such as
+    '2019-wimbledon-1101' or '2019-ausopen-XD101'.
+    """
+    match_num = str(match_id).split("-", 2)[2]
+    event = match_num[:-3]
+    return SLAM_EVENTS.get(event, event) if event.isdigit() else event[:2]
+
+def slam_match_format(match_id):
+    """
+    (best_of, final-set code, no_ad) for a slam points match_id. Men's
+    singles and Wimbledon men's doubles are best of five. Mixed doubles is
+    no-ad with a match tiebreak for the final set, except at Wimbledon,
+    where it is played like the other events there. Other events use the
+    slam's final-set rule for that year.
+    """
+    year, slam, _ = str(match_id).split("-", 2)
+    year = int(year)
+    event = slam_event(match_id)
+    best_of = 5 if event == "MS" or (event == "MD" and slam == "wimbledon") else 3
+    if event == "XD" and slam != "wimbledon":
+        return best_of, "S", True
+    if slam == "usopen":
+        return best_of, "1", False
+    if slam == "ausopen":
+        return best_of, "A" if year >= 2019 else "0", False
+    if slam == "wimbledon":
+        return best_of, "T" if 2019 <= year <= 2021 else ("A" if year >= 2022 else "0"), False
+    return best_of, "A" if year >= 2022 else "0", False
+
+def replay_score(winners, best_of=3, final_tb="1", no_ad=False):
+    """
+    Replays one match from its point winners (1/2) under the format's rules,
+    as LiveWinProbability scores it. Returns per point the set being played
+    and, after the point, P1/P2 games and the set winner (0 while the set
+    goes on). Points past the end of the match are left as zeros.
+    """
+    need = best_of // 2 + 1
+    regular, final = get_set_rule(final_tb, False), get_set_rule(final_tb, True)
+    sets, games, points = [0, 0], [0, 0], [0, 0]
+    in_tb = need == 1 and final["match_tb"]
+    out = np.zeros((len(winners), 4), dtype=np.int64)
+    for k, winner in enumerate(winners):
+        if max(sets) >= need:
+            continue
+        w = int(winner) - 1
+        rule = final if sets[0] == sets[1] == need - 1 else regular
+        points[w] += 1
+        p, o = points[w], points[1 - w]
+        set_winner = 0
+        if in_tb:
+            if p >= rule["tb_target"] and p - o >= 2:
+                games[w] += 1
+                set_winner = w + 1
+        elif p >= 4 and (p - o >= 2 or no_ad):
+            points = [0, 0]
+            games[w] += 1
+            g, h = games[w], games[1 - w]
+            if g >= 6 and g - h >= 2:
+                set_winner = w + 1
+            elif rule["tb_at"] is not None and g == h == rule["tb_at"]:
+                in_tb = True
+        out[k] = sets[0] + sets[1] + 1, games[0], games[1], set_winner
+        if set_winner:
+            sets[w] += 1
+            games, points = [0, 0], [0, 0]
+            in_tb = sets[0] == sets[1] == need - 1 and final["match_tb"]
+    return out
+
+def set_finished(points, games_1, games_2, tiebreak_1, tiebreak_2):
+    """
+    Whether each row's games (or, for a match tiebreak, tiebreak points)
+    make a finished set under the match's format.
+    """
+    formats = points["match_id"].map({m: slam_match_format(m) for m in points["match_id"].unique()})
+    best_of = formats.str[0].to_numpy()
+    final = formats.str[1].map(lambda code: get_set_rule(code, True))
+    is_final = points["SetNo"].to_numpy() == best_of
+    tb_at = np.where(is_final, final.map(lambda r: -1 if r["tb_at"] is None else r["tb_at"]).to_numpy(), 6)
+    match_tb = is_final & final.map(lambda r: r["match_tb"]).to_numpy()
+    target = final.map(lambda r: r["tb_target"]).to_numpy()
+    hi, lo = np.maximum(games_1, games_2), np.minimum(games_1, games_2)
+    games_done = ((hi >= 6) & (hi - lo >= 2)) | ((hi == tb_at + 1) & (lo == tb_at))
+    tb_hi, tb_lo = np.maximum(tiebreak_1, tiebreak_2), np.minimum(tiebreak_1, tiebreak_2)
+    return np.where(match_tb, (tb_hi >= target) & (tb_hi - tb_lo >= 2), games_done)
+
+def rebuild_set_state(points):
+    """
+    Games and set winners for matches whose files only record SetNo, the
+    point winner and the point score (the AO and FO doubles and mixed
+    files). A point ends a game when the score after it resets to 0-0 (or
+    reads GAME, in the later files) or the next point is in another set,
+    whose winner is that point's winner. Game-ending rows get a 0-0 score,
+    as in the files that record games.
+    A match's last point ends a set only if the set it completes is
+    finished. Returns (points with the columns filled, match ids whose
+    earlier sets don't end in a finished score).
+    """
+    points = points.copy()
+    match, set_no, winner = points["match_id"], points["SetNo"], points["PointWinner"]
+    last_in_match = match.ne(match.shift(-1))
+    set_end = set_no.ne(set_no.shift(-1)) | last_in_match
+    reset = points["P1Score"].eq("0") & points["P2Score"].eq("0")
+    game_end = reset | points["P1Score"].eq("GAME") | points["P2Score"].eq("GAME") | set_end
+    key = [match, set_no]
+    games_1 = (game_end & winner.eq(1)).groupby(key).cumsum().to_numpy()
+    games_2 = (game_end & winner.eq(2)).groupby(key).cumsum().to_numpy()
+    tiebreak_1 = pd.to_numeric(points["P1Score"], errors="coerce").fillna(0).to_numpy()
+    tiebreak_2 = pd.to_numeric(points["P2Score"], errors="coerce").fillna(0).to_numpy()
+    finished = set_finished(points, games_1, games_2, tiebreak_1, tiebreak_2)
+
+    broken = match[set_end & ~last_in_match & ~finished].unique()
+    set_over = set_end & (finished | ~last_in_match)
+    points["P1GamesWon"] = games_1
+    points["P2GamesWon"] = games_2
+    points["SetWinner"] = np.where(set_over, winner, 0)
+    points.loc[game_end & (set_over | ~set_end), ["P1Score", "P2Score"]] = "0"
+    return points, broken
+
+def load_points_corpus(points_directory):
+    """
+    Loads every slam points file into one frame with the columns the engine
+    needs. Doubles servers (3/4) are folded onto their team (1/2) and rows
+    without a real point winner are dropped.
+
+    Matches without games / set winners get them from rebuild_set_state()
+    (those with an impossible set score are dropped), and a set whose last
+    point has no SetWinner but a finished games score gets one.
+    """
+    usecols = ["match_id", "SetNo", "P1GamesWon", "P2GamesWon", "SetWinner", "PointNumber", "PointWinner", "PointServer", "P1Score", "P2Score"]
+    frames = []
+    for file_path in sorted(Path(points_directory).glob("*-points*.csv")):
+        df = pd.read_csv(file_path, usecols=usecols, dtype=str)
+        df["source_file"] = file_path.name
+        frames.append(df)
+    points = pd.concat(frames, ignore_index=True)
+
+    for col in ["SetNo", "P1GamesWon", "P2GamesWon", "SetWinner", "PointWinner", "PointServer"]:
+        points[col] = pd.to_numeric(points[col], errors="coerce")
+    points = points[points["PointWinner"].isin([1, 2]) & points["PointServer"].isin([1, 2, 3, 4])].reset_index(drop=True)
+    points["PointServer"] = (points["PointServer"].astype(int) - 1) % 2 + 1
+    points["PointWinner"] = points["PointWinner"].astype(int)
+    points["P1Score"] = points["P1Score"].fillna("0").str.strip().str.upper()
+    points["P2Score"] = points["P2Score"].fillna("0").str.strip().str.upper()
+
+    unscored = points[["P1GamesWon", "P2GamesWon", "SetWinner"]].isna().all(axis=1).groupby(points["match_id"]).transform("all")
+    if unscored.any():
+        rebuilt, broken = rebuild_set_state(points[unscored])
+        points = pd.concat([points[~unscored], rebuilt[~rebuilt["match_id"].isin(broken)]]).sort_index()
+        print(f"[INFO] - Rebuilt games and sets from SetNo and point scores for {rebuilt['match_id'].nunique() - len(broken):,} matches")
+        if len(broken):
+            print(f"[WARN] - Dropped {len(broken):,} matches whose rebuilt sets don't end in a finished score (e.g. {broken[0]})")
+
+    points[["P1GamesWon", "P2GamesWon", "SetWinner"]] = points[["P1GamesWon", "P2GamesWon", "SetWinner"]].fillna(0).astype(int)
+    set_key = [points["match_id"], points["SetNo"]]
+    last_in_set = points["match_id"].ne(points["match_id"].shift(-1)) | points["SetNo"].ne(points["SetNo"].shift(-1))
+    no_winner = points["SetWinner"].groupby(set_key).transform("max").eq(0)
+    zeros = np.zeros(len(points))
+    finished = set_finished(points, points["P1GamesWon"].to_numpy(), points["P2GamesWon"].to_numpy(), zeros, zeros)
+    fill = last_in_set & no_winner & finished
+    points.loc[fill, "SetWinner"] = np.where(points.loc[fill, "P1GamesWon"] > points.loc[fill, "P2GamesWon"], 1, 2)
+    return points.reset_index(drop=True)
+
+def slam_serve_priors(points, probs, matches_directory):
+    """
+    Pre-match serve point-win probabilities for every match in the corpus.
+
+    The baseline is the server win rate of the same event in the same file;
+    players found in the charted stats are adjusted by how far their serve
+    and return rates sit from the charted tour averages.
+    """
+    served_by_1 = points["PointServer"] == 1
+    server_won = np.where(served_by_1, points["PointWinner"] == 1, points["PointWinner"] == 2)
+    event = points["match_id"].map(slam_event)
+    base = pd.Series(server_won, index=points.index).groupby([points["source_file"], event]).transform("mean")
+    priors = pd.DataFrame({"match_id": points["match_id"], "base": base}).groupby("match_id", sort=False)["base"].first().to_frame()
+
+    names = []
+    for file_path in sorted(Path(matches_directory).glob("*-matches*.csv")):
+        names.append(pd.read_csv(file_path, usecols=["match_id", "player1", "player2"], dtype=str))
+    names = pd.concat(names, ignore_index=True).drop_duplicates("match_id").set_index("match_id") if names else pd.DataFrame(columns=["player1", "player2"])
+    priors = priors.join(names, how="left")
+
+    serve_delta = probs["serve_prob"] - probs.attrs["tour_serve"]
+    return_delta = probs["return_prob"] - probs.attrs["tour_return"]
+
+    def deltas(col):
+        ids = priors[col].map(lambda n: generate_player_id(normalize_name(n)) if isinstance(n, str) and normalize_name(n) else None)
+        return serve_delta.reindex(ids).fillna(0).to_numpy(), return_delta.reindex(ids).fillna(0).to_numpy()
+
+    s1, r1 = deltas("player1")
+    s2, r2 = deltas("player2")
+    priors["p1_serve"] = np.clip(priors["base"] + s1 - r2, GRID_MIN, GRID_MAX)
+    priors["p2_serve"] = np.clip(priors["base"] + s2 - r1, GRID_MIN, GRID_MAX)
+    return priors[["p1_serve", "p2_serve"]]
+
+def annotate_win_probability(points, priors, prior_points=40, cache_directory=None):
+    """
+    Adds `p1_win_prob` (player 1's match win probability after each point)
+    to the corpus. Score states are reconstructed with grouped array passes
+    and every format is answered by one vectorized table lookup.
+    """
+    match = points["match_id"]
+    grouped = points.groupby(match, sort=False)
+
+    # Post-point set score: cumulative sets won, with games reset once a set ends
+    sa = (points["SetWinner"] == 1).groupby(match, sort=False).cumsum().to_numpy()
+    sb = (points["SetWinner"] == 2).groupby(match, sort=False).cumsum().to_numpy()
+    set_over = points["SetWinner"].isin([1, 2]).to_numpy()
+    ga = np.where(set_over, 0, points["P1GamesWon"].to_numpy())
+    gb = np.where(set_over, 0, points["P2GamesWon"].to_numpy())
+
+    # The next row's server is who serves the coming point
+    server = grouped["PointServer"].shift(-1).fillna(points["PointServer"]).astype(int).to_numpy() - 1
+
+    # In-match serve estimate blended with the pre-match prior
+    served_by_1 = points["PointServer"].to_numpy() == 1
+    won = points["PointWinner"].to_numpy()
+    cum = pd.DataFrame({
+        "s1": served_by_1, "w1": served_by_1 & (won == 1),
+        "s2": ~served_by_1, "w2": ~served_by_1 & (won == 2),
+    }).groupby(match.to_numpy(), sort=False).cumsum()
+    p1_prior = priors["p1_serve"].reindex(match).to_numpy()
+    p2_prior = priors["p2_serve"].reindex(match).to_numpy()
+    k = prior_points
+    pa = (cum["w1"].to_numpy() + k * p1_prior) / (cum["s1"].to_numpy() + k)
+    pb = (cum["w2"].to_numpy() + k * p2_prior) / (cum["s2"].to_numpy() + k)
+    cell = grid_index(pa) * len(GRID) + grid_index(pb)
+
+    match_formats = {m: slam_match_format(m) for m in pd.unique(match)}
+    format_keys = match.map(lambda m: "{}-{}-{:d}".format(*match_formats[m])).to_numpy()
+    result = np.full(len(points), np.nan)
+    for key in pd.unique(format_keys):
+        best_of, code, no_ad = int(key.split("-")[0]), key.split("-")[1], key.split("-")[2] == "1"
+        rows = np.flatnonzero(format_keys == key)
+        tables = load_match_tables(best_of, code, cache_directory, no_ad)
+        need = best_of // 2 + 1
+        final = get_set_rule(code, True)
+        is_final = (sa[rows] == need - 1) & (sb[rows] == need - 1)
+        final_tb_at = final["tb_at"] if final["tb_at"] is not None else -1
+        tb_at = np.where(is_final, final_tb_at, 6)
+        in_tb = (ga[rows] == gb[rows]) & (ga[rows] == tb_at)
+        if final["match_tb"]:
+            in_tb |= is_final
+
+        s1 = points["P1Score"].to_numpy()[rows]
+        s2 = points["P2Score"].to_numpy()[rows]
+        tb_1 = pd.to_numeric(pd.Series(s1), errors="coerce").fillna(0).astype(int).to_numpy()
+        tb_2 = pd.to_numeric(pd.Series(s2), errors="coerce").fillna(0).astype(int).to_numpy()
+        game_1 = pd.Series(s1).map(GAME_SCORE_MAP).fillna(0).astype(int).to_numpy()
+        game_2 = pd.Series(s2).map(GAME_SCORE_MAP).fillna(0).astype(int).to_numpy()
+        pts_1 = np.where(in_tb, tb_1, game_1)
+        pts_2 = np.where(in_tb, tb_2, game_2)
+
+        result[rows] = lookup_win_probability(tables, cell[rows], sa[rows], sb[rows], ga[rows], gb[rows], pts_1, pts_2, server[rows], in_tb)
+
+    points = points.copy()
+    points["p1_win_prob"] = result.astype(np.float32)
+    return points
+
+def unfinished_matches(annotated):
+    """
+    Match ids whose point sequence completes the match (a side reaches the
+    sets it needs) but whose last probability isn't 0 or 1: a score state
+    the engine got wrong.
+    """
+    sets = annotated[["match_id"]].assign(s1=annotated["SetWinner"] == 1, s2=annotated["SetWinner"] == 2).groupby("match_id", sort=False).sum()
+    need = sets.index.map(lambda m: slam_match_format(m)[0] // 2 + 1)
+    complete = sets.index[(sets["s1"] >= need) | (sets["s2"] >= need)]
+    last = annotated.groupby("match_id", sort=False)["p1_win_prob"].last().reindex(complete)
+    return last.index[~last.isin([0.0, 1.0])].tolist()
+
+def streaming_parity(annotated, priors, prior_points=40, cache_directory=None, per_format=10):
+    """
+    Largest difference between the batch probabilities and
+    LiveWinProbability replaying the same points, over up to per_format
+    matches of every format. Only matches whose recorded score agrees with
+    replay_score() are compared: where the file skips or repeats a point the
+    streaming score drifts from the recorded one by design.
+    Returns (largest difference, matches compared).
+    """
+    worst, compared = 0.0, 0
+    formats = pd.Series({m: slam_match_format(m) for m in annotated["match_id"].unique()})
+    for _, match_ids in formats.groupby(formats).groups.items():
+        checked = 0
+        for match_id in match_ids:
+            if checked == per_format:
+                break
+            sample = annotated[annotated["match_id"] == match_id]
+            best_of, code, no_ad = formats[match_id]
+            replayed = replay_score(sample["PointWinner"].to_numpy(), best_of, code, no_ad)
+            if not np.array_equal(replayed[:, 1:], sample[["P1GamesWon", "P2GamesWon", "SetWinner"]].to_numpy()):
+                continue
+            live = LiveWinProbability(*priors.loc[match_id], best_of=best_of, final_tb=code, first_server=int(sample["PointServer"].iloc[0]),
+                                      prior_points=prior_points, cache_directory=cache_directory, no_ad=no_ad)
+            streamed = np.array([live.update(w) for w in sample["PointWinner"]])
+            worst = max(worst, float(np.abs(streamed - sample["p1_win_prob"].to_numpy()).max()))
+            checked += 1
+        compared += checked
+    return worst, compared
+
+if __name__ == "__main__":
+    root = find_repo_root()
+    data_directory = root / "data"
+    points_directory = data_directory / "old_data" / "points"
+    matches_directory = data_directory / "old_data" / "matches"
+    output_directory = data_directory / "processed" / "win_probability"
+    cache_directory = output_directory / "cache"
+
+    parser = argparse.ArgumentParser(description="Annotate slam point sequences with live match win probability.")
+    parser.add_argument("--prior-points", type=int, default=40, help="Weight (in points) of the pre-match serve estimate")
+    args = parser.parse_args()
+
+    print(f"[INFO] - Repository Root: {root}")
+    print(f"[INFO] - Points Directory: {points_directory}")
+
+    start = time.perf_counter()
+    points = load_points_corpus(points_directory)
+    print(f"[INFO] - Loaded {len(points):,} points across {points['match_id'].nunique():,} matches ({time.perf_counter() - start:.2f}s)")
+
+    probs = load_player_point_probabilities(data_directory / "raw" / "stats")
+    priors = slam_serve_priors(points, probs, matches_directory)
+
+    start = time.perf_counter()
+    annotated = annotate_win_probability(points, priors, args.prior_points, cache_directory)
+    print(f"[INFO] - Annotated win probability in one pass ({time.perf_counter() - start:.2f}s)")
+
+    # Streaming timing on the longest match in the corpus
+    longest = annotated["match_id"].value_counts().index[0]
+    sample = annotated[annotated["match_id"] == longest]
+    best_of, code, no_ad = slam_match_format(longest)
+    live = LiveWinProbability(*priors.loc[longest], best_of=best_of, final_tb=code, first_server=int(sample["PointServer"].iloc[0]), prior_points=args.prior_points, cache_directory=cache_directory, no_ad=no_ad)
+    start = time.perf_counter()
+    for winner in sample["PointWinner"]:
+        live.update(winner)
+    per_point = (time.perf_counter() - start) / len(sample) * 1e6
+    print(f"[INFO] - Streaming {longest}: {len(sample)} points, {per_point:.1f} us/point, final probability {live.probability():.3f}")
+    worst, compared = streaming_parity(annotated, priors, args.prior_points, cache_directory)
+    print(f"[INFO] - Largest batch vs streaming difference over {compared} matches: {worst:.4f}")
+
+    unfinished = unfinished_matches(annotated)
+    if unfinished:
+        print(f"[FATAL] - {len(unfinished):,} complete matches don't end at probability 0 or 1 (e.g. {unfinished[0]})")
+        sys.exit(1)
+
+    output_directory.mkdir(parents=True, exist_ok=True)
+    for name, df in annotated.groupby("source_file", sort=False):
+        output_path = output_directory / re.sub(r"\.csv$", "-winprob.csv", name)
+        df.drop(columns=["source_file"]).to_csv(output_path, index=False)
+    print(f"[INFO] - Win probability files written to: {output_directory}")